@@ -0,0 +1,147 @@
+# admission.py
+import threading
+import time
+from collections import deque
+from metrics import Histogram
+
+class AdmissionController:
+    """Bounded handshake pool with a wait queue, for the connection storm at exam start
+    
+    Accepted connections wait here instead of each starting a thread that
+    unpickles and checks the roster at once; `workers` handshakes run at a
+    time. With `queue_size` connections waiting, new ones are turned away
+    with a retry-after hint sized from the queue and recent handshake
+    times, and so are connections that waited past `max_wait` (their
+    client is about to time out anyway).
+    
+    The threaded io mode uses the worker threads (submit); the asyncio
+    engine keeps the same accounting around a semaphore (reserve, started,
+    finished, or cancel if it never gets a slot).
+    """
+    def __init__(self, workers: int = 8, queue_size: int = 1024, max_wait: float = 8.0,
+                 min_retry: float = 1.0, max_retry: float = 30.0):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.min_retry = min_retry
+        self.max_retry = max_retry
+        self.wait_time = Histogram("proctor_handshake_queue_wait_seconds",
+                                   "Time accepted connections wait for a handshake worker")
+        
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._jobs = deque()  # (queued_at, job), threaded mode only
+        self._threads = []
+        self._running = False
+        
+        self.queued = 0              # reserved, waiting for a worker
+        self.active = 0              # handshakes in progress
+        self.service_time = 0.05     # smoothed seconds per handshake
+        
+        # Counters
+        self.handshakes = 0
+        self.rejected = 0
+        self.expired = 0
+    
+    # ========== ACCOUNTING ==========
+    
+    def reserve(self) -> bool:
+        """Take a place in the queue; False if it is full and the connection should be turned away"""
+        with self._lock:
+            if self.queued >= self.queue_size:
+                self.rejected += 1
+                return False
+            self.queued += 1
+            return True
+    
+    def cancel(self):
+        """Give back a reservation whose connection went away before reaching a worker"""
+        with self._lock:
+            self.queued -= 1
+    
+    def started(self, waited: float) -> bool:
+        """A queued connection reached a worker; False if it waited past max_wait"""
+        self.wait_time.observe(waited)
+        with self._lock:
+            self.queued -= 1
+            if waited > self.max_wait:
+                self.expired += 1
+                return False
+            self.active += 1
+            return True
+    
+    def finished(self, seconds: float):
+        with self._lock:
+            self.active -= 1
+            self.handshakes += 1
+            self.service_time = 0.8 * self.service_time + 0.2 * seconds
+    
+    def retry_after(self) -> float:
+        """Seconds a turned-away client should wait: about the time to work through the queue"""
+        with self._lock:
+            return self._retry_after()
+    
+    def _retry_after(self) -> float:
+        estimate = (self.queued + self.active) * self.service_time / self.workers
+        return round(min(self.max_retry, max(self.min_retry, estimate)), 1)
+    
+    # ========== WORKER POOL ==========
+    
+    def start(self, handler):
+        """Run handler(*job, waited) for submitted jobs on the worker threads"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._threads = [threading.Thread(target=self._run, args=(handler,), daemon=True)
+                         for _ in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, *job) -> bool:
+        if not self.reserve():
+            return False
+        with self._lock:
+            self._jobs.append((time.monotonic(), job))
+            self._not_empty.notify()
+        return True
+    
+    def _run(self, handler):
+        while True:
+            with self._lock:
+                while not self._jobs and self._running:
+                    self._not_empty.wait()
+                if not self._running:
+                    return
+                queued_at, job = self._jobs.popleft()
+            try:
+                handler(*job, time.monotonic() - queued_at)
+            except Exception as e:
+                print(f"[ADMISSION] Handshake worker error: {e}")
+    
+    def stop(self, timeout: float = 1.0) -> list:
+        """Stop the workers; returns the jobs that never reached one"""
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+            leftover = [job for _, job in self._jobs]
+            self._jobs.clear()
+            self.queued -= len(leftover)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        return leftover
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'active': self.active,
+                'capacity': self.queue_size,
+                'handshakes': self.handshakes,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'service_ms': self.service_time * 1000,
+                'retry_after': self._retry_after()
+            }
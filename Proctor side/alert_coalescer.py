@@ -0,0 +1,118 @@
+# alert_coalescer.py
+import threading
+
+class _Group:
+    __slots__ = ("alert", "last_seen")
+    
+    def __init__(self, alert: dict, last_seen: float):
+        self.alert = alert
+        self.last_seen = last_seen
+
+class AlertCoalescer:
+    """Per-student token bucket plus coalescing of repeated identical alerts
+    
+    The first alert of a kind is shown at once and opens a group. Repeats
+    (same student, type and text) arriving within `window` seconds of the
+    previous one fold into it: its count and last time go up, nothing new is
+    stored or dispatched. Each shown alert spends a token; a student out of
+    tokens has further alerts folded into a rate-limited group per severity
+    and type, so a flood of window switches never swallows a high-severity
+    alert. Groups that folded anything come back from expire() once they go
+    quiet, so the dashboard can show the final count.
+    """
+    def __init__(self, rate: float = 1.0, burst: int = 5, window: float = 5.0):
+        self.rate = rate      # tokens per second, per student
+        self.burst = burst
+        self.window = window
+        
+        self._lock = threading.Lock()
+        self._buckets = {}  # {key: [tokens, updated]}
+        self._groups = {}   # {(key, signature, or (None, severity, type) when rate-limited): _Group}
+        
+        # Counters
+        self.shown = 0
+        self.folded = 0
+        self.rate_limited = 0
+    
+    def offer(self, key, signature, alert: dict, now: float):
+        """The alert to show, or None if it was folded into an open group
+        
+        Shown alerts gain 'count', 'first_time', 'last_time' and
+        'last_timestamp'; folding only updates their values, so readers
+        never see the dict change size.
+        """
+        with self._lock:
+            group = self._groups.get((key, signature))
+            if group is not None and now - group.last_seen <= self.window:
+                return self._fold(group, alert, now)
+            
+            group_key = (key, signature)
+            if not self._take(key, now):
+                group_key = (key, (None, alert.get('severity'), alert.get('type')))
+                group = self._groups.get(group_key)
+                if group is not None and now - group.last_seen <= self.window:
+                    self.rate_limited += 1
+                    return self._fold(group, alert, now)
+                alert['rate_limited'] = True
+                self.rate_limited += 1
+            
+            event_time = alert.get('event_time', now)
+            alert['count'] = 1
+            alert['first_time'] = alert['last_time'] = event_time
+            alert['last_timestamp'] = alert.get('timestamp')
+            self._groups[group_key] = _Group(alert, now)
+            self.shown += 1
+            return alert
+    
+    def _fold(self, group: _Group, alert: dict, now: float):
+        leader = group.alert
+        leader['last_time'] = alert.get('event_time', now)
+        leader['last_timestamp'] = alert.get('timestamp')
+        leader['count'] += 1
+        group.last_seen = now
+        self.folded += 1
+        return None
+    
+    def _take(self, key, now: float) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+    
+    def expire(self, now: float) -> list:
+        """Close groups quiet for longer than the window; returns the closed ones that folded alerts"""
+        with self._lock:
+            closed = [group_key for group_key, group in self._groups.items()
+                      if now - group.last_seen > self.window]
+            folded = []
+            for group_key in closed:
+                alert = self._groups.pop(group_key).alert
+                if alert['count'] > 1:
+                    folded.append(alert)
+            
+            # A bucket idle long enough to be full again is the same as no bucket
+            refill = self.burst / self.rate if self.rate > 0 else float("inf")
+            for key in [key for key, (_, updated) in self._buckets.items() if now - updated > refill]:
+                del self._buckets[key]
+        return folded
+    
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._groups.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            groups = len(self._groups)
+        return {
+            'shown': self.shown,
+            'folded': self.folded,
+            'rate_limited': self.rate_limited,
+            'open_groups': groups
+        }
@@ -0,0 +1,125 @@
+# alert_dispatcher.py
+import threading
+import time
+from collections import deque
+
+class AlertDispatcher:
+    """Bounded alert queue drained in batches by a condition-driven thread"""
+    def __init__(self, emit, capacity: int = 1000, tick: float = 1 / 30,
+                 max_batch: int = 500, put_timeout: float = 0.5):
+        self._emit = emit  # called with a list of alerts, at most once per tick
+        self.capacity = capacity
+        self.tick = tick
+        self.max_batch = max_batch
+        self.put_timeout = put_timeout
+        
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread = None
+        
+        # Counters
+        self.enqueued = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+    
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 1.0):
+        """Stop the thread; alerts still queued are never shown, and count as dropped"""
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        
+        with self._lock:
+            leftover = len(self._queue)
+            self._queue.clear()
+            self.dropped += leftover
+        if leftover:
+            print(f"[ALERT PROCESSOR] Stopped with {leftover} alert(s) not dispatched")
+    
+    def put(self, alert: dict, block: bool = True) -> bool:
+        """Queue an alert; waits up to put_timeout for room, then counts a drop"""
+        with self._lock:
+            if len(self._queue) >= self.capacity and block:
+                deadline = time.monotonic() + self.put_timeout
+                while len(self._queue) >= self.capacity and self._running:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_full.wait(remaining)
+            
+            if len(self._queue) >= self.capacity:
+                self.dropped += 1
+                return False
+            
+            self._queue.append((time.monotonic(), alert))
+            self.enqueued += 1
+            self._not_empty.notify()
+            return True
+    
+    def _run(self):
+        last_emit = 0.0
+        while True:
+            with self._lock:
+                while not self._queue and self._running:
+                    self._not_empty.wait()
+                if not self._running:
+                    return
+            
+            # A quiet queue is flushed at once; a burst is gathered for the rest of the tick
+            delay = last_emit + self.tick - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                return
+            
+            with self._lock:
+                count = min(len(self._queue), self.max_batch)
+                batch = [self._queue.popleft() for _ in range(count)]
+                self._not_full.notify_all()
+            
+            last_emit = time.monotonic()
+            try:
+                self._emit([alert for _, alert in batch])
+            except Exception as e:
+                print(f"[ALERT PROCESSOR] Error: {e}")
+            
+            latency = last_emit - batch[0][0]
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._total_latency += sum(last_emit - queued_at for queued_at, _ in batch)
+            self.dispatched += count
+            self.batches += 1
+    
+    def stats(self) -> dict:
+        with self._lock:
+            depth = len(self._queue)
+        return {
+            'depth': depth,
+            'capacity': self.capacity,
+            'enqueued': self.enqueued,
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'last_latency_ms': self.last_latency * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+            'avg_latency_ms': (self._total_latency / self.dispatched * 1000) if self.dispatched else 0.0
+        }
@@ -0,0 +1,311 @@
+# async_engine.py
+import asyncio
+import json
+import pickle
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from protocol import (HEADER_SIZE, FRAME_ACK, pack_message, unpack_header, check_size,
+                      MAX_HANDSHAKE_BYTES, MAX_ALERT_BYTES,
+                      ALERT_CHANNEL_MAGIC, CHANNEL_HEADER, ALERT_ID,
+                      MSG_HELLO, MSG_ACK, pack_channel_message,
+                      FRAME_HEADER, FRAME_PROTOCOL_VERSION, FRAME_KIND_JPEG, FRAME_KIND_ACK,
+                      FRAME_KIND_CREDIT, MAX_FRAME_BYTES, pack_frame_header)
+
+class AsyncIngestEngine:
+    """Runs handshakes, video streams and alerts as coroutines on one loop thread"""
+    def __init__(self, server):
+        self.server = server
+        self.loop = None
+        self._thread = None
+        self._ident_server = None
+        self._alert_server = None
+        self._writers = set()
+        self._clients = {}  # {client_key: writer} for student streams
+        self._handshake_slots = None  # semaphore sized by the server's admission controller, made on the loop
+        # Frame storage takes _students_lock and writes recordings; it runs here, off the loop,
+        # apart from the default executor so a burst of frames does not hold up alert ACKs
+        self._frame_executor = None
+    
+    # ========== LOOP MANAGEMENT ==========
+    
+    def _ensure_loop(self):
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self.loop = asyncio.new_event_loop()
+        self._frame_executor = ThreadPoolExecutor(thread_name_prefix="frame-store")
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+    
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+        self.loop.close()
+    
+    def _call(self, coro, timeout: float = 5.0):
+        """Run a coroutine on the engine loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+    
+    def start_identification(self):
+        self._ensure_loop()
+        self._ident_server = self._call(asyncio.start_server(
+            self._handle_client, self.server.host, self.server.port,
+            reuse_address=True, reuse_port=self.server.reuse_port or None, backlog=self.server.accept_backlog))
+    
+    def start_alerts(self):
+        self._ensure_loop()
+        self._alert_server = self._call(asyncio.start_server(
+            self._handle_cheating_alert, self.server.host, self.server.cheat_port,
+            reuse_address=True, reuse_port=self.server.reuse_port or None, backlog=self.server.accept_backlog))
+    
+    def stop(self):
+        if not self._thread or not self._thread.is_alive():
+            return
+        
+        try:
+            self._call(self._shutdown())
+        except Exception as e:
+            print(f"[ASYNC] Shutdown error: {e}")
+        
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
+        self._thread = None
+        self._frame_executor.shutdown(wait=False)
+    
+    async def _shutdown(self):
+        for srv in (self._ident_server, self._alert_server):
+            if srv:
+                srv.close()
+        
+        for writer in list(self._writers):
+            writer.close()
+        
+        self._ident_server = None
+        self._alert_server = None
+        self._handshake_slots = None
+    
+    def close_client(self, client_key: str) -> bool:
+        """Abort a student's connection (by peer address key) from any thread; its handler then unregisters it"""
+        writer = self._clients.get(client_key)
+        if writer is None or self.loop is None:
+            return False
+        self.loop.call_soon_threadsafe(writer.transport.abort)
+        return True
+    
+    # ========== CONNECTION HANDLERS ==========
+    
+    async def _read_message(self, reader: asyncio.StreamReader, limit: int, timeout: float = None) -> bytes:
+        """Read one length-prefixed message of at most limit bytes"""
+        async def read():
+            size = unpack_header(await reader.readexactly(HEADER_SIZE), limit)
+            return await reader.readexactly(size)
+        
+        if timeout is None:
+            return await read()
+        return await asyncio.wait_for(read(), timeout)
+    
+    async def _turn_away(self, writer: asyncio.StreamWriter):
+        try:
+            writer.write(self.server._busy_reply())
+            await asyncio.wait_for(writer.drain(), 1.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    def _end_handshake(self, slots: asyncio.Semaphore, started: float):
+        slots.release()
+        self.server._admission.finished(time.perf_counter() - started)
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info("peername")[:2]
+        client_key = f"{addr[0]}:{addr[1]}"
+        server = self.server
+        
+        # Same admission as the threaded pool: a bounded queue, then a limited number of handshakes at once
+        admission = server._admission
+        if not admission.reserve():
+            await self._turn_away(writer)
+            return
+        if self._handshake_slots is None:
+            self._handshake_slots = asyncio.Semaphore(admission.workers)
+        slots = self._handshake_slots
+        queued_at = time.monotonic()
+        acquired = False
+        try:
+            await slots.acquire()
+            acquired = True
+        finally:
+            if not acquired:
+                # Cancelled while queued (the server is stopping): give the place back
+                admission.cancel()
+        waited = time.monotonic() - queued_at
+        if not admission.started(waited):
+            slots.release()
+            await self._turn_away(writer)
+            return
+        
+        self._writers.add(writer)
+        self._clients[client_key] = writer
+        session_key, epoch = client_key, None
+        started = time.perf_counter()
+        handshaking = True
+        
+        try:
+            meta = pickle.loads(await self._read_message(reader, MAX_HANDSHAKE_BYTES, timeout=10.0))
+            
+            # Student sockets are owned by the loop, so the session holds none. Off the
+            # loop: a sharded worker may wait for another worker to hand the session over
+            student, result = await asyncio.get_running_loop().run_in_executor(
+                None, server._identify_student, meta, None, addr, client_key)
+            # A resumed session keeps the key it was registered under
+            session_key, epoch = student.client_key, student.epoch
+            writer.write(pack_message(pickle.dumps(result)))
+            await writer.drain()
+            server._handshake_time.observe(waited + time.perf_counter() - started)
+            handshaking = False
+            self._end_handshake(slots, started)
+            server._announce_student(student)
+            
+            if student.is_identified:
+                print(f"[ASYNC] Starting video for {student.name}")
+                if student.frame_protocol:
+                    await self._receive_frames(reader, writer, student)
+                else:
+                    await self._receive_legacy_frames(reader, writer, session_key)
+            else:
+                await asyncio.sleep(2)
+        
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            if server._running:
+                print(f"[ASYNC] Client error {client_key}: {e}")
+                traceback.print_exc()
+        finally:
+            if handshaking:
+                self._end_handshake(slots, started)
+            server._unregister_student(session_key, epoch)
+            self._writers.discard(writer)
+            self._clients.pop(client_key, None)
+            writer.close()
+    
+    async def _receive_frames(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, student):
+        """Binary frame stream: FRAME_HEADER followed by raw JPEG bytes"""
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        loop = asyncio.get_running_loop()
+        consumed = 0
+        grant_batch = max(1, student.credit_window // 2)
+        sent_control = None
+        while self.server._running:
+            header = await reader.readexactly(FRAME_HEADER.size)
+            version, kind, slot, seq, captured_at, size = FRAME_HEADER.unpack(header)
+            if version != FRAME_PROTOCOL_VERSION or size > MAX_FRAME_BYTES:
+                raise ConnectionError(f"Bad frame header (version={version}, size={size})")
+            
+            payload = await reader.readexactly(size)
+            if kind != FRAME_KIND_JPEG or slot != student.slot:
+                continue
+            
+            await loop.run_in_executor(self._frame_executor, self.server._store_frame, student.client_key, payload)
+            
+            if student.control is not sent_control:
+                sent_control = student.control
+                writer.write(sent_control)
+            
+            if not student.credit_window:
+                writer.write(pack_frame_header(FRAME_KIND_ACK, slot, seq, captured_at))
+                await writer.drain()
+                continue
+            
+            consumed += 1
+            if consumed >= grant_batch:
+                writer.write(pack_frame_header(FRAME_KIND_CREDIT, slot, consumed, time.time()))
+                consumed = 0
+                await writer.drain()
+    
+    async def _receive_legacy_frames(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_key: str):
+        """Pickled frame stream from clients that did not negotiate a frame protocol"""
+        loop = asyncio.get_running_loop()
+        while self.server._running:
+            frame_data = await self._read_message(reader, MAX_FRAME_BYTES)
+            await loop.run_in_executor(self._frame_executor, self.server._store_frame,
+                                       client_key, pickle.loads(frame_data))
+            writer.write(FRAME_ACK)
+            await writer.drain()
+    
+    async def _handle_cheating_alert(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info("peername")[:2]
+        self._writers.add(writer)
+        
+        try:
+            prefix = await asyncio.wait_for(reader.readexactly(len(ALERT_CHANNEL_MAGIC)), 10.0)
+            if prefix == ALERT_CHANNEL_MAGIC:
+                await self._serve_alert_channel(reader, writer)
+                return
+            
+            # Legacy client: one alert per connection
+            rest = await asyncio.wait_for(reader.readexactly(HEADER_SIZE - len(prefix)), 10.0)
+            data = await asyncio.wait_for(reader.readexactly(unpack_header(prefix + rest, MAX_ALERT_BYTES)), 10.0)
+            alert_text = data.decode('utf-8', errors='ignore').strip()
+            
+            if not alert_text:
+                print("[ASYNC] Empty alert received")
+                return
+            
+            alert_id = await asyncio.get_running_loop().run_in_executor(None, self._ingest_legacy_alert, alert_text)
+            writer.write(self.server._alert_ack(alert_id))
+            await writer.drain()
+        
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError) as e:
+            print(f"[ASYNC] Alert protocol error from {addr}: {e}")
+        except Exception as e:
+            print(f"[ASYNC] Alert handler error: {e}")
+            traceback.print_exc()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+    
+    def _ingest_legacy_alert(self, alert_text: str) -> int:
+        """Ingest a one-connection alert and wait until it is durable (executor thread)"""
+        alert_id = self.server._ingest_alert_text(alert_text, block=False)
+        self.server._wait_durable(alert_id)
+        return alert_id
+    
+    async def _serve_alert_channel(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Persistent alert stream: pipelined alerts and ACKs over one connection"""
+        kind, _, size = CHANNEL_HEADER.unpack(await reader.readexactly(CHANNEL_HEADER.size))
+        payload = await reader.readexactly(check_size(size, MAX_ALERT_BYTES))
+        if kind != MSG_HELLO:
+            print("[ASYNC] Alert channel did not start with HELLO")
+            return
+        
+        hello = json.loads(payload.decode('utf-8'))
+        print(f"[ASYNC] Alert channel open for {hello.get('name')} ({hello.get('id')})")
+        
+        # Ingest and the journal fsync run off the loop (a sharded worker may also hand the
+        # alert to the worker that owns the student); the ACK waits for them
+        loop = asyncio.get_running_loop()
+        try:
+            while self.server._cheat_detection_active:
+                kind, seq, size = CHANNEL_HEADER.unpack(await reader.readexactly(CHANNEL_HEADER.size))
+                payload = await reader.readexactly(check_size(size, MAX_ALERT_BYTES))
+                alert_id = await loop.run_in_executor(None, self.server._accept_channel_message,
+                                                      hello, kind, seq, payload, False)
+                if alert_id is None:
+                    continue
+                
+                writer.write(pack_channel_message(MSG_ACK, seq, ALERT_ID.pack(alert_id)))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        print(f"[ASYNC] Alert channel closed for {hello.get('name')}")
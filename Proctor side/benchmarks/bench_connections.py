@@ -0,0 +1,151 @@
+# bench_connections.py
+"""Connections per core: threaded vs asyncio ingest
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_connections.py --students 300 --fps 10 --duration 10
+
+A separate process drives the simulated students so that only the server's
+own CPU time is measured.
+"""
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import pickle
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import ProctorServer, IO_MODES
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_roster(path, count):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name"])
+        for i in range(count):
+            writer.writerow([f"B{i:06d}", f"Bench Student {i}"])
+
+
+async def _recv_message(reader):
+    size = struct.unpack("Q", await reader.readexactly(8))[0]
+    return await reader.readexactly(size)
+
+
+async def _student(port, index, fps, frame, stop_at, counters):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    meta = pickle.dumps({"name": f"Bench Student {index}", "id": f"B{index:06d}"})
+    writer.write(struct.pack("Q", len(meta)) + meta)
+    await _recv_message(reader)
+    counters["connected"] += 1
+    
+    payload = pickle.dumps(frame)
+    message = struct.pack("Q", len(payload)) + payload
+    interval = 1.0 / fps
+    try:
+        while time.time() < stop_at:
+            started = time.time()
+            writer.write(message)
+            await _recv_message(reader)
+            counters["frames"] += 1
+            await asyncio.sleep(max(0.0, interval - (time.time() - started)))
+    finally:
+        writer.close()
+
+
+def run_fleet(port, students, fps, frame_bytes, stop_at, results, first=0):
+    """Client process: keep `students` streams busy until stop_at (roster rows first..first+students-1)"""
+    async def main():
+        counters = {"connected": 0, "frames": 0}
+        frame = os.urandom(frame_bytes)
+        tasks = [_student(port, i, fps, frame, stop_at, counters) for i in range(first, first + students)]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        counters["failed"] = sum(1 for o in outcomes if isinstance(o, Exception))
+        results.put(counters)
+    
+    asyncio.run(main())
+
+
+def bench_mode(mode, students, fps, frame_bytes, duration, roster):
+    server = ProctorServer(host="127.0.0.1", port=free_port(), cheat_port=free_port(),
+                           csv_path=roster, io_mode=mode)
+    server.start()
+    
+    ramp_up = max(5.0, students / 50)
+    stop_at = time.time() + ramp_up + duration
+    results = multiprocessing.Queue()
+    fleet = multiprocessing.Process(target=run_fleet,
+                                    args=(server.port, students, fps, frame_bytes, stop_at, results))
+    fleet.start()
+    
+    # Wait for the room to fill before sampling
+    deadline = time.time() + ramp_up
+    while time.time() < deadline and len(server.get_connected_students()) < students:
+        time.sleep(0.1)
+    connected = len(server.get_connected_students())
+    
+    wall_start = time.time()
+    cpu_start = time.process_time()
+    threads = threading.active_count()
+    time.sleep(max(0.0, stop_at - time.time() - 0.5))
+    wall = time.time() - wall_start
+    cpu = time.process_time() - cpu_start
+    
+    counters = results.get(timeout=30)
+    fleet.join(timeout=10)
+    recv_stats = server.get_receive_stats()
+    server.stop()
+    
+    cores_used = cpu / wall if wall else 0.0
+    return {
+        "mode": mode,
+        "connected": connected,
+        "failed": counters["failed"],
+        "threads": threads,
+        "cpu_cores": round(cores_used, 3),
+        "connections_per_core": round(connected / cores_used, 1) if cores_used else float("inf"),
+        "frames_per_sec": round(counters["frames"] / (stop_at - wall_start), 1),
+        # Only the threaded receive path counts recv syscalls
+        "syscalls_per_frame": round(recv_stats["syscalls_per_frame"], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--frame-bytes", type=int, default=40_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--modes", nargs="+", default=list(IO_MODES), choices=IO_MODES)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = os.path.join(tmp, "students.csv")
+        write_roster(roster, args.students)
+        
+        rows = [bench_mode(mode, args.students, args.fps, args.frame_bytes, args.duration, roster)
+                for mode in args.modes]
+    
+    print()
+    print(f"{'mode':<10}{'connected':>10}{'failed':>8}{'threads':>9}{'cores':>8}{'conn/core':>11}"
+          f"{'fps':>9}{'recv/frame':>12}")
+    for row in rows:
+        print(f"{row['mode']:<10}{row['connected']:>10}{row['failed']:>8}{row['threads']:>9}"
+              f"{row['cpu_cores']:>8}{row['connections_per_core']:>11}{row['frames_per_sec']:>9}"
+              f"{row['syscalls_per_frame']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_quality.py
+"""Adaptive quality: ingress against the cap as a room fills, and plan() cost
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_quality.py --students 300 --cap-mbps 100
+
+Simulated students follow every control message exactly; their JPEG
+sizes vary per student around the controller's size model, so the
+measured sizes have to correct it.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quality import QualityController, QUALITY_LEVELS, frame_cost
+
+
+def simulate(students, cap, rounds, watched, alerting, seed=1):
+    rng = random.Random(seed)
+    controller = QualityController(cap)
+    # Bytes per frame at cost 1.0: busy scenes and bad cameras compress worse
+    scene = [rng.uniform(15_000, 60_000) for _ in range(students)]
+    counters = [[0, 0] for _ in range(students)]
+    levels = [None] * students
+    rows = []
+    plan_time = 0.0
+    
+    for round_number in range(rounds):
+        # Students join in the first half of the run
+        present = max(1, min(students, students * (round_number + 1) * 2 // rounds))
+        for i in range(present):
+            if levels[i] is None:
+                levels[i] = controller.initial_level(i + 1)
+        
+        ingress = 0
+        for i in range(present):
+            width, height, quality, fps = QUALITY_LEVELS[levels[i]]
+            size = scene[i] * frame_cost(QUALITY_LEVELS[levels[i]]) * rng.uniform(0.9, 1.1)
+            counters[i][0] += int(fps)
+            counters[i][1] += int(size * fps)
+            ingress += size * fps
+        
+        inputs = [(i, levels[i], counters[i][0], counters[i][1],
+                   controller.weight(i < watched, watched <= i < watched + alerting))
+                  for i in range(present)]
+        started = time.perf_counter()
+        planned = controller.plan(inputs)
+        plan_time = max(plan_time, time.perf_counter() - started)
+        for i, level in planned.items():
+            levels[i] = level
+        
+        joined = levels[:present]
+        groups = (joined[:watched], joined[watched:watched + alerting], joined[watched + alerting:])
+        rows.append((round_number, present, ingress,
+                     [sum(group) / len(group) if group else None for group in groups]))
+    return rows, plan_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--cap-mbps", type=float, default=100.0)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--watched", type=int, default=12, help="students on the dashboard's screen")
+    parser.add_argument("--alerting", type=int, default=10, help="students with a recent alert")
+    args = parser.parse_args()
+    
+    cap = args.cap_mbps * 125_000
+    rows, plan_time = simulate(args.students, cap, args.rounds, args.watched, args.alerting)
+    
+    level = lambda value: "-" if value is None else f"{value:.1f}"
+    print(f"{'round':<7}{'students':>9}{'Mbit/s':>9}{'of cap':>8}{'watched':>9}{'alerting':>10}{'others':>8}")
+    for round_number, present, ingress, (watched, alerting, others) in rows:
+        print(f"{round_number:<7}{present:>9}{ingress / 125_000:>9.1f}{ingress / cap:>8.0%}"
+              f"{level(watched):>9}{level(alerting):>10}{level(others):>8}")
+    print(f"\nslowest plan(): {plan_time * 1e3:.2f} ms for {args.students} students (levels: 0 is best)")
+
+
+if __name__ == "__main__":
+    main()
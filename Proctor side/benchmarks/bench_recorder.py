@@ -0,0 +1,95 @@
+# bench_recorder.py
+"""Evidence recorder: record() latency under load, write throughput and seek time
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_recorder.py --students 300 --fps 10 --duration 10
+
+One thread per --threads plays the receive loops, handing JPEG-sized
+buffers to record() at students x fps. A small --budget shows drops
+instead of stalls when the disk falls behind.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import VideoRecorder
+
+
+def feed(recorder, student_ids, fps, frame, stop_at, latencies):
+    """Record one frame per student every 1/fps seconds until stop_at"""
+    interval = 1.0 / fps
+    next_tick = time.perf_counter()
+    while time.time() < stop_at:
+        for student_id in student_ids:
+            started = time.perf_counter()
+            recorder.record(student_id, frame)
+            latencies.append(time.perf_counter() - started)
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--frame-bytes", type=int, default=40_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--budget-mb", type=float, default=64.0)
+    parser.add_argument("--seeks", type=int, default=2000)
+    args = parser.parse_args()
+    
+    frame = os.urandom(args.frame_bytes)
+    student_ids = [f"B{i:06d}" for i in range(args.students)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = VideoRecorder(tmp, segment_seconds=max(1.0, args.duration / 4),
+                                 memory_budget=int(args.budget_mb * 1024 * 1024))
+        recorder.start()
+        
+        started = time.time()
+        stop_at = started + args.duration
+        latencies = [[] for _ in range(args.threads)]
+        feeders = [threading.Thread(target=feed, args=(recorder, student_ids[i::args.threads], args.fps,
+                                                       frame, stop_at, latencies[i]))
+                   for i in range(args.threads)]
+        for feeder in feeders:
+            feeder.start()
+        for feeder in feeders:
+            feeder.join()
+        recorder.close()
+        elapsed = time.time() - started
+        stats = recorder.stats()
+        
+        rng = random.Random(1)
+        seek_started = time.perf_counter()
+        found = 0
+        for _ in range(args.seeks):
+            found += recorder.frame_at(rng.choice(student_ids), rng.uniform(started, stop_at)) is not None
+        seek_time = (time.perf_counter() - seek_started) / args.seeks
+    
+    samples = [latency for thread_latencies in latencies for latency in thread_latencies]
+    print()
+    print(f"record() calls:       {len(samples)}")
+    print(f"record() p50 / p99:   {percentile(samples, 0.5) * 1e6:.1f} / {percentile(samples, 0.99) * 1e6:.1f} us")
+    print(f"record() max:         {max(samples) * 1e3:.2f} ms")
+    print(f"frames recorded:      {stats['frames_recorded']} ({stats['frames_dropped']} dropped)")
+    print(f"write throughput:     {stats['bytes_recorded'] / elapsed / 1e6:.1f} MB/s")
+    print(f"frames per batch:     {stats['frames_per_batch']:.0f}")
+    print(f"segments:             {stats['segments_opened']}")
+    print(f"seek (frame_at):      {seek_time * 1e6:.0f} us ({found}/{args.seeks} found)")
+
+
+if __name__ == "__main__":
+    main()
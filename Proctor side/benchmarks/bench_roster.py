@@ -0,0 +1,101 @@
+# bench_roster.py
+"""Roster startup time and verification lookups per second
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_roster.py --students 1000000
+
+The CSV backend loads every row into a dict at startup; the SQLite backend
+is imported once (python roster.py students.csv students.db) and then only
+opened. Lookups are also timed while a reload runs on another thread.
+--memory traces Python allocations only, so SQLite's page cache is not counted.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roster import CsvRoster, SqliteRoster
+from bench_connections import write_roster
+
+
+def lookups_per_sec(roster, ids, names):
+    started = time.perf_counter()
+    hits = 0
+    for student_id, name in zip(ids, names):
+        hits += roster.verify(student_id, name)
+    elapsed = time.perf_counter() - started
+    return len(ids) / elapsed, hits
+
+
+def during_reload(roster, ids, names):
+    """Lookups per second while another thread reloads the same roster"""
+    reloader = threading.Thread(target=roster.reload)
+    reloader.start()
+    rate, _ = lookups_per_sec(roster, ids, names)
+    reloader.join()
+    return rate
+
+
+def bench(kind, roster, ids, names, memory):
+    started = time.perf_counter()
+    if memory:
+        tracemalloc.start()
+    roster.reload()
+    startup = time.perf_counter() - started
+    resident = 0
+    if memory:
+        resident = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    
+    rate, hits = lookups_per_sec(roster, ids, names)
+    return {
+        "backend": kind,
+        "startup_s": round(startup, 3),
+        "memory_mb": round(resident / 1e6, 1) if memory else None,
+        "lookups_per_sec": round(rate),
+        "verified": hits,
+        "lookups_per_sec_reloading": round(during_reload(roster, ids, names)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--memory", action="store_true", help="trace startup allocations (slower)")
+    args = parser.parse_args()
+    
+    # Half the lookups hit, half use an id that is not on the roster
+    rng = random.Random(1)
+    picks = [rng.randrange(args.students * 2) for _ in range(args.lookups)]
+    ids = [f"B{i:06d}" for i in picks]
+    names = [f"bench  STUDENT {i}" for i in picks]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "students.csv")
+        db_path = os.path.join(tmp, "students.db")
+        write_roster(csv_path, args.students)
+        
+        started = time.perf_counter()
+        SqliteRoster.build(csv_path, db_path)
+        print(f"SQLite import of {args.students} rows: {time.perf_counter() - started:.2f}s (one-off)")
+        
+        rows = [bench("csv", CsvRoster(csv_path), ids, names, args.memory),
+                bench("sqlite", SqliteRoster(db_path), ids, names, args.memory)]
+    
+    print()
+    print(f"{'backend':<9}{'startup s':>11}{'memory MB':>11}{'lookups/s':>12}{'verified':>10}{'reloading/s':>13}")
+    for row in rows:
+        memory = row['memory_mb'] if row['memory_mb'] is not None else "-"
+        print(f"{row['backend']:<9}{row['startup_s']:>11}{memory:>11}{row['lookups_per_sec']:>12}"
+              f"{row['verified']:>10}{row['lookups_per_sec_reloading']:>13}")
+
+
+if __name__ == "__main__":
+    main()
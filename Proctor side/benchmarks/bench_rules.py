@@ -0,0 +1,82 @@
+# bench_rules.py
+"""Alert classification throughput: keyword chains vs the compiled rule engine
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_rules.py --messages 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rules import RuleEngine
+
+SAMPLES = [
+    "Window switch: ChatGPT - Google Chrome",
+    "Copy attempt (Ctrl+C) detected",
+    "Paste attempt (Ctrl+V) detected",
+    "Alt+Tab window switching detected",
+    "Window switch: Inbox - email - Outlook",
+    "Window switch: Project maintainers - Slack",
+    "Student manually stopped the exam",
+    "TEST: This is a test alert from student",
+]
+
+
+def legacy_classify(message):
+    """Severity and icon the way server.py and the dashboard used to pick them"""
+    severity = "low"
+    alert_lower = message.lower()
+    if any(kw in alert_lower for kw in ["chatgpt", "openai", "chegg", "ai tool", "ai"]):
+        severity = "high"
+    elif any(kw in alert_lower for kw in ["copy", "paste", "ctrl+c", "ctrl+v"]):
+        severity = "medium"
+    elif any(kw in alert_lower for kw in ["window", "switch", "tab", "alt+tab"]):
+        severity = "medium"
+    
+    if "chatgpt" in message.lower() or "openai" in message.lower() or "ai" in message.lower():
+        icon = "🤖"
+    elif "copy" in message.lower() or "paste" in message.lower() or "ctrl" in message.lower():
+        icon = "📋"
+    elif "window" in message.lower() or "switch" in message.lower() or "tab" in message.lower():
+        icon = "🪟"
+    elif "stop" in message.lower() or "ended" in message.lower():
+        icon = "⏹️"
+    else:
+        icon = "⚠️"
+    return severity, icon
+
+
+def throughput(classify, messages):
+    started = time.perf_counter()
+    for message in messages:
+        classify(message)
+    return len(messages) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+    
+    engine = RuleEngine.from_file()
+    rng = random.Random(1)
+    messages = [rng.choice(SAMPLES) for _ in range(args.messages)]
+    
+    print()
+    print(f"{'message':<46}{'legacy':>14}{'rules':>24}")
+    for sample in SAMPLES:
+        verdict = engine.classify(sample)
+        legacy = "/".join(legacy_classify(sample))
+        print(f"{sample:<46}{legacy:>14}{verdict.severity + '/' + verdict.category + '/' + verdict.icon:>24}")
+    
+    print()
+    print(f"legacy keyword chains: {throughput(legacy_classify, messages):>12,.0f} msg/s")
+    print(f"compiled rule engine:  {throughput(engine.classify, messages):>12,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_session_memory.py
+"""Per-student memory footprint of the session registry
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_session_memory.py --sessions 1000 10000
+
+Each simulated session is a StudentSession in the StudentLinkedList with its
+indexes, plus a few alerts. The old per-connection dataclass is measured the
+same way for comparison.
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import StudentSession, StudentLinkedList
+
+
+@dataclass
+class LegacyStudent:
+    """Field layout of the dataclass that used to be built inside _identify_student"""
+    name: str
+    id: str
+    sock: object
+    addr: tuple
+    is_identified: bool = False
+    frame_buffer: bytes = None
+    last_frame_time: float = 0
+    cheating_alerts: List[dict] = field(default_factory=list)
+    activity_log: List[str] = field(default_factory=list)
+    cheating_score: int = 0
+    client_key: str = ""
+    slot: int = 0
+    frame_protocol: int = 0
+    credit_window: int = 0
+    version: int = 0
+
+
+def _alert(name, index):
+    return {'timestamp': "10:00:00", 'student_name': name,
+            'violation': f"Window switch #{index}", 'severity': "medium"}
+
+
+def build(kind, count, alerts):
+    registry = StudentLinkedList()
+    for i in range(count):
+        name = f"Bench Student {i}"
+        client_key = f"10.0.{i // 250}.{i % 250}:{40000 + i}"
+        addr = (client_key.split(":")[0], 40000 + i)
+        if kind == "session":
+            student = StudentSession(name=name, id=f"B{i:06d}", sock=None, addr=addr,
+                                     client_key=client_key, is_identified=True)
+            for a in range(alerts):
+                student.record_alert(_alert(name, a), f"[10:00:00] ⚠️ Window switch #{a}")
+        else:
+            student = LegacyStudent(name=name, id=f"B{i:06d}", sock=None, addr=addr,
+                                    is_identified=True, client_key=client_key)
+            for a in range(alerts):
+                student.cheating_alerts.append(_alert(name, a))
+                student.activity_log.append(f"[10:00:00] ⚠️ Window switch #{a}")
+                student.cheating_score = min(100, len(student.cheating_alerts) * 10)
+        registry.append(client_key, student)
+    return registry
+
+
+def record_size(student):
+    """Bytes of the record object itself (instance plus its __dict__, if any)"""
+    size = sys.getsizeof(student)
+    if hasattr(student, "__dict__"):
+        size += sys.getsizeof(student.__dict__)
+    return size
+
+
+def measure(kind, count, alerts):
+    """(bytes per student, record bytes, peak bytes) for `count` sessions"""
+    gc.collect()
+    tracemalloc.start()
+    registry = build(kind, count, alerts)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    record = record_size(registry.head.student)
+    del registry
+    return current / count, record, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--alerts", type=int, default=3, help="alerts recorded per student")
+    args = parser.parse_args()
+    
+    print(f"{'record':<10}{'sessions':>10}{'bytes/student':>15}{'record bytes':>14}{'peak MB':>10}")
+    for count in args.sessions:
+        for kind in ("legacy", "session"):
+            per_student, record, peak = measure(kind, count, args.alerts)
+            print(f"{kind:<10}{count:>10}{per_student:>15.0f}{record:>14}{peak / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
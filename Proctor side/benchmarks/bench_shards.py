@@ -0,0 +1,116 @@
+# bench_shards.py
+"""Throughput and CPU per shard count for the SO_REUSEPORT sharded server
+
+Run from the "Proctor side" directory:
+    python benchmarks/bench_shards.py --students 600 --fps 15 --max-shards 4
+
+Students are driven by --fleets client processes so the clients do not cap
+the result. Worker CPU is read from /proc, so this runs on Linux only.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import ShardedProctorServer
+from bench_connections import free_port, write_roster, run_fleet
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def process_cpu(pid):
+    """User + system CPU seconds of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name may contain spaces; fields resume after its ')'
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def bench_shards(shards, students, fleets, fps, frame_bytes, duration, roster):
+    server = ShardedProctorServer(host="127.0.0.1", port=free_port(), cheat_port=free_port(),
+                                  csv_path=roster, shards=shards)
+    if not server.start():
+        raise RuntimeError(f"{shards} shards failed to start")
+    pids = server.worker_pids()
+    
+    ramp_up = max(5.0, students / 50)
+    stop_at = time.time() + ramp_up + duration
+    # The front end runs threads by now, so fork is not safe for the clients either
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    per_fleet = -(-students // fleets)
+    clients = []
+    for first in range(0, students, per_fleet):
+        count = min(per_fleet, students - first)
+        client = context.Process(target=run_fleet,
+                                 args=(server.port, count, fps, frame_bytes, stop_at, results, first))
+        client.start()
+        clients.append(client)
+    
+    # Wait for the room to fill before sampling
+    deadline = time.time() + ramp_up
+    while time.time() < deadline and server.get_student_counts()[1] < students:
+        time.sleep(0.1)
+    connected = server.get_student_counts()[1]
+    
+    # Frames are counted on the server side, over the sampling window only
+    wall_start = time.time()
+    cpu_start = [process_cpu(pid) for pid in pids]
+    frames_start = server.get_receive_stats()["frames"]
+    time.sleep(max(0.0, stop_at - time.time() - 0.5))
+    wall = time.time() - wall_start
+    cpu = [process_cpu(pid) - start for pid, start in zip(pids, cpu_start)]
+    frames = server.get_receive_stats()["frames"] - frames_start
+    
+    totals = {"connected": 0, "frames": 0, "failed": 0}
+    for _ in clients:
+        for key, value in results.get(timeout=120).items():
+            totals[key] += value
+    for client in clients:
+        client.join(timeout=10)
+    server.stop()
+    
+    cores_used = sum(cpu) / wall if wall else 0.0
+    frames_per_sec = frames / wall if wall else 0.0
+    return {
+        "shards": shards,
+        "connected": connected,
+        "failed": totals["failed"],
+        "cpu_cores": round(cores_used, 2),
+        "busiest_core": round(max(cpu) / wall, 2) if wall else 0.0,
+        "frames_per_sec": round(frames_per_sec, 1),
+        "frames_per_core_sec": round(frames_per_sec / cores_used, 1) if cores_used else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=600)
+    parser.add_argument("--fleets", type=int, default=4, help="client processes driving the students")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--frame-bytes", type=int, default=40_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = os.path.join(tmp, "students.csv")
+        write_roster(roster, args.students)
+        
+        rows = [bench_shards(shards, args.students, args.fleets, args.fps, args.frame_bytes,
+                             args.duration, roster)
+                for shards in range(1, args.max_shards + 1)]
+    
+    print()
+    print(f"{'shards':<8}{'connected':>10}{'failed':>8}{'cores':>8}{'busiest':>9}{'fps':>9}{'fps/core':>10}")
+    for row in rows:
+        print(f"{row['shards']:<8}{row['connected']:>10}{row['failed']:>8}{row['cpu_cores']:>8}"
+              f"{row['busiest_core']:>9}{row['frames_per_sec']:>9}{row['frames_per_core_sec']:>10}")
+
+
+if __name__ == "__main__":
+    main()
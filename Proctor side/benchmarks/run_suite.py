@@ -0,0 +1,443 @@
+# run_suite.py
+"""Benchmark suite for the server hot paths, saved as JSON to compare across commits
+
+Run from the "Proctor side" directory:
+    python benchmarks/run_suite.py --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/run_suite.py --quick --only recv_exact alert_latency
+    python benchmarks/run_suite.py --compare results/abc1234.json --fail-on-regression
+
+Every benchmark runs on its own: one that fails (say, no display for the
+report window) records its error and the rest still run. Metrics ending in
+_per_sec are better when higher, everything else (_ms) when lower.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from argparse import Namespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import (ALERT_CHANNEL_MAGIC, CHANNEL_HEADER, ALERT_EVENT, MSG_HELLO, MSG_EVENT,
+                      VIOLATION_TEST, FRAME_HEADER, FRAME_KIND_JPEG, pack_channel_message,
+                      pack_frame_header)
+from receiver import SocketReceiver
+from server import ProctorServer, IO_MODES
+from events import CHEATING_ALERTS
+from bench_connections import free_port, write_roster
+
+FRAME_BYTES = 30_000
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the server's per-event prints while a benchmark sets up or runs"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_server(tmp, students=1, **options):
+    roster = os.path.join(tmp, f"roster_{students}.csv")
+    write_roster(roster, students)
+    with quiet():
+        return ProctorServer(host="127.0.0.1", port=free_port(), cheat_port=free_port(),
+                             csv_path=roster, **options)
+
+
+def add_students(server, count):
+    """Register `count` identified students without sockets; returns their client keys"""
+    keys = []
+    with quiet():
+        for i in range(count):
+            key = f"127.0.0.1:{10000 + i}"
+            server._identify_student({"name": f"Bench Student {i}", "id": f"B{i:06d}"},
+                                     None, ("127.0.0.1", 10000 + i), key)
+            keys.append(key)
+    return keys
+
+
+def percentile_ms(values, fraction):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+
+def best_ms(run, repeats):
+    """Fastest of `repeats` runs, in ms"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def test_jpeg():
+    """A 640x480 JPEG with some texture, about the size a webcam frame compresses to"""
+    import cv2
+    import numpy as np
+    
+    rows, cols = np.mgrid[0:480, 0:640]
+    image = np.dstack([(rows // 2) % 256, (cols // 3) % 256, (rows + cols) % 256]).astype(np.uint8)
+    image = cv2.add(image, np.random.default_rng(0).integers(0, 24, image.shape, dtype=np.uint8))
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return encoded.tobytes()
+
+# ========== BENCHMARKS ==========
+
+def bench_recv_exact(tmp, quick):
+    """Frames/s and MB/s through ProctorServer._recv_exact and SocketReceiver over a socketpair"""
+    frames = 2_000 if quick else 20_000
+    payload = os.urandom(FRAME_BYTES)
+    message = pack_frame_header(FRAME_KIND_JPEG, 1, 0, 0.0, len(payload)) + payload
+    server = make_server(tmp)
+    # _recv_exact only checks the running flag, so the server needs no sockets
+    server._running = True
+    
+    def drive(read_frame):
+        ours, theirs = socket.socketpair()
+        sender = threading.Thread(target=lambda: [theirs.sendall(message) for _ in range(frames)], daemon=True)
+        started = time.perf_counter()
+        sender.start()
+        for _ in range(frames):
+            read_frame(ours)
+        elapsed = time.perf_counter() - started
+        sender.join()
+        ours.close()
+        theirs.close()
+        return elapsed
+    
+    def server_read(sock):
+        size = FRAME_HEADER.unpack(server._recv_exact(sock, FRAME_HEADER.size))[5]
+        server._recv_exact(sock, size)
+    
+    receivers = []
+    def receiver_read(sock):
+        if not receivers or receivers[-1].sock is not sock:
+            receivers.append(SocketReceiver(sock))
+        receiver = receivers[-1]
+        size = FRAME_HEADER.unpack(receiver.read(FRAME_HEADER.size))[5]
+        receiver.read_owned(size)
+    
+    result = {}
+    for name, read_frame in (("recv_exact", server_read), ("socket_receiver", receiver_read)):
+        elapsed = drive(read_frame)
+        result[f"{name}_frames_per_sec"] = round(frames / elapsed, 1)
+        result[f"{name}_mb_per_sec"] = round(frames * len(message) / elapsed / 1e6, 1)
+    result["socket_receiver_recv_per_frame"] = round(receivers[-1].recv_calls / frames, 2)
+    server._running = False
+    return result
+
+
+def bench_frame_ingest(tmp, quick):
+    """Frames/s stored by each io mode with a saturating fleet in a separate process"""
+    import loadgen
+    
+    students = 20 if quick else 100
+    duration = 3.0 if quick else 10.0
+    context = multiprocessing.get_context("spawn")
+    result = {}
+    for mode in IO_MODES:
+        server = make_server(tmp, students, io_mode=mode)
+        with quiet():
+            server.start()
+        fleet_args = Namespace(host="127.0.0.1", port=server.port, cheat_port=server.cheat_port,
+                               connect_timeout=10.0, connect_rate=200.0, protocol="credit",
+                               fps=1000.0, frame_bytes=FRAME_BYTES, alert_rate=0.0,
+                               delay_ms=0.0, jitter_ms=0.0,
+                               id_format="B{:06d}", name_format="Bench Student {}")
+        start_at = time.time() + 1.0
+        stop_at = start_at + students / fleet_args.connect_rate + 1.0 + duration
+        results = context.Queue()
+        fleet = context.Process(target=loadgen.run_fleet,
+                                args=(fleet_args, 0, students, start_at, stop_at, results))
+        with quiet():
+            fleet.start()
+            # Sample once everyone is streaming
+            time.sleep(max(0.0, stop_at - duration - time.time()))
+            first = server._frames.frames_stored
+            cpu = time.process_time()
+            time.sleep(duration)
+            stored = server._frames.frames_stored - first
+            cpu = time.process_time() - cpu
+            results.get(timeout=60)
+            fleet.join(timeout=10)
+            server.stop()
+        result[f"{mode}_frames_per_sec"] = round(stored / duration, 1)
+        result[f"{mode}_cpu_ms_per_frame"] = round(cpu / stored * 1000, 4) if stored else None
+    return result
+
+
+def bench_join_storm(tmp, quick):
+    """Handshake time when the whole class connects at once (accept backlog, admission queue, roster check)"""
+    import loadgen
+    
+    students = 100 if quick else 500
+    context = multiprocessing.get_context("spawn")
+    result = {}
+    for mode in IO_MODES:
+        server = make_server(tmp, students, io_mode=mode)
+        with quiet():
+            server.start()
+        fleet_args = Namespace(host="127.0.0.1", port=server.port, cheat_port=server.cheat_port,
+                               connect_timeout=10.0, connect_rate=10_000.0, protocol="credit",
+                               fps=1.0, frame_bytes=2_000, alert_rate=0.0,
+                               delay_ms=0.0, jitter_ms=0.0,
+                               id_format="B{:06d}", name_format="Bench Student {}")
+        start_at = time.time() + 1.0
+        results = context.Queue()
+        fleet = context.Process(target=loadgen.run_fleet,
+                                args=(fleet_args, 0, students, start_at, start_at + 2.0, results))
+        with quiet():
+            fleet.start()
+            stats = results.get(timeout=60)
+            fleet.join(timeout=10)
+            server.stop()
+        joins = stats["samples"].get("handshake", [])
+        result[f"{mode}_join_p50_ms"] = percentile_ms(joins, 0.50) if joins else None
+        result[f"{mode}_join_p99_ms"] = percentile_ms(joins, 0.99) if joins else None
+        result[f"{mode}_join_failures"] = students - stats["counters"].get("connected", 0)
+        result[f"{mode}_busy_replies"] = stats["counters"].get("busy_replies", 0)
+    return result
+
+
+def bench_alert_latency(tmp, quick):
+    """Alert channel -> _ingest_alert -> AlertDispatcher -> CHEATING_ALERTS event, one at a time and in a burst"""
+    alerts = 200 if quick else 1_000
+    # One student sends every alert; lift the per-student rate limit so each one is published
+    server = make_server(tmp, alert_rate=float(alerts), alert_burst=2 * alerts)
+    emitted = {}
+    def on_alerts(batch):
+        now = time.perf_counter()
+        for alert in batch:
+            emitted[alert['violation']] = now
+    server.events.subscribe(CHEATING_ALERTS, on_alerts)
+    
+    with quiet():
+        server.start()
+        server.start_cheating_detection()
+        try:
+            sock = socket.create_connection(("127.0.0.1", server.cheat_port))
+            hello = json.dumps({"id": "B000000", "name": "Bench Student 0"}).encode("utf-8")
+            sock.sendall(ALERT_CHANNEL_MAGIC + pack_channel_message(MSG_HELLO, 0, hello))
+            receiver = SocketReceiver(sock)
+            
+            def send(seq):
+                detail = f"Benchmark alert {seq}"
+                sock.sendall(pack_channel_message(
+                    MSG_EVENT, seq, ALERT_EVENT.pack(VIOLATION_TEST, time.time()) + detail.encode("utf-8")))
+                return detail
+            
+            def read_ack():
+                size = CHANNEL_HEADER.unpack(receiver.read(CHANNEL_HEADER.size))[2]
+                receiver.read(size)
+            
+            ack_times, signal_times = [], []
+            for seq in range(1, alerts + 1):
+                started = time.perf_counter()
+                detail = send(seq)
+                read_ack()
+                ack_times.append(time.perf_counter() - started)
+                deadline = time.monotonic() + 5.0
+                while detail not in emitted and time.monotonic() < deadline:
+                    time.sleep(0.0002)
+                if detail in emitted:
+                    signal_times.append(emitted[detail] - started)
+            
+            # Burst: everything pipelined, until the last one is published
+            started = time.perf_counter()
+            details = [send(seq) for seq in range(alerts + 1, 2 * alerts + 1)]
+            for _ in details:
+                read_ack()
+            deadline = time.monotonic() + 30.0
+            while details[-1] not in emitted and time.monotonic() < deadline:
+                time.sleep(0.001)
+            burst = time.perf_counter() - started
+            sock.close()
+        finally:
+            server.stop()
+    
+    return {
+        "ack_p50_ms": percentile_ms(ack_times, 0.50),
+        "ack_p99_ms": percentile_ms(ack_times, 0.99),
+        "signal_p50_ms": percentile_ms(signal_times, 0.50),
+        "signal_p99_ms": percentile_ms(signal_times, 0.99),
+        "burst_alerts_per_sec": round(alerts / burst, 1),
+    }
+
+
+def bench_frame_decode(tmp, quick):
+    """get_student_frames with every frame new (decode) and with none new (cached), as students scale"""
+    jpeg = test_jpeg()
+    result = {}
+    for students in ((10, 100) if quick else (10, 100, 500)):
+        server = make_server(tmp, students)
+        keys = add_students(server, students)
+        
+        def refresh():
+            for key in keys:
+                server._frames.put(key, jpeg)
+        
+        decode = float("inf")
+        for _ in range(3):
+            refresh()
+            started = time.perf_counter()
+            frames = server.get_student_frames()
+            decode = min(decode, time.perf_counter() - started)
+        assert len(frames) == students, f"{len(frames)} of {students} frames decoded"
+        result[f"decode_{students}_ms"] = round(decode * 1000, 3)
+        result[f"decode_{students}_per_frame_ms"] = round(decode * 1000 / students, 4)
+        result[f"cached_{students}_ms"] = best_ms(server.get_student_frames, 5)
+    return result
+
+
+def build_report(tmp, students, alerts):
+    """Cheating report of `students` connected students sharing `alerts` alerts
+    
+    Every alert is kept: the rate limit is lifted, and the journal (read by
+    get_all_alerts, as on the dashboard) holds more than the alert cache.
+    """
+    server = make_server(tmp, students, alert_rate=float(alerts), alert_burst=2 * alerts,
+                         journal_dir=tempfile.mkdtemp(dir=tmp))
+    add_students(server, students)
+    with quiet():
+        server._journal.open()
+        for i in range(alerts):
+            student = i % students
+            server._ingest_alert(f"Bench Student {student}", f"Window switch: Tab {i}",
+                                 student_id=f"B{student:06d}", block=False)
+        # Flushes every record; the report still reads the segments
+        server._journal.close()
+    return server
+
+
+def bench_cheating_report(tmp, quick):
+    """get_cheating_report with alerts spread over 200 students"""
+    result = {}
+    for alerts in ((1_000, 10_000) if quick else (1_000, 10_000, 100_000)):
+        server = build_report(tmp, 200, alerts)
+        result[f"report_{alerts}_alerts_ms"] = best_ms(server.get_cheating_report, 3)
+    return result
+
+
+def bench_format_report(tmp, quick):
+    """ReportWindow sorting, format_report and the text widget update at large alert counts"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6 import QtWidgets
+    from report import ReportWindow
+    
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    result = {}
+    for alerts in ((1_000, 10_000) if quick else (1_000, 10_000, 100_000)):
+        report = build_report(tmp, 200, alerts).get_cheating_report()
+        window = ReportWindow(None)
+        window.report_data = report
+        
+        sorted_students = window.get_all_students_sorted()
+        text = window.format_report(sorted_students)
+        result[f"sort_{alerts}_alerts_ms"] = best_ms(window.get_all_students_sorted, 3)
+        result[f"format_{alerts}_alerts_ms"] = best_ms(lambda: window.format_report(sorted_students), 3)
+        result[f"display_{alerts}_alerts_ms"] = best_ms(lambda: window.report_text.setPlainText(text), 1)
+        window.deleteLater()
+        app.processEvents()
+    return result
+
+
+BENCHMARKS = {
+    "recv_exact": bench_recv_exact,
+    "frame_ingest": bench_frame_ingest,
+    "join_storm": bench_join_storm,
+    "alert_latency": bench_alert_latency,
+    "frame_decode": bench_frame_decode,
+    "cheating_report": bench_cheating_report,
+    "format_report": bench_format_report,
+}
+
+# ========== RESULTS ==========
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(previous, current, threshold):
+    """Print old vs new for every shared metric; returns the regressed metric names"""
+    regressions = []
+    print()
+    print(f"{'metric':<52}{'before':>14}{'after':>14}{'change':>10}")
+    for name, metrics in current["benchmarks"].items():
+        old_metrics = previous.get("benchmarks", {}).get(name, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            worse = -change if metric.endswith("_per_sec") else change
+            flag = "  !" if worse > threshold else ""
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            print(f"{name + '.' + metric:<52}{old:>14}{value:>14}{change * 100:>+9.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for CI")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or BENCHMARKS:
+            print(f"[SUITE] {name}: {BENCHMARKS[name].__doc__}")
+            started = time.perf_counter()
+            try:
+                metrics = BENCHMARKS[name](tmp, args.quick)
+            except Exception as e:
+                traceback.print_exc()
+                metrics = {"error": f"{type(e).__name__}: {e}"}
+            results["benchmarks"][name] = metrics
+            for metric, value in metrics.items():
+                print(f"    {metric:<40}{value}")
+            print(f"    ({time.perf_counter() - started:.1f}s)")
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[SUITE] Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"[SUITE] {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# change_log.py
+from collections import OrderedDict, deque
+
+class ChangeLog:
+    """Versioned change feed over a keyed registry; the caller provides the locking"""
+    def __init__(self, tombstones: int = 1024):
+        self.version = 0
+        self._changes = OrderedDict()  # {key: version}, oldest change first
+        self._removed = deque(maxlen=tombstones)  # (version, key) tombstones
+        self._floor = 0  # callers older than this get a full snapshot
+    
+    def touch(self, key) -> int:
+        """Record a change to key; returns the new version"""
+        self.version += 1
+        self._changes[key] = self.version
+        self._changes.move_to_end(key)
+        return self.version
+    
+    def forget(self, key):
+        """Leave a tombstone for a removed key"""
+        self.version += 1
+        self._changes.pop(key, None)
+        if len(self._removed) == self._removed.maxlen:
+            self._floor = self._removed[0][0]
+        self._removed.append((self.version, key))
+    
+    def reset(self):
+        """Everything is gone; every poller resynchronises from a full snapshot"""
+        self.version += 1
+        self._changes.clear()
+        self._removed.clear()
+        self._floor = self.version
+    
+    def since(self, since: int):
+        """(reset, changed keys, removed keys) after version since
+        
+        Both logs are in version order, so the walk stops at the first entry
+        the caller has already seen. With reset=True the caller must rebuild
+        from the registry itself and the key lists are empty.
+        """
+        if since <= 0 or since < self._floor:
+            return True, [], []
+        
+        changed = []
+        for key, version in reversed(self._changes.items()):
+            if version <= since:
+                break
+            changed.append(key)
+        removed = []
+        for version, key in reversed(self._removed):
+            if version <= since:
+                break
+            removed.append(key)
+        return False, changed, removed
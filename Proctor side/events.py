@@ -0,0 +1,44 @@
+# events.py
+import threading
+import traceback
+
+# Events the server publishes, with their payloads
+STUDENT_CONNECTED = "student_connected"       # student summary dict
+STUDENT_DISCONNECTED = "student_disconnected" # student name
+CHEATING_ALERTS = "cheating_alerts"           # list of alert dicts, one batch per dispatcher tick
+STUDENT_STALLED = "student_stalled"           # {'client_key', 'name', 'id', 'level', 'age'}
+STUDENT_RECOVERED = "student_recovered"       # {'client_key', 'name', 'id', 'level', 'gap'}
+
+class EventBus:
+    """Synchronous publish/subscribe; handlers run on the publishing thread
+    
+    Publishing reads an immutable tuple of handlers, so it takes no lock and
+    costs one dict lookup when nobody listens. A handler that raises is
+    reported and skipped; the others still run.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}  # {event: tuple of handlers}, replaced on every change
+    
+    def subscribe(self, event: str, handler):
+        with self._lock:
+            self._handlers[event] = self._handlers.get(event, ()) + (handler,)
+        return handler
+    
+    def unsubscribe(self, event: str, handler):
+        with self._lock:
+            handlers = self._handlers.get(event, ())
+            if handler in handlers:
+                position = handlers.index(handler)
+                self._handlers[event] = handlers[:position] + handlers[position + 1:]
+    
+    def has_subscribers(self, event: str) -> bool:
+        return bool(self._handlers.get(event))
+    
+    def publish(self, event: str, payload=None):
+        for handler in self._handlers.get(event, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"[EVENTS] {event} handler error: {e}")
+                traceback.print_exc()
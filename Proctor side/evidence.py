@@ -0,0 +1,97 @@
+# evidence.py
+from datetime import datetime
+import cv2
+import numpy as np
+from PyQt6 import QtWidgets, QtGui, QtCore
+
+# Slider resolution: one step per 100 ms of recording
+STEPS_PER_SECOND = 10
+
+class EvidenceWindow(QtWidgets.QDialog):
+    """Seek through a student's recorded video around an alert
+    
+    alert_time is when the server received the alert, on the clock the
+    recording is indexed by; client_time, the student machine's time of
+    the event, is only shown.
+    """
+    def __init__(self, server, student_id, student_name, alert_time, client_time=None, parent=None):
+        super().__init__(parent)
+        self.server = server
+        self.student_id = student_id
+        self.alert_time = alert_time
+        self.setWindowTitle(f"🎞️ Recording - {student_name}")
+        self.resize(700, 580)
+        
+        layout = QtWidgets.QVBoxLayout()
+        
+        alert_label = QtWidgets.QLabel(f"Alert received at {self._format_time(alert_time)}"
+                                       + (f" (student clock: {self._format_time(client_time)})" if client_time else ""))
+        alert_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(alert_label)
+        
+        self.video_label = QtWidgets.QLabel("No recording")
+        self.video_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.video_label.setMinimumSize(640, 420)
+        self.video_label.setStyleSheet("QLabel { background-color: #1e1e1e; color: #888; }")
+        layout.addWidget(self.video_label)
+        
+        self.time_label = QtWidgets.QLabel()
+        self.time_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.time_label)
+        
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.slider.valueChanged.connect(self.show_frame)
+        layout.addWidget(self.slider)
+        
+        button_layout = QtWidgets.QHBoxLayout()
+        alert_button = QtWidgets.QPushButton("⚠️ Jump to alert")
+        alert_button.clicked.connect(self.jump_to_alert)
+        close_button = QtWidgets.QPushButton("❌ Close")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(alert_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+        
+        self.span = server.get_recording_span(student_id)
+        if self.span:
+            first, last = self.span
+            self.slider.setRange(0, int((last - first) * STEPS_PER_SECOND))
+            self.jump_to_alert()
+        else:
+            self.slider.setEnabled(False)
+    
+    def jump_to_alert(self):
+        if not self.span:
+            return
+        self.slider.setValue(int((self.alert_time - self.span[0]) * STEPS_PER_SECOND))
+        self.show_frame(self.slider.value())
+    
+    def show_frame(self, value):
+        when = self.span[0] + value / STEPS_PER_SECOND
+        recorded = self.server.get_recorded_frame(self.student_id, when)
+        if not recorded:
+            self.video_label.setText("No frame at this time")
+            return
+        
+        received_at, jpeg = recorded
+        offset = received_at - self.alert_time
+        self.time_label.setText(f"{self._format_time(received_at)}  ({offset:+.1f}s from alert)")
+        
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            self.video_label.setText("❌ Unreadable frame")
+            return
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb.shape
+        qimg = QtGui.QImage(rgb.data, w, h, ch * w, QtGui.QImage.Format.Format_RGB888)
+        self.video_label.setPixmap(QtGui.QPixmap.fromImage(qimg).scaled(
+            self.video_label.size(),
+            QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+            QtCore.Qt.TransformationMode.SmoothTransformation))
+    
+    @staticmethod
+    def _format_time(when: float) -> str:
+        return datetime.fromtimestamp(when).strftime('%H:%M:%S.%f')[:-3]
@@ -0,0 +1,86 @@
+# frame_store.py
+import threading
+import time
+
+def _decode(jpeg):
+    # Loaded on the first decode, so a headless server never imports OpenCV
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+class FrameEntry:
+    __slots__ = ("jpeg", "version", "frame", "frame_version", "lock")
+    
+    def __init__(self):
+        self.jpeg = None
+        self.version = 0        # bumped for every JPEG that lands
+        self.frame = None       # decoded image for frame_version
+        self.frame_version = 0
+        self.lock = threading.Lock()
+
+class FrameStore:
+    """Latest JPEG per student with a version number, decoded at most once per version"""
+    def __init__(self, decode_time=None):
+        self._lock = threading.Lock()
+        self._entries = {}  # {client_key: FrameEntry}
+        self.decode_time = decode_time  # optional metrics.Histogram of decode seconds
+        
+        # Counters
+        self.frames_stored = 0
+        self.frames_decoded = 0
+    
+    def add(self, client_key):
+        with self._lock:
+            self._entries.setdefault(client_key, FrameEntry())
+    
+    def remove(self, client_key):
+        with self._lock:
+            self._entries.pop(client_key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def put(self, client_key, jpeg) -> int:
+        """Store a new JPEG; returns its version (0 if the student is gone)"""
+        with self._lock:
+            entry = self._entries.get(client_key)
+            if entry is None:
+                return 0
+            entry.jpeg = jpeg
+            entry.version += 1
+            self.frames_stored += 1
+            return entry.version
+    
+    def version(self, client_key) -> int:
+        entry = self._entries.get(client_key)
+        return entry.version if entry else 0
+    
+    def get(self, client_key, since: int = 0):
+        """(version, frame) if a frame newer than `since` exists, else None
+        
+        The decoded frame is shared by every caller asking for the same
+        version, so treat it as read-only.
+        """
+        with self._lock:
+            entry = self._entries.get(client_key)
+            if entry is None or entry.version <= since:
+                return None
+        
+        with entry.lock:
+            if entry.frame_version != entry.version:
+                version, jpeg = entry.version, entry.jpeg
+                started = time.perf_counter()
+                try:
+                    frame = _decode(jpeg)
+                except Exception as e:
+                    print(f"[SERVER] Frame decode error: {e}")
+                    frame = None
+                if self.decode_time:
+                    self.decode_time.observe(time.perf_counter() - started)
+                entry.frame, entry.frame_version = frame, version
+                self.frames_decoded += 1
+            
+            if entry.frame is None or entry.frame_version <= since:
+                return None
+            return entry.frame_version, entry.frame
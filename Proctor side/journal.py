@@ -0,0 +1,312 @@
+# journal.py
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+# Each record is RECORD_HEADER + UTF-8 JSON. A torn or corrupt record ends the
+# segment; anything after it was never acknowledged as durable. append()
+# refuses records over MAX_RECORD_BYTES.
+RECORD_HEADER = struct.Struct("!IIQ")   # payload length, crc32 of payload, sequence number
+SEGMENT_PREFIX = "alerts-"
+SEGMENT_SUFFIX = ".log"
+MAX_RECORD_BYTES = 1024 * 1024
+
+# "first last" lines: sequence numbers handed out but never written (a write
+# failed at close); replay numbers on past them
+LOST_FILE = "lost-seqs.txt"
+
+class AlertJournal:
+    """Segmented append-only alert log; a writer thread fsyncs queued records as one group"""
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_batch: int = 512, fsync: bool = True, retry_delay: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.retry_delay = retry_delay  # between attempts at a batch whose write failed
+        
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        self._committed = threading.Condition(self._lock)
+        self._queue = []            # encoded records waiting for the writer, in seq order
+        self._running = False
+        self._thread = None
+        self._file = None
+        self._segment_index = 0
+        self._read_dir = directory  # where read_all looks; moves with archive()
+        
+        self.last_seq = 0           # last sequence number handed out
+        self.durable_seq = 0        # last sequence number on disk, or lost
+        self.lost = []              # (first, last) ranges of sequence numbers never written
+        
+        # Counters
+        self.commits = 0
+        self.records_written = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+        self.records_lost = 0
+    
+    # ========== SEGMENTS ==========
+    
+    def _segments(self, directory: str):
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        names = [n for n in names if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)]
+        return [os.path.join(directory, n) for n in sorted(names)]
+    
+    def _read_segment(self, path: str):
+        """(seq, record) pairs up to the first torn or corrupt record, the valid length, and
+        whether reading stopped at a torn tail (a record cut off by the end of the file)"""
+        records = []
+        with open(path, "rb") as f:
+            data = f.read()
+        
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            size, crc, seq = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + size]
+            if len(payload) < size:
+                return records, offset, True
+            if zlib.crc32(payload) != crc:
+                break
+            try:
+                records.append((seq, json.loads(payload.decode("utf-8"))))
+            except ValueError:
+                break
+            offset = start + size
+        return records, offset, offset < len(data) and offset + RECORD_HEADER.size > len(data)
+    
+    def replay(self):
+        """Records left by a previous run, in order; torn tails are truncated away
+        
+        A corrupt record with a complete header and payload is not a torn
+        tail: the segment is left as it is rather than cut there.
+        """
+        records = []
+        for path in self._segments(self.directory):
+            segment_records, valid, torn = self._read_segment(path)
+            if torn:
+                print(f"[JOURNAL] Truncating torn tail of {os.path.basename(path)} at {valid} bytes")
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+            elif valid < os.path.getsize(path):
+                print(f"[JOURNAL] Corrupt record in {os.path.basename(path)} at {valid} bytes; "
+                      f"later records in it are not replayed")
+            records.extend(segment_records)
+        
+        # Numbers a previous run handed out but lost are not handed out again
+        last_seq = records[-1][0] if records else 0
+        for _, last in self._read_lost(self.directory):
+            last_seq = max(last_seq, last)
+        self.last_seq = self.durable_seq = last_seq
+        return [record for _, record in records]
+    
+    def _read_lost(self, directory: str):
+        try:
+            with open(os.path.join(directory, LOST_FILE), encoding="utf-8") as f:
+                return [tuple(int(n) for n in line.split()) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"[JOURNAL] Could not read {LOST_FILE}: {e}")
+            return []
+    
+    def read_all(self):
+        """Every durable record in the current (or last archived) journal"""
+        with self._lock:
+            directory = self._read_dir
+        records = []
+        for path in self._segments(directory):
+            records.extend(record for _, record in self._read_segment(path)[0])
+        return records
+    
+    def _open_segment(self):
+        segments = self._segments(self.directory)
+        if segments:
+            last = os.path.basename(segments[-1])
+            self._segment_index = int(last[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        self._segment_index += 1
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._segment_index:06d}{SEGMENT_SUFFIX}")
+        self._file = open(path, "ab")
+    
+    # ========== WRITER ==========
+    
+    def open(self):
+        """Start appending to a fresh segment"""
+        with self._lock:
+            if self._running:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._open_segment()
+            self._read_dir = self.directory
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def append(self, record: dict) -> int:
+        """Queue a record for the next group commit; returns its sequence number
+        
+        Raises ValueError for a record over MAX_RECORD_BYTES; alert messages
+        are capped far below it (protocol.MAX_ALERT_BYTES). Raises
+        RuntimeError if the journal is not open.
+        """
+        payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if len(payload) > MAX_RECORD_BYTES:
+            raise ValueError(f"Journal record too large ({len(payload)} bytes)")
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("Journal is not open")
+            self.last_seq += 1
+            seq = self.last_seq
+            self._queue.append(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), seq) + payload)
+            self._pending.notify()
+            return seq
+    
+    def wait(self, seq: int, timeout: float = 5.0) -> bool:
+        """Block until record seq is on disk; False if it is not (timed out, write failing, lost, or closed)"""
+        with self._lock:
+            self._committed.wait_for(lambda: self.durable_seq >= seq or not self._running, timeout)
+            return self.durable_seq >= seq and not any(first <= seq <= last for first, last in self.lost)
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and self._running:
+                    self._pending.wait()
+                if not self._queue:
+                    return
+                # Everything that queued up during the previous fsync goes out together;
+                # it leaves the queue only once it is on disk
+                batch = self._queue[:self.max_batch]
+                seq = self.durable_seq + len(batch)
+                running = self._running
+            
+            try:
+                self._write(b"".join(batch))
+            except OSError as e:
+                self.write_errors += 1
+                if running:
+                    # Disk full or failing: keep the batch and retry; its alerts are not ACKed meanwhile
+                    print(f"[JOURNAL] Write error: {e}, retrying in {self.retry_delay:g}s")
+                    time.sleep(self.retry_delay)
+                    continue
+                self._lose_queue(e)
+                return
+            
+            with self._lock:
+                del self._queue[:len(batch)]
+                self.durable_seq = seq
+                self.records_written += len(batch)
+                self.commits += 1
+                self._committed.notify_all()
+    
+    def _lose_queue(self, error: OSError):
+        """Give up the records still queued at close, and note their numbers on disk if it can"""
+        with self._lock:
+            first, last = self.durable_seq + 1, self.last_seq
+            self._queue.clear()
+            self.lost.append((first, last))
+            self.records_lost += last - first + 1
+            # Later records carry on after the gap; wait() still reports these as not durable
+            self.durable_seq = last
+            self._committed.notify_all()
+        print(f"[JOURNAL] Write error while closing: {error}, records {first}-{last} lost")
+        
+        try:
+            with open(os.path.join(self.directory, LOST_FILE), "a", encoding="utf-8") as f:
+                f.write(f"{first} {last}\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except OSError as e:
+            print(f"[JOURNAL] Could not record lost records {first}-{last}: {e}")
+    
+    def _write(self, data: bytes):
+        if self._file is None:
+            self._open_segment()
+        start = self._file.tell()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError:
+            self._discard_tail(start)
+            raise
+        self.bytes_written += len(data)
+        
+        if self._file.tell() >= self.segment_bytes:
+            self._file.close()
+            self._file = None  # the next write opens the next segment
+    
+    def _discard_tail(self, start: int):
+        """Cut a failed write off its segment; the retry goes to a fresh segment
+        
+        A torn record ends its segment on replay, so were the cut to fail
+        too, the records written after it are still read from the next one.
+        """
+        path = self._file.name
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        try:
+            os.truncate(path, start)
+        except OSError as e:
+            print(f"[JOURNAL] Could not truncate {os.path.basename(path)}: {e}")
+    
+    def close(self, archive: bool = False):
+        """Flush and stop the writer; archive=True moves the segments aside for the next exam"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._pending.notify_all()
+        
+        # The writer drains the queue before it exits
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        
+        with self._lock:
+            self._committed.notify_all()
+            if self._file:
+                self._file.close()
+                self._file = None
+            if archive:
+                self._read_dir = self._archive()
+    
+    def _archive(self) -> str:
+        target = os.path.join(self.directory, "archive", datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+        os.makedirs(target, exist_ok=True)
+        for path in self._segments(self.directory):
+            shutil.move(path, os.path.join(target, os.path.basename(path)))
+        if os.path.exists(os.path.join(self.directory, LOST_FILE)):
+            shutil.move(os.path.join(self.directory, LOST_FILE), os.path.join(target, LOST_FILE))
+        self._segment_index = 0
+        print(f"[JOURNAL] Archived to {target}")
+        return target
+    
+    def stats(self) -> dict:
+        with self._lock:
+            depth = len(self._queue)
+        return {
+            'depth': depth,
+            'last_seq': self.last_seq,
+            'durable_seq': self.durable_seq,
+            'commits': self.commits,
+            'records_written': self.records_written,
+            'records_per_commit': self.records_written / self.commits if self.commits else 0.0,
+            'bytes_written': self.bytes_written,
+            'write_errors': self.write_errors,
+            'records_lost': self.records_lost
+        }
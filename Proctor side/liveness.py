@@ -0,0 +1,214 @@
+# liveness.py
+import math
+import threading
+
+class _Timer:
+    __slots__ = ("key", "ticks", "level", "slot")
+    
+    def __init__(self, key, ticks: int):
+        self.key = key
+        self.ticks = ticks   # absolute tick the timer is due at
+        self.level = 0
+        self.slot = 0
+
+class TimerWheel:
+    """Hierarchical timing wheel keyed by session
+    
+    Level L has `slots` slots of slots**L ticks each. A timer sits at the
+    lowest level whose span reaches its deadline and moves down a level
+    when its slot comes round, so schedule() and cancel() are O(1) and a
+    tick only touches the timers due in it (plus an occasional cascade).
+    Not thread-safe; LivenessTracker holds the lock.
+    """
+    def __init__(self, now: float, tick: float = 0.25, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]  # slot: {key: _Timer}
+        self._timers = {}  # {key: _Timer}
+        self._current = self._ticks(now)
+    
+    def _ticks(self, when: float) -> int:
+        return math.floor(when / self.tick)
+    
+    def __len__(self):
+        return len(self._timers)
+    
+    def __contains__(self, key):
+        return key in self._timers
+    
+    def schedule(self, key, deadline: float):
+        """Fire `key` at the first tick at or after `deadline`; replaces any pending timer"""
+        self.cancel(key)
+        timer = _Timer(key, max(self._current + 1, math.ceil(deadline / self.tick)))
+        self._timers[key] = timer
+        self._place(timer)
+    
+    def cancel(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            del self._wheels[timer.level][timer.slot][key]
+    
+    def _place(self, timer: _Timer):
+        slots = self.slots
+        for level in range(self.levels):
+            unit = slots ** level
+            if timer.ticks // unit - self._current // unit < slots:
+                break
+        else:
+            # Beyond the top level's span: park in its farthest slot and re-place on the way down
+            level = self.levels - 1
+            unit = slots ** level
+            timer.level, timer.slot = level, (self._current // unit + slots - 1) % slots
+            self._wheels[level][timer.slot][timer.key] = timer
+            return
+        timer.level, timer.slot = level, (timer.ticks // unit) % slots
+        self._wheels[level][timer.slot][timer.key] = timer
+    
+    def advance(self, now: float) -> list:
+        """Move the wheel up to `now`; returns the keys whose timers fired (they are removed)"""
+        due = []
+        target = self._ticks(now)
+        slots = self.slots
+        while self._current < target:
+            self._current += 1
+            current = self._current
+            
+            # Cascade from the top so a timer can fall through several levels in one tick
+            for level in range(self.levels - 1, 0, -1):
+                unit = slots ** level
+                if current % unit:
+                    continue
+                bucket = self._wheels[level][(current // unit) % slots]
+                timers = list(bucket.values())
+                bucket.clear()
+                for timer in timers:
+                    if timer.ticks <= current:
+                        del self._timers[timer.key]
+                        due.append(timer.key)
+                    else:
+                        self._place(timer)
+            
+            bucket = self._wheels[0][current % slots]
+            if bucket:
+                for key in bucket:
+                    del self._timers[key]
+                due.extend(bucket)
+                bucket.clear()
+        return due
+
+class LivenessTracker:
+    """Frame-age thresholds for many video sessions on a timer wheel
+    
+    Frames never touch the wheel: each session has one timer at the time
+    its next threshold would be crossed. When it fires, the session's last
+    frame time is read; if frames arrived meanwhile the timer is simply
+    re-armed from it. Work per tick is proportional to the timers firing,
+    never to the number of sessions.
+    
+    last_seen(key) returns a session's last frame time (None once it is
+    gone); on_stall(key, level, age) runs when the age passes
+    thresholds[level - 1], and on_reap(key, age) once it passes reap_after.
+    Callbacks run on the thread calling advance(), outside the lock.
+    """
+    def __init__(self, last_seen, on_stall, on_reap, now: float, thresholds=(5.0, 20.0),
+                 reap_after: float = 60.0, tick: float = 0.25):
+        self.last_seen = last_seen
+        self.on_stall = on_stall
+        self.on_reap = on_reap
+        self.thresholds = tuple(sorted(thresholds))
+        self.reap_after = reap_after  # None: stalled sessions are flagged, never closed
+        self.tick = tick
+        
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(now, tick)
+        self._levels = {}  # {key: thresholds passed}, for tracked sessions
+        
+        # Counters
+        self.fired = 0
+        self.stalls = 0
+        self.recoveries = 0
+        self.reaped = 0
+    
+    def track(self, key, now: float):
+        with self._lock:
+            self._levels[key] = 0
+            self._schedule(key, now, 0)
+    
+    def forget(self, key):
+        with self._lock:
+            self._levels.pop(key, None)
+            self._wheel.cancel(key)
+    
+    def recovered(self, key, now: float) -> int:
+        """A frame arrived for a stalled session; returns the level it was at (0 if it was not stalled)"""
+        with self._lock:
+            level = self._levels.get(key)
+            if not level:
+                return 0
+            self._levels[key] = 0
+            self._schedule(key, now, 0)
+            self.recoveries += 1
+            return level
+    
+    def level(self, key) -> int:
+        return self._levels.get(key, 0)
+    
+    def _next_age(self, level: int):
+        """Frame age at which a session at `level` next needs looking at"""
+        if level < len(self.thresholds):
+            return self.thresholds[level]
+        if self.reap_after is not None:
+            return self.reap_after
+        return None
+    
+    def _schedule(self, key, last: float, level: int):
+        next_age = self._next_age(level)
+        if next_age is not None:
+            self._wheel.schedule(key, last + next_age)
+    
+    def advance(self, now: float):
+        with self._lock:
+            due = self._wheel.advance(now)
+        self.fired += len(due)
+        
+        for key in due:
+            last = self.last_seen(key)
+            if last is None:
+                self.forget(key)
+                continue
+            age = now - last
+            
+            with self._lock:
+                level = self._levels.get(key)
+                if level is None:
+                    continue  # forgotten while we were looking
+                passed = level
+                while passed < len(self.thresholds) and age >= self.thresholds[passed]:
+                    passed += 1
+                reap = self.reap_after is not None and age >= self.reap_after
+                if reap:
+                    del self._levels[key]
+                else:
+                    self._levels[key] = passed
+                    self._schedule(key, last, passed)
+            
+            if passed > level:
+                self.stalls += 1
+                self.on_stall(key, passed, age)
+            if reap:
+                self.reaped += 1
+                self.on_reap(key, age)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            tracked = len(self._levels)
+            stalled = sum(1 for level in self._levels.values() if level)
+        return {
+            'tracked': tracked,
+            'stalled': stalled,
+            'timers_fired': self.fired,
+            'stalls': self.stalls,
+            'recoveries': self.recoveries,
+            'reaped': self.reaped
+        }
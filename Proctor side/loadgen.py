@@ -0,0 +1,550 @@
+# loadgen.py
+"""Headless synthetic student fleet for load testing the proctor server
+
+Every simulated student speaks the real protocols: the pickled
+identification handshake, the video stream (binary frames with credit or
+lock-step ACKs, or legacy pickles) and the persistent alert channel.
+Frames are random bytes of a configurable size, so no camera, display or
+keyboard hooks are needed.
+
+Against a running server:
+    python loadgen.py --host 10.0.0.5 --students 2000 --fps 5 --duration 60
+
+In CI, with a local server in a separate process and a pass/fail gate:
+    python loadgen.py --local asyncio --students 500 --duration 20 \\
+        --alert-rate 2 --min-success 0.99 --json loadgen.json
+
+Roster ids and names follow --id-format and --name-format; --local writes
+a matching roster. The server's own latency histograms are scraped from
+--metrics-url (set automatically with --local) and reported next to the
+client-side numbers.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import socket
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, deque
+
+from protocol import (HEADER_SIZE, ALERT_CHANNEL_MAGIC, CHANNEL_HEADER, ALERT_EVENT,
+                      MSG_HELLO, MSG_EVENT, MSG_ACK, VIOLATION_TEST, FRAME_HEADER,
+                      FRAME_PROTOCOL_VERSION, FRAME_KIND_JPEG, FRAME_KIND_ACK, FRAME_KIND_CREDIT,
+                      FRAME_KIND_CONTROL, QUALITY_CONTROL, pack_message, unpack_header,
+                      pack_channel_message, pack_frame_header)
+from quality import frame_cost
+
+PROTOCOLS = ("credit", "lockstep", "legacy")
+
+# Busy replies (admission control) a student retries before giving up
+MAX_BUSY_RETRIES = 5
+
+# Latency samples kept per metric and process; more are reservoir-sampled
+MAX_SAMPLES = 100_000
+
+# ========== RESULTS ==========
+
+class FleetStats:
+    """Counters and latency samples (seconds) of one fleet process"""
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.counters = Counter()
+        self.failures = Counter()   # connection failure reason -> count
+        self.samples = {}           # metric -> list of seconds
+        self.seen = Counter()       # metric -> samples offered
+        self._rng = random.Random()
+    
+    def sample(self, metric: str, seconds: float):
+        samples = self.samples.setdefault(metric, [])
+        self.seen[metric] += 1
+        if len(samples) < self.max_samples:
+            samples.append(seconds)
+            return
+        slot = self._rng.randrange(self.seen[metric])
+        if slot < self.max_samples:
+            samples[slot] = seconds
+    
+    def to_dict(self) -> dict:
+        return {"counters": dict(self.counters), "failures": dict(self.failures), "samples": self.samples}
+
+def merge_stats(parts) -> dict:
+    merged = {"counters": Counter(), "failures": Counter(), "samples": {}}
+    for part in parts:
+        merged["counters"].update(part["counters"])
+        merged["failures"].update(part["failures"])
+        for metric, values in part["samples"].items():
+            merged["samples"].setdefault(metric, []).extend(values)
+    return merged
+
+def percentiles(values) -> dict:
+    """p50/p90/p99/max in milliseconds"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    def at(fraction):
+        return round(ordered[min(last, int(fraction * len(ordered)))] * 1000, 2)
+    return {"count": len(ordered), "p50": at(0.50), "p90": at(0.90), "p99": at(0.99),
+            "max": round(ordered[last] * 1000, 2)}
+
+def server_percentiles(text: str) -> dict:
+    """Estimated p50/p90/p99 (ms) of every histogram in Prometheus text, like histogram_quantile()"""
+    buckets = {}
+    for line in text.splitlines():
+        if line.startswith("#") or "_bucket{" not in line:
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, labels = series.split("_bucket{", 1)
+        if not labels.startswith('le="'):
+            continue
+        bound = labels[4:labels.index('"', 4)]
+        buckets.setdefault(name, []).append((float("inf") if bound == "+Inf" else float(bound), float(value)))
+    
+    result = {}
+    for name, points in buckets.items():
+        points.sort()
+        total = points[-1][1]
+        if not total:
+            continue
+        summary = {"count": int(total)}
+        for label, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+            rank = fraction * total
+            lower_bound, lower_count = 0.0, 0.0
+            for bound, count in points:
+                if count >= rank:
+                    if bound == float("inf"):
+                        estimate = lower_bound
+                    else:
+                        estimate = lower_bound + (bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1e-12)
+                    summary[label] = round(estimate * 1000, 3)
+                    break
+                lower_bound, lower_count = bound, count
+        result[name] = summary
+    return result
+
+# ========== SIMULATED STUDENT ==========
+
+class DelayedWriter:
+    """Writes after a simulated one-way network delay, in order"""
+    def __init__(self, writer, delay: float, jitter: float, rng: random.Random):
+        self.writer = writer
+        self.delay = delay
+        self.jitter = jitter
+        self.rng = rng
+        self._last = 0.0
+    
+    def write(self, data: bytes):
+        if not self.delay and not self.jitter:
+            self.writer.write(data)
+            return
+        loop = asyncio.get_running_loop()
+        at = max(self._last, loop.time() + self.delay + self.rng.uniform(0.0, self.jitter))
+        self._last = at
+        loop.call_at(at, self._write, data)
+    
+    def _write(self, data: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+class SyntheticStudent:
+    """One student: handshake, video stream and (with an alert rate) the alert channel"""
+    def __init__(self, index: int, args, stats: FleetStats):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.student_id = args.id_format.format(index)
+        self.name = args.name_format.format(index)
+        self.rng = random.Random(index)
+        
+        self.frame_bytes = args.frame_bytes
+        self.fps = args.fps
+        self.credits = 0
+        self.sent = deque()   # monotonic send time of every unacknowledged frame
+        self.acked = asyncio.Event()
+    
+    async def run(self, start_at: float, stop_at: float):
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        stats = self.stats
+        stats.counters["attempted"] += 1
+        
+        started = time.monotonic()
+        try:
+            for _ in range(MAX_BUSY_RETRIES + 1):
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.args.host, self.args.port), self.args.connect_timeout)
+                meta = {"name": self.name, "id": self.student_id}
+                if self.args.protocol != "legacy":
+                    meta["frame_protocol"] = FRAME_PROTOCOL_VERSION
+                    meta["credit_window"] = self.args.protocol == "credit"
+                    meta["quality_control"] = True
+                writer.write(pack_message(pickle.dumps(meta)))
+                reply = pickle.loads(await asyncio.wait_for(self._read_message(reader), self.args.connect_timeout))
+                if reply.get("status") != "busy":
+                    break
+                # Turned away by admission control: retry when told, with jitter like the real client
+                stats.counters["busy_replies"] += 1
+                writer.close()
+                await asyncio.sleep(reply.get("retry_after", 2.0) * self.rng.uniform(1.0, 1.5))
+        except asyncio.TimeoutError:
+            stats.failures["timeout"] += 1
+            return
+        except ConnectionRefusedError:
+            stats.failures["refused"] += 1
+            return
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            stats.failures[type(e).__name__] += 1
+            return
+        
+        if reply.get("status") != "identified":
+            stats.failures["busy" if reply.get("status") == "busy" else "not_identified"] += 1
+            writer.close()
+            return
+        stats.counters["connected"] += 1
+        stats.sample("handshake", time.monotonic() - started)
+        
+        alerts = None
+        if self.args.alert_rate > 0:
+            alerts = asyncio.ensure_future(self._alert_channel(reply.get("cheat_port", self.args.cheat_port),
+                                                               stop_at))
+        try:
+            if reply.get("frame_protocol") == FRAME_PROTOCOL_VERSION:
+                await self._stream_frames(reader, writer, reply, stop_at)
+            else:
+                await self._stream_legacy(reader, writer, stop_at)
+            stats.counters["completed"] += 1
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            stats.failures[f"dropped_{type(e).__name__}"] += 1
+        finally:
+            writer.close()
+            if alerts:
+                await asyncio.gather(alerts, return_exceptions=True)
+    
+    @staticmethod
+    async def _read_message(reader) -> bytes:
+        return await reader.readexactly(unpack_header(await reader.readexactly(HEADER_SIZE)))
+    
+    def _frame(self) -> bytes:
+        # JPEG start and end markers around noise: the size is what matters
+        return b"\xff\xd8" + os.urandom(max(0, self.frame_bytes - 4)) + b"\xff\xd9"
+    
+    def _apply_control(self, level: int, payload: bytes):
+        width, height, quality, fps = QUALITY_CONTROL.unpack(payload)
+        self.frame_bytes = max(4, int(self.args.frame_bytes * frame_cost((width, height, quality, fps))))
+        self.fps = min(self.args.fps, fps) if fps > 0 else self.args.fps
+        self.stats.counters["quality_changes"] += 1
+    
+    async def _stream_frames(self, reader, writer, reply, stop_at: float):
+        slot = reply["slot"]
+        window = reply.get("credit_window", 0)
+        self.credits = window
+        if reply.get("quality"):
+            width, height, quality, fps = reply["quality"]
+            self._apply_control(0, QUALITY_CONTROL.pack(width, height, quality, fps))
+        
+        link = DelayedWriter(writer, self.args.delay_ms / 1000, self.args.jitter_ms / 1000, self.rng)
+        replies = asyncio.ensure_future(self._read_replies(reader))
+        seq = 0
+        next_at = time.monotonic() + self.rng.uniform(0.0, 1.0 / self.fps)
+        try:
+            while time.time() < stop_at and not replies.done():
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+                next_at = max(next_at + 1.0 / self.fps, time.monotonic())
+                
+                if window and self.credits <= 0:
+                    # Out of credit: drop the frame, as the real client does
+                    self.stats.counters["frames_skipped"] += 1
+                    continue
+                
+                frame = self._frame()
+                seq += 1
+                self.sent.append(time.monotonic())
+                link.write(pack_frame_header(FRAME_KIND_JPEG, slot, seq, time.time(), len(frame)) + frame)
+                self.stats.counters["frames_sent"] += 1
+                self.stats.counters["bytes_sent"] += len(frame)
+                if window:
+                    self.credits -= 1
+                else:
+                    self.acked.clear()
+                    await asyncio.wait([replies, asyncio.ensure_future(self.acked.wait())],
+                                       timeout=self.args.connect_timeout,
+                                       return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            replies.cancel()
+        if replies.done() and not replies.cancelled() and replies.exception():
+            raise replies.exception()
+    
+    async def _read_replies(self, reader):
+        """Server -> client half of the binary stream: ACKs, credit and quality control"""
+        while True:
+            version, kind, _, value, _, size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            payload = await reader.readexactly(size) if size else b""
+            now = time.monotonic()
+            if kind == FRAME_KIND_ACK:
+                self._acknowledge(1, now)
+                self.acked.set()
+            elif kind == FRAME_KIND_CREDIT:
+                self.credits += value
+                self._acknowledge(value, now)
+            elif kind == FRAME_KIND_CONTROL:
+                self._apply_control(value, payload)
+    
+    def _acknowledge(self, frames: int, now: float):
+        # Credit comes back in batches, so only the newest frame of a batch
+        # times the server; the older ones also waited for their successors
+        frames = min(frames, len(self.sent))
+        if not frames:
+            return
+        for _ in range(frames - 1):
+            self.sent.popleft()
+        self.stats.sample("frame_ack", now - self.sent.popleft())
+        self.stats.counters["frames_acked"] += frames
+    
+    async def _stream_legacy(self, reader, writer, stop_at: float):
+        link = DelayedWriter(writer, self.args.delay_ms / 1000, self.args.jitter_ms / 1000, self.rng)
+        interval = 1.0 / self.fps
+        while time.time() < stop_at:
+            started = time.monotonic()
+            frame = self._frame()
+            link.write(pack_message(pickle.dumps(frame)))
+            self.stats.counters["frames_sent"] += 1
+            self.stats.counters["bytes_sent"] += len(frame)
+            await asyncio.wait_for(self._read_message(reader), self.args.connect_timeout)
+            self.stats.sample("frame_ack", time.monotonic() - started)
+            self.stats.counters["frames_acked"] += 1
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+    
+    async def _alert_channel(self, cheat_port: int, stop_at: float):
+        """Send Poisson-distributed structured alerts and time their durable ACKs"""
+        stats = self.stats
+        while time.time() < stop_at:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.args.host, cheat_port), self.args.connect_timeout)
+                break
+            except (OSError, asyncio.TimeoutError):
+                # The alert port only listens once the exam has started
+                await asyncio.sleep(1.0)
+        else:
+            return
+        stats.counters["alert_channels"] += 1
+        
+        # Seqs restart with every channel, so each one is its own stream
+        hello = json.dumps({"id": self.student_id, "name": self.name, "stream": os.urandom(8).hex()}).encode("utf-8")
+        link = DelayedWriter(writer, self.args.delay_ms / 1000, self.args.jitter_ms / 1000, self.rng)
+        link.write(ALERT_CHANNEL_MAGIC + pack_channel_message(MSG_HELLO, 0, hello))
+        
+        pending = {}
+        async def read_acks():
+            while True:
+                kind, seq, size = CHANNEL_HEADER.unpack(await reader.readexactly(CHANNEL_HEADER.size))
+                await reader.readexactly(size)
+                sent_at = pending.pop(seq, None)
+                if kind == MSG_ACK and sent_at is not None:
+                    stats.sample("alert_ack", time.monotonic() - sent_at)
+                    stats.counters["alerts_acked"] += 1
+        
+        acks = asyncio.ensure_future(read_acks())
+        seq = 0
+        try:
+            while not acks.done():
+                pause = self.rng.expovariate(self.args.alert_rate / 60.0)
+                if time.time() + pause >= stop_at:
+                    break
+                await asyncio.sleep(pause)
+                seq += 1
+                detail = f"Load test alert {seq} from {self.student_id}".encode("utf-8")
+                pending[seq] = time.monotonic()
+                link.write(pack_channel_message(MSG_EVENT, seq, ALERT_EVENT.pack(VIOLATION_TEST, time.time()) + detail))
+                stats.counters["alerts_sent"] += 1
+            
+            # Give ACKs still in flight a moment before closing
+            deadline = time.monotonic() + self.args.connect_timeout
+            while pending and not acks.done() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+        finally:
+            acks.cancel()
+            writer.close()
+
+# ========== FLEET ==========
+
+def run_fleet(args, first: int, count: int, start_at: float, stop_at: float, results):
+    """Fleet process: students first..first+count-1, connecting at --connect-rate from start_at"""
+    async def main():
+        stats = FleetStats()
+        students = [SyntheticStudent(index, args, stats) for index in range(first, first + count)]
+        await asyncio.gather(*(student.run(start_at + student.index / args.connect_rate, stop_at)
+                               for student in students), return_exceptions=True)
+        results.put(stats.to_dict())
+    
+    asyncio.run(main())
+
+def write_roster(path: str, args):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name"])
+        for index in range(args.students):
+            writer.writerow([args.id_format.format(index), args.name_format.format(index)])
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_local_server(io_mode: str, roster: str, ports: tuple, ready, stop, results):
+    """Server process for --local: starts the exam at once so the alert channel is open"""
+    from server import ProctorServer
+    
+    port, cheat_port, metrics_port = ports
+    server = ProctorServer(host="127.0.0.1", port=port, cheat_port=cheat_port, csv_path=roster,
+                           io_mode=io_mode, metrics_port=metrics_port)
+    server.start()
+    server.start_cheating_detection()
+    ready.set()
+    stop.wait()
+    results.put({"receive": server.get_receive_stats(), "alerts": server.get_alert_queue_stats(),
+                 "admission": server.get_admission_stats()})
+    server.stop()
+
+def report(args, merged: dict, elapsed: float, server_side: dict) -> dict:
+    counters = merged["counters"]
+    attempted = counters["attempted"]
+    connected = counters["connected"]
+    return {
+        "students": args.students,
+        "protocol": args.protocol,
+        "fps": args.fps,
+        "frame_bytes": args.frame_bytes,
+        "alert_rate_per_min": args.alert_rate,
+        "delay_ms": args.delay_ms,
+        "duration": round(elapsed, 2),
+        "attempted": attempted,
+        "connected": connected,
+        "success_rate": round(connected / attempted, 4) if attempted else 0.0,
+        "failures": dict(merged["failures"]),
+        "counters": dict(counters),
+        "frames_per_sec": round(counters["frames_sent"] / elapsed, 1) if elapsed else 0.0,
+        "megabytes_per_sec": round(counters["bytes_sent"] / elapsed / 1e6, 2) if elapsed else 0.0,
+        "latency_ms": {metric: percentiles(values) for metric, values in sorted(merged["samples"].items())},
+        "server": server_side,
+    }
+
+def print_report(result: dict):
+    print()
+    print(f"Students: {result['connected']}/{result['attempted']} connected "
+          f"({result['success_rate'] * 100:.1f}%), {result['counters'].get('completed', 0)} streamed to the end")
+    for reason, count in sorted(result["failures"].items()):
+        print(f"  failed: {reason} x{count}")
+    counters = result["counters"]
+    if counters.get("busy_replies"):
+        print(f"  retried after {counters['busy_replies']} busy replies")
+    print(f"Video:    {result['frames_per_sec']} frames/s, {result['megabytes_per_sec']} MB/s, "
+          f"{counters.get('frames_skipped', 0)} skipped for credit, "
+          f"{counters.get('quality_changes', 0)} quality changes")
+    print(f"Alerts:   {counters.get('alerts_acked', 0)}/{counters.get('alerts_sent', 0)} acknowledged "
+          f"on {counters.get('alert_channels', 0)} channels")
+    
+    print()
+    print(f"{'client latency':<40}{'count':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for metric, p in result["latency_ms"].items():
+        print(f"{metric:<40}{p['count']:>9}{p['p50']:>10}{p['p90']:>10}{p['p99']:>10}{p['max']:>10}")
+    histograms = result["server"].get("histograms", {})
+    if histograms:
+        print(f"{'server latency':<40}{'count':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+        for name, p in sorted(histograms.items()):
+            print(f"{name:<40}{p['count']:>9}{p.get('p50', '-'):>10}{p.get('p90', '-'):>10}{p.get('p99', '-'):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--cheat-port", type=int, default=8888,
+                        help="alert port when the server's reply does not name one")
+    parser.add_argument("--local", choices=("threaded", "asyncio"),
+                        help="start a ProctorServer with this io mode in a separate process")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=1, help="fleet processes sharing the students")
+    parser.add_argument("--connect-rate", type=float, default=200.0, help="new connections per second")
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds after the last student connects")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="credit")
+    parser.add_argument("--fps", type=float, default=5.0)
+    parser.add_argument("--frame-bytes", type=int, default=30_000, help="frame size at full quality")
+    parser.add_argument("--alert-rate", type=float, default=0.0, help="alerts per student per minute")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="one-way delay added to what students send")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--id-format", default="L{:06d}")
+    parser.add_argument("--name-format", default="Load Student {}")
+    parser.add_argument("--metrics-url", help="server /metrics to scrape for server-side latency")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--min-success", type=float, default=0.0,
+                        help="exit with status 1 if fewer connections than this fraction succeed")
+    args = parser.parse_args()
+    
+    context = multiprocessing.get_context("spawn")
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.local:
+            roster = os.path.join(tmp, "students.csv")
+            write_roster(roster, args)
+            args.host = "127.0.0.1"
+            args.port, args.cheat_port, metrics_port = free_port(), free_port(), free_port()
+            args.metrics_url = f"http://127.0.0.1:{metrics_port}/metrics"
+            ready, stop, server_results = context.Event(), context.Event(), context.Queue()
+            server = context.Process(target=run_local_server,
+                                     args=(args.local, roster, (args.port, args.cheat_port, metrics_port),
+                                           ready, stop, server_results))
+            server.start()
+            if not ready.wait(30):
+                sys.exit("Local server did not start")
+        
+        ramp = args.students / args.connect_rate
+        start_at = time.time() + 1.0 + 0.5 * args.processes
+        stop_at = start_at + ramp + args.duration
+        results = context.Queue()
+        per_process = -(-args.students // max(1, args.processes))
+        fleets = []
+        for first in range(0, args.students, per_process):
+            fleet = context.Process(target=run_fleet, args=(args, first, min(per_process, args.students - first),
+                                                            start_at, stop_at, results))
+            fleet.start()
+            fleets.append(fleet)
+        print(f"[LOADGEN] {args.students} students in {len(fleets)} processes against "
+              f"{args.host}:{args.port}, ramping up over {ramp:.1f}s")
+        
+        parts = [results.get(timeout=stop_at - time.time() + 4 * args.connect_timeout + 30) for _ in fleets]
+        for fleet in fleets:
+            fleet.join(timeout=10)
+        elapsed = stop_at - start_at
+        
+        server_side = {}
+        if args.metrics_url:
+            try:
+                with urllib.request.urlopen(args.metrics_url, timeout=10) as response:
+                    server_side["histograms"] = server_percentiles(response.read().decode("utf-8"))
+            except OSError as e:
+                print(f"[LOADGEN] Could not scrape {args.metrics_url}: {e}")
+        if server:
+            stop.set()
+            server_side.update(server_results.get(timeout=30))
+            server.join(timeout=30)
+    
+    result = report(args, merge_stats(parts), elapsed, server_side)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=str)
+    
+    if result["success_rate"] < args.min_success:
+        print(f"[LOADGEN] Success rate {result['success_rate']:.3f} is below {args.min_success}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# metrics.py
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers a sub-millisecond decode up to a stalled 10 s handshake
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+def family(name: str, kind: str, help: str, samples) -> list:
+    """Prometheus text lines for one metric; samples are (labels dict or None, value)"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {value}" for labels, value in samples)
+    return lines
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three adds"""
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+    
+    def snapshot(self):
+        """(cumulative bucket counts, count, sum)"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total
+    
+    def render(self) -> list:
+        cumulative, count, total = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for bound, running in zip(self.buckets, cumulative):
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {running}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+class TimedLock:
+    """Lock wrapper that records how long contended acquires waited
+    
+    An uncontended acquire costs one extra non-blocking try. The counters
+    and the wait histogram are only updated while the lock is held.
+    """
+    def __init__(self, lock, wait_time: Histogram):
+        self._lock = lock
+        self.wait_time = wait_time
+        self.acquires = 0
+        self.contended = 0
+    
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            self.acquires += 1
+            return True
+        if not blocking:
+            return False
+        
+        started = time.perf_counter()
+        if not self._lock.acquire(True, timeout):
+            return False
+        self.wait_time.observe(time.perf_counter() - started)
+        self.acquires += 1
+        self.contended += 1
+        return True
+    
+    def release(self):
+        self._lock.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+    
+    def render(self, name: str, help: str) -> list:
+        return (family(f"{name}_acquires_total", "counter", f"Acquires of {help}", [(None, self.acquires)])
+                + family(f"{name}_contended_total", "counter", f"Acquires of {help} that had to wait",
+                         [(None, self.contended)])
+                + self.wait_time.render())
+
+class RateTracker:
+    """Per-key rates of monotonically increasing counters, measured between scrapes"""
+    def __init__(self):
+        self._previous = {}  # {key: (time, values)}
+        self._lock = threading.Lock()
+    
+    def rates(self, samples: dict, now: float = None) -> dict:
+        """{key: counter values} -> {key: per-second rates}; keys not passed are forgotten"""
+        now = time.monotonic() if now is None else now
+        rates = {}
+        with self._lock:
+            previous = self._previous
+            for key, values in samples.items():
+                last = previous.get(key)
+                if last and now > last[0]:
+                    elapsed = now - last[0]
+                    rates[key] = tuple(max(0, value - old) / elapsed for value, old in zip(values, last[1]))
+                else:
+                    rates[key] = tuple(0.0 for _ in values)
+            self._previous = {key: (now, values) for key, values in samples.items()}
+        return rates
+
+class MetricsServer:
+    """Serves render() as Prometheus text on http://host:port/metrics"""
+    def __init__(self, render, host: str = "127.0.0.1", port: int = 9100):
+        self.render = render
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+    
+    def start(self):
+        render = self.render
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                try:
+                    body = render().encode("utf-8")
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"[METRICS] Serving http://{self.host}:{self.port}/metrics")
+    
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
@@ -7,7 +7,11 @@ import os
 from datetime import datetime
 from PyQt6 import QtWidgets, uic, QtGui, QtCore, QtPrintSupport
 from server import ProctorServer
+from sharding import ShardedProctorServer
+from protocol import VIOLATION_NAMES
 from report import ReportWindow
+from evidence import EvidenceWindow
+from qt_bridge import ServerSignals
 
 class ProctorDashboard(QtWidgets.QMainWindow):
     def __init__(self, server: ProctorServer):
@@ -16,10 +20,13 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         
         self.server = server
         
-        # Connect server signals
-        self.server.signals.new_student_connected.connect(self.on_new_student_connected)
-        self.server.signals.student_disconnected.connect(self.on_student_disconnected)
-        self.server.signals.cheating_alert.connect(self.on_cheating_alert)
+        # Server events arrive on worker threads; the bridge re-emits them as Qt signals for the GUI thread
+        self.signals = ServerSignals(server.events, self)
+        self.signals.new_student_connected.connect(self.on_new_student_connected)
+        self.signals.student_disconnected.connect(self.on_student_disconnected)
+        self.signals.cheating_alerts.connect(self.on_cheating_alerts)
+        self.signals.student_stalled.connect(self.on_student_stalled)
+        self.signals.student_recovered.connect(self.on_student_recovered)
         
         # Connect UI elements
         self.refresh_timer = QtCore.QTimer()
@@ -44,6 +51,9 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         # Store student video mappings
         self.student_mappings = {}  # {client_key: video_label_name}
         self.video_label_students = {}  # {video_label_name: client_key} for reverse lookup
+        self.student_names = {}  # {client_key: name} for students shown in a tile
+        self.frame_versions = {}  # {client_key: version of the frame on screen}
+        self.state_version = 0  # last server state version applied to the name labels
         
         # Activity log for cheating alerts
         if hasattr(self, 'list'):
@@ -74,6 +84,9 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             header_item.setForeground(QtGui.QColor(255, 255, 255))
             header_item.setFont(QtGui.QFont("Arial", 10, QtGui.QFont.Weight.Bold))
             self.activity_list.addItem(header_item)
+            
+            # Double-click an alert to review the recording around it
+            self.activity_list.itemDoubleClicked.connect(self.show_evidence)
         
         # FIX: Find existing name labels or create them
         self.name_labels = {}
@@ -144,6 +157,14 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         self.statusBar().addPermanentWidget(self.identified_label)
         self.statusBar().addPermanentWidget(self.alerts_label)
         
+        # Activity log filter by violation type (alerts carry it, no text matching)
+        self.type_filter = QtWidgets.QComboBox()
+        self.type_filter.addItem("All activity", None)
+        for type_name in VIOLATION_NAMES.values():
+            self.type_filter.addItem(type_name.replace("_", " ").title(), type_name)
+        self.type_filter.currentIndexChanged.connect(self.apply_type_filter)
+        self.statusBar().addPermanentWidget(self.type_filter)
+        
         # Cheating alerts counter
         self.alert_count = 0
         self.exam_active = False
@@ -166,6 +187,9 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             # Clear mappings
             self.student_mappings.clear()
             self.video_label_students.clear()
+            self.student_names.clear()
+            self.frame_versions.clear()
+            self.state_version = 0
             
             # Update status
             self.status_label.setText("Server: Running")
@@ -246,6 +270,9 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             # Clear mappings
             self.student_mappings.clear()
             self.video_label_students.clear()
+            self.student_names.clear()
+            self.frame_versions.clear()
+            self.state_version = 0
             
             # Update button states
             self.startbutton.setEnabled(True)
@@ -291,13 +318,19 @@ class ProctorDashboard(QtWidgets.QMainWindow):
                     # Assign this student to this video label
                     self.student_mappings[client_key] = video_label
                     self.video_label_students[video_label] = client_key
+                    self.student_names[client_key] = student_info['name']
                     print(f"[DASHBOARD] Assigned {student_info['name']} to {video_label}")
+                    self._update_name_label(video_label, student_info)
                     break
         
         self.refresh_dashboard()
         
         # Add to activity log
         timestamp = datetime.now().strftime("%H:%M:%S")
+        if student_info.get('resumed'):
+            self.add_to_activity_log(f"[{timestamp}] 🔄 {student_info['name']} ({student_info['id']}) reconnected - session resumed",
+                                     "success")
+            return
         status = "✅ VERIFIED" if student_info['is_identified'] else "❌ NOT VERIFIED"
         self.add_to_activity_log(f"[{timestamp}] 👤 {student_info['name']} ({student_info['id']}) connected - {status}", 
                                "success" if student_info['is_identified'] else "error")
@@ -306,12 +339,10 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         """Handle student disconnection - FIXED VERSION"""
         print(f"[DASHBOARD] Student disconnected: {student_name}")
         
-        # Find the client_key for this student
+        # Find the client_key for this student among the assigned tiles
         client_key_to_remove = None
-        all_students_info = self.server.get_all_students_info()
-        
-        for client_key, student_info in all_students_info.items():
-            if student_info.get('name') == student_name:
+        for client_key in self.student_mappings:
+            if self.student_names.get(client_key) == student_name:
                 client_key_to_remove = client_key
                 break
         
@@ -321,6 +352,8 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             
             # Remove from mappings
             del self.student_mappings[client_key_to_remove]
+            self.student_names.pop(client_key_to_remove, None)
+            self.frame_versions.pop(client_key_to_remove, None)
             if video_label in self.video_label_students:
                 del self.video_label_students[video_label]
             
@@ -364,58 +397,87 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         timestamp = datetime.now().strftime("%H:%M:%S")
         self.add_to_activity_log(f"[{timestamp}] 🚪 {student_name} disconnected", "warning")
     
-    def on_cheating_alert(self, alert_data):
-        """Handle cheating alert from server - FIXED VERSION"""
+    def on_student_stalled(self, stall):
+        """Handle a student whose video stopped arriving"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.add_to_activity_log(f"[{timestamp}] 📵 {stall['name']} ({stall['id']}) has sent no video for {stall['age']:.0f}s",
+                                 "error" if stall['level'] > 1 else "warning")
+    
+    def on_student_recovered(self, recovery):
+        """Handle a stalled student whose video came back"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.add_to_activity_log(f"[{timestamp}] 📶 {recovery['name']} ({recovery['id']}) video resumed after {recovery['gap']:.0f}s",
+                                 "success")
+    
+    def on_cheating_alerts(self, alerts):
+        """Handle one batch of cheating alerts from the server"""
         try:
-            self.alert_count += 1
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            
-            # Format the alert message
-            student_name = alert_data.get('student_name', 'Unknown')
-            violation = alert_data.get('violation', 'Unknown violation')
-            severity = alert_data.get('severity', 'low')
-            
-            print(f"[DASHBOARD] Cheating alert #{self.alert_count} received: {student_name} - {violation} ({severity})")
-            
-            # Create alert message with emoji based on violation type
-            if "chatgpt" in violation.lower() or "openai" in violation.lower() or "ai" in violation.lower():
-                icon = "🤖"
-            elif "copy" in violation.lower() or "paste" in violation.lower() or "ctrl" in violation.lower():
-                icon = "📋"
-            elif "window" in violation.lower() or "switch" in violation.lower() or "tab" in violation.lower():
-                icon = "🪟"
-            elif "stop" in violation.lower() or "ended" in violation.lower():
-                icon = "⏹️"
-            else:
-                icon = "⚠️"
-            
-            alert_text = f"[{timestamp}] {icon} {student_name}: {violation}"
-            
-            # IMPORTANT: Add to activity list BEFORE updating UI
-            self.add_to_activity_log(alert_text, severity)
-            
-            # Update alert count - IMPORTANT: Do this AFTER adding to log
+            high_alert = None
+            flash = False
+            
+            for alert_data in alerts:
+                severity = self.on_cheating_alert(alert_data)
+                if alert_data.get('coalesced'):
+                    # Final count of repeats already announced by the group's first alert
+                    continue
+                if severity == 'high' and high_alert is None:
+                    high_alert = alert_data
+                if severity in ['high', 'medium']:
+                    flash = True
+            
+            # Update alert count once per batch
             self.alerts_label.setText(f"Alerts: {self.alert_count}")
+            if hasattr(self, 'activity_list'):
+                self.activity_list.scrollToBottom()
             
-            # Force UI update
-            QtWidgets.QApplication.processEvents()
-            
-            # Show notification popup for high severity alerts
-            if severity == 'high':
+            # Show notification popup for high severity alerts (one per batch)
+            if high_alert:
                 QtWidgets.QMessageBox.warning(self, "🚨 HIGH SEVERITY ALERT", 
-                    f"Student: {student_name}\n\nViolation: {violation}\n\nSeverity: HIGH\n\nImmediate action recommended!")
+                    f"Student: {high_alert.get('student_name', 'Unknown')}\n\n"
+                    f"Violation: {high_alert.get('violation', 'Unknown violation')}\n\n"
+                    f"Severity: HIGH\n\nImmediate action recommended!")
             
             # Flash window attention for medium/high alerts
-            if severity in ['high', 'medium']:
+            if flash:
                 self.flash_window()
-            
-            # Debug: Print confirmation
-            print(f"[DASHBOARD] Alert #{self.alert_count} added to activity log: {alert_text}")
                 
         except Exception as e:
-            print(f"[DASHBOARD] Error handling alert: {e}")
+            print(f"[DASHBOARD] Error handling alerts: {e}")
             traceback.print_exc()
     
+    def on_cheating_alert(self, alert_data):
+        """Add one cheating alert to the activity log; returns its severity"""
+        count = alert_data.get('count', 1)
+        # A coalesced update carries the repeats folded into an alert that was already counted
+        self.alert_count += count - 1 if alert_data.get('coalesced') else 1
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        
+        # Format the alert message
+        student_name = alert_data.get('student_name', 'Unknown')
+        violation = alert_data.get('violation', 'Unknown violation')
+        severity = alert_data.get('severity', 'low')
+        
+        print(f"[DASHBOARD] Cheating alert #{self.alert_count} received: {student_name} - {violation} ({severity})")
+        
+        # The server's rule engine already picked the icon with the severity
+        icon = alert_data.get('icon') or self.server.rules.classify(violation).icon
+        
+        alert_text = f"[{timestamp}] {icon} {student_name}: {violation}"
+        if alert_data.get('coalesced'):
+            alert_text += (f" ×{count} ({alert_data.get('timestamp')}–{alert_data.get('last_timestamp')}"
+                           f"{', rate limited' if alert_data.get('rate_limited') else ''})")
+        
+        # The batch handler refreshes the list once, not per alert
+        evidence = None
+        if alert_data.get('student_id'):
+            # Recordings are indexed by server receive time; the student's clock may be off
+            evidence = (alert_data['student_id'], student_name,
+                        alert_data.get('received_at') or alert_data.get('event_time'), alert_data.get('event_time'))
+        self.add_to_activity_log(alert_text, severity, refresh=False,
+                                 violation_type=alert_data.get('type') or alert_data.get('category'),
+                                 evidence=evidence)
+        return severity
+    
     def flash_window(self):
         """Flash window to get attention"""
         original_color = self.palette().color(self.backgroundRole())
@@ -433,7 +495,8 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         
         QtCore.QTimer.singleShot(200, restore_color)
     
-    def add_to_activity_log(self, message, alert_type="info"):
+    def add_to_activity_log(self, message, alert_type="info", refresh=True, violation_type=None,
+                            evidence=None):
         """Add a message to the activity log - FIXED VERSION"""
         if not hasattr(self, 'activity_list'):
             print(f"[DASHBOARD] Warning: No activity_list found!")
@@ -469,14 +532,22 @@ class ProctorDashboard(QtWidgets.QMainWindow):
                 item.setBackground(QtGui.QColor(30, 30, 80))
                 item.setForeground(QtGui.QColor(150, 150, 255))
             
+            # Tag alerts with their type so the filter can hide them without reading the text
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, violation_type)
+            # (student id, name, received at, student clock time) for the recording viewer
+            item.setData(QtCore.Qt.ItemDataRole.UserRole + 1, evidence)
+            
             # Add to list
             self.activity_list.addItem(item)
+            selected = self.type_filter.currentData()
+            item.setHidden(selected is not None and violation_type != selected)
             
-            # Scroll to bottom
-            self.activity_list.scrollToBottom()
-            
-            # Force UI update
-            QtWidgets.QApplication.processEvents()
+            if refresh:
+                # Scroll to bottom
+                self.activity_list.scrollToBottom()
+                
+                # Force UI update
+                QtWidgets.QApplication.processEvents()
             
             # Debug output
             print(f"[DASHBOARD] Added to activity log: {message}")
@@ -491,17 +562,38 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             print(f"[DASHBOARD] Error adding to activity log: {e}")
             traceback.print_exc()
     
+    def show_evidence(self, item):
+        """Open the recording of the student behind an activity log alert"""
+        evidence = item.data(QtCore.Qt.ItemDataRole.UserRole + 1)
+        if not evidence:
+            return
+        
+        student_id, student_name, received_at, event_time = evidence
+        if not self.server.get_recording_span(student_id):
+            QtWidgets.QMessageBox.information(self, "No Recording",
+                f"No video was recorded for {student_name}.\n\n"
+                f"Set PROCTOR_RECORD_DIR to record student streams.")
+            return
+        EvidenceWindow(self.server, student_id, student_name, received_at, event_time, self).exec()
+    
+    def apply_type_filter(self):
+        """Show only activity log alerts of the selected violation type"""
+        if not hasattr(self, 'activity_list'):
+            return
+        
+        selected = self.type_filter.currentData()
+        # Row 0 is the header
+        for row in range(1, self.activity_list.count()):
+            item = self.activity_list.item(row)
+            item.setHidden(selected is not None and
+                           item.data(QtCore.Qt.ItemDataRole.UserRole) != selected)
+    
     def refresh_dashboard(self):
         """Refresh all dashboard elements"""
         try:
-            # Update connected students count
-            connected_students = self.server.get_connected_students()
-            connected_count = len(connected_students)
+            # Update connected and verified students count
+            connected_count, identified_count = self.server.get_student_counts()
             self.connection_label.setText(f"Connected: {connected_count}")
-            
-            # Update verified students count
-            identified = self.server.get_identified_students()
-            identified_count = len(identified)
             self.identified_label.setText(f"Verified: {identified_count}")
             
             # Update status bar with counts
@@ -510,79 +602,42 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             # Debug output
             # print(f"[DASHBOARD] Refresh: {connected_count} connected, {identified_count} verified")
             
+            # Pick up roster edits without restarting; the reload runs in the background
+            if self.server.reload_roster():
+                timestamp = datetime.now().strftime("%H:%M:%S")
+                self.add_to_activity_log(f"[{timestamp}] 📋 Roster file changed, reloading", "info")
+            
         except Exception as e:
             print(f"[DASHBOARD] Error refreshing: {e}")
     
     def update_preview(self):
-        """Update video previews"""
+        """Update video previews with frames that arrived since the last tick"""
         try:
-            # Get frames for all students
-            student_frames = self.server.get_student_frames()
-            all_students_info = self.server.get_all_students_info()
-            
-            # Track which students have been displayed
-            displayed_students = set()
-            
-            # Process video label 1
-            if hasattr(self, 'videolabel'):
-                if 'videolabel' in self.video_label_students:
-                    client_key = self.video_label_students['videolabel']
-                    student_info = all_students_info.get(client_key)
-                    
-                    if student_info:
-                        # Find this student's frame
-                        student_found = False
-                        for name, student_id, frame in student_frames:
-                            if name == student_info.get('name') and student_id == student_info.get('id'):
-                                self.update_video_label(self.videolabel, frame, name, student_id)
-                                self._update_name_label('videolabel', student_info)
-                                displayed_students.add((name, student_id))
-                                student_found = True
-                                break
-                        
-                        if not student_found:
-                            self.show_placeholder(self.videolabel, f"📷 No video from {student_info.get('name', 'Student')}")
-                else:
-                    self.show_placeholder(self.videolabel, "👤 Waiting for student...")
-                    if 'videolabel' in self.name_labels:
-                        self.name_labels['videolabel'].setText("Student 1: Not Connected")
-                        self.name_labels['videolabel'].setStyleSheet("""
-                            QLabel {
-                                font-weight: bold;
-                                font-size: 14px;
-                                color: #888;
-                                padding: 5px;
-                                background-color: #2a2a2a;
-                                border-radius: 5px;
-                                border: 1px solid #444;
-                            }
-                        """)
-            
-            # Process video label 2 if exists
-            if hasattr(self, 'videolabel2'):
-                if 'videolabel2' in self.video_label_students:
-                    client_key = self.video_label_students['videolabel2']
-                    student_info = all_students_info.get(client_key)
-                    
-                    if student_info:
-                        # Find this student's frame
-                        student_found = False
-                        for name, student_id, frame in student_frames:
-                            if (name, student_id) not in displayed_students:
-                                if name == student_info.get('name') and student_id == student_info.get('id'):
-                                    self.update_video_label(self.videolabel2, frame, name, student_id)
-                                    self._update_name_label('videolabel2', student_info)
-                                    displayed_students.add((name, student_id))
-                                    student_found = True
-                                    break
-                        
-                        if not student_found:
-                            self.show_placeholder(self.videolabel2, f"📷 No video from {student_info.get('name', 'Student')}")
-                else:
-                    self.show_placeholder(self.videolabel2, "👤 Waiting for student...")
-                    if 'videolabel2' in self.name_labels:
-                        self.name_labels['videolabel2'].setText("Student 2: Not Connected")
-                        self.name_labels['videolabel2'].setStyleSheet("""
+            tiles = [(label_name, getattr(self, label_name))
+                     for label_name in ('videolabel', 'videolabel2') if hasattr(self, label_name)]
+            
+            # Ask only for the students on screen, and only for frames newer than the ones shown
+            wanted = {}
+            for label_name, _ in tiles:
+                if label_name in self.video_label_students:
+                    client_key = self.video_label_students[label_name]
+                    wanted[client_key] = self.frame_versions.get(client_key, 0)
+            new_frames = self.server.get_frames_since(wanted) if wanted else {}
+            
+            # Name labels only change when the student's record does
+            changes = self.server.get_student_changes(self.state_version)
+            self.state_version = changes['version']
+            for client_key, student_info in changes['changed'].items():
+                if client_key in self.student_mappings:
+                    self._update_name_label(self.student_mappings[client_key], student_info)
+            
+            for label_name, label in tiles:
+                if label_name not in self.video_label_students:
+                    self.show_placeholder(label, "👤 Waiting for student...")
+                    if label_name in self.name_labels:
+                        number = "2" if label_name == 'videolabel2' else "1"
+                        self.name_labels[label_name].setText(f"Student {number}: Not Connected")
+                        self.name_labels[label_name].setStyleSheet("""
                             QLabel {
                                 font-weight: bold;
                                 font-size: 14px;
@@ -593,6 +648,17 @@ class ProctorDashboard(QtWidgets.QMainWindow):
                                 border: 1px solid #444;
                             }
                         """)
+                    continue
+                
+                client_key = self.video_label_students[label_name]
+                latest = new_frames.get(client_key)
+                if latest:
+                    version, name, student_id, frame = latest
+                    self.update_video_label(label, frame, name, student_id)
+                    self.frame_versions[client_key] = version
+                elif not self.frame_versions.get(client_key):
+                    # Keep the last frame on screen until a newer one arrives
+                    self.show_placeholder(label, f"📷 No video from {self.student_names.get(client_key, 'Student')}")
             
         except Exception as e:
             # Only print error occasionally to avoid spam
@@ -613,6 +679,9 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         
         status = "✅ Verified" if is_identified else "❌ Not Verified"
         score_text = f" | Score: {cheating_score}" if cheating_score > 0 else ""
+        stall_text = " | 📵 No video" if student_info.get('stall_level') else ""
+        if student_info.get('parked'):
+            stall_text = " | 🔄 Reconnecting"
         
         # Get label number
         if label_name == 'videolabel':
@@ -622,7 +691,7 @@ class ProctorDashboard(QtWidgets.QMainWindow):
         else:
             label_num = ""
         
-        label.setText(f"👤 {name} ({student_id}) - {status}{score_text}")
+        label.setText(f"👤 {name} ({student_id}) - {status}{score_text}{stall_text}")
         
         # Color based on verification status
         if is_identified:
@@ -721,13 +790,31 @@ class ProctorDashboard(QtWidgets.QMainWindow):
             self.stop_server()
         except Exception:
             pass
+        self.signals.detach()
         event.accept()
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     
     try:
-        server = ProctorServer(csv_path="students.csv")
+        # PROCTOR_IO_MODE=asyncio serves every student from one event loop thread
+        options = dict(csv_path="students.csv",
+                       io_mode=os.environ.get("PROCTOR_IO_MODE", "threaded"),
+                       # PROCTOR_JOURNAL_DIR=alert_journal keeps every alert on disk (fsynced before its ACK)
+                       journal_dir=os.environ.get("PROCTOR_JOURNAL_DIR") or None,
+                       # PROCTOR_METRICS_PORT=9100 serves Prometheus metrics on localhost
+                       metrics_port=int(os.environ.get("PROCTOR_METRICS_PORT", "0")) or None,
+                       # PROCTOR_RECORD_DIR=recordings keeps every received frame as evidence
+                       record_dir=os.environ.get("PROCTOR_RECORD_DIR") or None,
+                       # PROCTOR_INGRESS_MBPS=200 caps total student video at 200 Mbit/s
+                       ingress_cap=float(os.environ.get("PROCTOR_INGRESS_MBPS", "0")) * 125_000 or None)
+        
+        # PROCTOR_SHARDS=N spreads students over N worker processes on the same ports
+        shards = int(os.environ.get("PROCTOR_SHARDS", "0"))
+        if shards > 1:
+            server = ShardedProctorServer(shards=shards, **options)
+        else:
+            server = ProctorServer(**options)
         window = ProctorDashboard(server)
         window.setWindowTitle("👨‍🏫 Proctor Dashboard")
         window.resize(800, 600)
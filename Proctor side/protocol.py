@@ -0,0 +1,124 @@
+# protocol.py
+import pickle
+import struct
+
+# Every message on the wire is an 8-byte length header followed by the payload
+HEADER_FMT = "Q"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+
+
+def pack_message(payload: bytes) -> bytes:
+    """Prefix payload with its length header"""
+    return struct.pack(HEADER_FMT, len(payload)) + payload
+
+
+def unpack_header(header: bytes, limit: int = None) -> int:
+    """Return the payload length announced by a length header, refusing more than limit bytes"""
+    size = struct.unpack(HEADER_FMT, header)[0]
+    return check_size(size, limit) if limit is not None else size
+
+
+def check_size(size: int, limit: int) -> int:
+    """Return size, or raise ConnectionError if a peer announces more than limit bytes
+    
+    Checked before anything is allocated for the payload, so a forged
+    header cannot make the server reserve gigabytes.
+    """
+    if size > limit:
+        raise ConnectionError(f"Message too large ({size} bytes, limit {limit})")
+    return size
+
+
+# Handshakes and alerts are a few hundred bytes; these caps leave plenty of room
+MAX_HANDSHAKE_BYTES = 64 * 1024
+MAX_ALERT_BYTES = 64 * 1024
+
+
+# Per-frame acknowledgement is constant, so it is serialized once
+FRAME_ACK = pack_message(pickle.dumps({"status": "ack"}))
+
+# ========== ALERT CHANNEL ==========
+# A persistent alert connection starts with ALERT_CHANNEL_MAGIC, then carries
+# CHANNEL_HEADER framed messages both ways. Legacy one-shot alerts start with
+# a HEADER_FMT length instead, which never begins with these bytes.
+ALERT_CHANNEL_MAGIC = b"PXA1"
+CHANNEL_HEADER = struct.Struct("!BII")   # kind, sequence number, payload length
+ALERT_ID = struct.Struct("!I")
+
+MSG_HELLO = 1   # client -> server, JSON {"id", "name", "stream"}
+MSG_ALERT = 2   # client -> server, UTF-8 alert text
+MSG_ACK = 3     # server -> client, echoes the alert seq, payload is ALERT_ID (0: nothing to ingest)
+MSG_EVENT = 4   # client -> server, ALERT_EVENT + UTF-8 detail (structured alert)
+
+# "stream" is a random id for one run of the client: alert seqs are numbered
+# within it, so the server can tell an alert re-sent after a reconnect from a
+# new one. Clients that leave it out are never deduplicated.
+
+# Structured alerts: the channel seq is the client's monotonic alert number and
+# the student id is the one bound by HELLO, so the server parses nothing.
+# Offered to clients by "structured_alerts" in the identification reply.
+ALERT_EVENT = struct.Struct("!Hd")   # violation type code, event time (Unix seconds)
+
+VIOLATION_OTHER = 0
+VIOLATION_WINDOW_SWITCH = 1
+VIOLATION_COPY_PASTE = 2
+VIOLATION_AI_TOOL = 3
+VIOLATION_SESSION = 4
+VIOLATION_TEST = 5
+
+# Type names match the rule categories in rules.json
+VIOLATION_NAMES = {
+    VIOLATION_OTHER: "other",
+    VIOLATION_WINDOW_SWITCH: "window_switch",
+    VIOLATION_COPY_PASTE: "copy_paste",
+    VIOLATION_AI_TOOL: "ai_tool",
+    VIOLATION_SESSION: "session",
+    VIOLATION_TEST: "test",
+}
+
+
+def pack_channel_message(kind: int, seq: int, payload: bytes = b"") -> bytes:
+    return CHANNEL_HEADER.pack(kind, seq, len(payload)) + payload
+
+# ========== VIDEO FRAMES ==========
+# Clients that send "frame_protocol" in the identification handshake and get
+# the same version back stream FRAME_HEADER + raw JPEG bytes instead of
+# pickled frames. Version 0 means the legacy pickle stream.
+FRAME_PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBHIdI")   # version, kind, slot, seq, capture time, payload length
+FRAME_KIND_JPEG = 1   # client -> server
+FRAME_KIND_ACK = 2    # server -> client, echoes seq and capture time (lock-step clients)
+FRAME_KIND_CREDIT = 3 # server -> client, seq field carries the number of frames granted
+FRAME_KIND_CONTROL = 4 # server -> client, seq is the quality level, payload is QUALITY_CONTROL
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+MAX_SLOTS = 0xFFFF
+
+
+# Adaptive quality: clients that send "quality_control" in the handshake and
+# get it back apply every FRAME_KIND_CONTROL message to the frames that follow.
+QUALITY_CONTROL = struct.Struct("!HHBf")   # width, height, JPEG quality, target fps
+
+
+def pack_frame_header(kind: int, slot: int, seq: int, captured_at: float, size: int = 0) -> bytes:
+    return FRAME_HEADER.pack(FRAME_PROTOCOL_VERSION, kind, slot, seq, captured_at, size)
+
+
+def pack_quality_control(slot: int, level: int, width: int, height: int, quality: int, fps: float) -> bytes:
+    return (pack_frame_header(FRAME_KIND_CONTROL, slot, level, 0.0, QUALITY_CONTROL.size)
+            + QUALITY_CONTROL.pack(width, height, quality, fps))
+
+
+def negotiate_frame_protocol(meta: dict) -> int:
+    """Pick the frame protocol version for a handshake (0 = legacy pickle)"""
+    try:
+        requested = int(meta.get("frame_protocol", 0))
+    except (TypeError, ValueError):
+        return 0
+    return FRAME_PROTOCOL_VERSION if requested >= FRAME_PROTOCOL_VERSION else 0
+
+
+def negotiate_credit_window(meta: dict, frame_protocol: int, window: int) -> int:
+    """Frames a client may have in flight (0 = wait for an ACK after every frame)"""
+    if not frame_protocol or not meta.get("credit_window"):
+        return 0
+    return window
@@ -0,0 +1,29 @@
+# qt_bridge.py
+from PyQt6 import QtCore
+from events import (STUDENT_CONNECTED, STUDENT_DISCONNECTED, CHEATING_ALERTS,
+                    STUDENT_STALLED, STUDENT_RECOVERED)
+
+class ServerSignals(QtCore.QObject):
+    """Re-emits server events as Qt signals, delivered on the thread that owns this object"""
+    new_student_connected = QtCore.pyqtSignal(dict)
+    student_disconnected = QtCore.pyqtSignal(str)
+    cheating_alerts = QtCore.pyqtSignal(list)  # one batch of alert dicts per GUI tick
+    student_stalled = QtCore.pyqtSignal(dict)
+    student_recovered = QtCore.pyqtSignal(dict)
+    
+    def __init__(self, events, parent=None):
+        super().__init__(parent)
+        self.events = events
+        self._subscriptions = (
+            (STUDENT_CONNECTED, self.new_student_connected.emit),
+            (STUDENT_DISCONNECTED, self.student_disconnected.emit),
+            (CHEATING_ALERTS, self.cheating_alerts.emit),
+            (STUDENT_STALLED, self.student_stalled.emit),
+            (STUDENT_RECOVERED, self.student_recovered.emit),
+        )
+        for event, handler in self._subscriptions:
+            events.subscribe(event, handler)
+    
+    def detach(self):
+        for event, handler in self._subscriptions:
+            self.events.unsubscribe(event, handler)
@@ -0,0 +1,154 @@
+# quality.py
+from protocol import pack_quality_control
+
+# Quality ladder, best first: width, height, JPEG quality, target fps.
+# Level 0 is what clients send before they get a control message.
+QUALITY_LEVELS = (
+    (640, 480, 70, 20.0),
+    (640, 480, 60, 12.0),
+    (480, 360, 55, 8.0),
+    (480, 360, 45, 5.0),
+    (320, 240, 45, 3.0),
+    (320, 240, 35, 2.0),
+    (160, 120, 30, 1.0),
+)
+
+# JPEG size estimate before a student has sent anything at a level
+DEFAULT_BYTES_PER_FRAME = 30_000
+
+def frame_cost(level) -> float:
+    """Relative JPEG size of one frame at a level (1.0 for 640x480 at quality 70)
+    
+    Rough model: size grows with the pixel count and about linearly with
+    quality in the 30-70 range. Measured sizes correct it per student.
+    """
+    width, height, quality, _ = level
+    return width * height * (quality + 30) / (640 * 480 * 100)
+
+class QualityController:
+    """Splits an ingress cap into per-student budgets and picks a quality level for each
+    
+    Budgets are weighted (watched students and students with recent alerts
+    get more) and water-filled, so bandwidth a student cannot use goes to
+    the others. A student drops to a cheaper level at once but climbs one
+    level per round, and only with `headroom` to spare.
+    """
+    def __init__(self, ingress_cap: float, interval: float = 1.0, watched_weight: float = 4.0,
+                 alert_weight: float = 3.0, alert_window: float = 60.0, headroom: float = 0.8,
+                 levels=QUALITY_LEVELS):
+        self.ingress_cap = ingress_cap  # bytes per second, all students together
+        self.interval = interval
+        self.watched_weight = watched_weight
+        self.alert_weight = alert_weight
+        self.alert_window = alert_window
+        self.headroom = headroom
+        self.levels = levels
+        self._costs = [frame_cost(level) for level in levels]
+        
+        self._counters = {}  # {key: (frames, bytes)} at the previous round
+        self._unit = {}      # {key: measured bytes per frame at cost 1.0}
+        
+        # Last round
+        self.ingress = 0.0   # measured bytes per second
+        self.planned = 0.0   # bytes per second the chosen levels should produce
+        self.rounds = 0
+    
+    def weight(self, watched: bool, recent_alert: bool) -> float:
+        weight = 1.0
+        if watched:
+            weight *= self.watched_weight
+        if recent_alert:
+            weight *= self.alert_weight
+        return weight
+    
+    def demand(self, key, level: int) -> float:
+        """Estimated bytes per second for a student at a level"""
+        unit = self._unit.get(key, DEFAULT_BYTES_PER_FRAME)
+        return unit * self._costs[level] * self.levels[level][3]
+    
+    def _measure(self, key, level, frames: int, nbytes: int):
+        """Update the student's bytes-per-frame estimate from its counters; returns bytes received"""
+        last_frames, last_bytes = self._counters.get(key, (frames, nbytes))
+        self._counters[key] = (frames, nbytes)
+        new_frames, new_bytes = frames - last_frames, nbytes - last_bytes
+        if new_frames > 0 and level is not None:
+            unit = new_bytes / new_frames / self._costs[level]
+            previous = self._unit.get(key)
+            # Smooth over rounds; scene changes move JPEG sizes a lot
+            self._unit[key] = unit if previous is None else 0.5 * previous + 0.5 * unit
+        return max(0, new_bytes)
+    
+    def plan(self, students) -> dict:
+        """Pick a level per student
+        
+        students is a list of (key, current level or None, frames received,
+        bytes received, weight); returns {key: level}.
+        """
+        received = 0
+        for key, level, frames, nbytes, _ in students:
+            received += self._measure(key, level, frames, nbytes)
+        present = {student[0] for student in students}
+        for key in [key for key in self._counters if key not in present]:
+            del self._counters[key]
+            self._unit.pop(key, None)
+        
+        self.ingress = received / self.interval
+        self.rounds += 1
+        
+        # Water-fill: students whose best level fits their share take it, the rest split what is left
+        budgets = {}
+        pending = {student[0]: student[4] for student in students}
+        remaining = self.ingress_cap
+        while pending:
+            share = remaining / sum(pending.values())
+            satisfied = [key for key, weight in pending.items() if self.demand(key, 0) <= share * weight]
+            if not satisfied:
+                for key, weight in pending.items():
+                    budgets[key] = share * weight
+                break
+            for key in satisfied:
+                budgets[key] = self.demand(key, 0)
+                remaining -= budgets[key]
+                del pending[key]
+        
+        levels = {}
+        for key, current, _, _, _ in students:
+            target = self._fit(key, budgets[key])
+            if current is not None and target < current:
+                # Climb one level at a time, and only when it fits with headroom
+                target = current - 1 if self.demand(key, current - 1) <= budgets[key] * self.headroom else current
+            levels[key] = target
+        
+        # The ladder is coarse, so budgets leave slack; spend it on the heaviest weights first
+        planned = sum(self.demand(key, level) for key, level in levels.items())
+        limit = self.ingress_cap * self.headroom
+        for key, current, _, _, _ in sorted(students, key=lambda student: -student[4]):
+            level = levels[key]
+            if level == 0 or (current is not None and level < current):
+                continue
+            extra = self.demand(key, level - 1) - self.demand(key, level)
+            if planned + extra <= limit:
+                levels[key] = level - 1
+                planned += extra
+        
+        self.planned = planned
+        return levels
+    
+    def initial_level(self, students: int) -> int:
+        """Starting level for a new client: an even share of the cap, or less if the cap is spoken for"""
+        limit = self.ingress_cap * self.headroom
+        level = self._fit(None, min(limit / max(1, students), limit - self.planned))
+        # Count the newcomer until the next round measures it
+        self.planned += self.demand(None, level)
+        return level
+    
+    def _fit(self, key, budget: float) -> int:
+        """Best level whose estimated demand fits the budget (the last level if none does)"""
+        for level in range(len(self.levels)):
+            if self.demand(key, level) <= budget:
+                return level
+        return len(self.levels) - 1
+    
+    def control_message(self, slot: int, level: int) -> bytes:
+        width, height, quality, fps = self.levels[level]
+        return pack_quality_control(slot, level, width, height, quality, fps)
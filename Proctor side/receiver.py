@@ -0,0 +1,91 @@
+# receiver.py
+import socket
+import threading
+
+class SocketReceiver:
+    """Per-connection receive path that fills buffers with recv_into"""
+    def __init__(self, sock: socket.socket, is_running=None, initial_size: int = 64 * 1024):
+        self.sock = sock
+        self.is_running = is_running or (lambda: True)
+        self._buffer = bytearray(initial_size)
+        self._view = memoryview(self._buffer)
+        
+        # Counters for bytes / syscalls per frame
+        self.frames = 0
+        self.bytes_received = 0
+        self.recv_calls = 0
+    
+    def _fill(self, view: memoryview):
+        received = 0
+        size = len(view)
+        while received < size:
+            if not self.is_running():
+                raise ConnectionError("Server stopping")
+            try:
+                count = self.sock.recv_into(view[received:])
+            except socket.timeout:
+                continue
+            except OSError as e:
+                raise ConnectionError(f"Socket error: {e}")
+            
+            self.recv_calls += 1
+            if not count:
+                raise ConnectionError("Client disconnected")
+            received += count
+        
+        self.bytes_received += size
+    
+    def read(self, size: int) -> memoryview:
+        """Receive exactly size bytes into the reusable buffer (valid until the next read)"""
+        if size > len(self._buffer):
+            capacity = len(self._buffer)
+            while capacity < size:
+                capacity *= 2
+            self._buffer = bytearray(capacity)
+            self._view = memoryview(self._buffer)
+        
+        view = self._view[:size]
+        self._fill(view)
+        return view
+    
+    def read_owned(self, size: int) -> bytearray:
+        """Receive exactly size bytes into a new buffer that the caller keeps"""
+        buffer = bytearray(size)
+        with memoryview(buffer) as view:
+            self._fill(view)
+        return buffer
+
+class ReceiveStats:
+    """Aggregates receiver counters across live and closed connections"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._live = set()
+        self._closed = [0, 0, 0]  # frames, bytes, recv calls
+    
+    def track(self, receiver: SocketReceiver):
+        with self._lock:
+            self._live.add(receiver)
+    
+    def untrack(self, receiver: SocketReceiver):
+        with self._lock:
+            if receiver in self._live:
+                self._live.discard(receiver)
+                self._closed[0] += receiver.frames
+                self._closed[1] += receiver.bytes_received
+                self._closed[2] += receiver.recv_calls
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            frames, nbytes, calls = self._closed
+            for receiver in self._live:
+                frames += receiver.frames
+                nbytes += receiver.bytes_received
+                calls += receiver.recv_calls
+        
+        return {
+            'frames': frames,
+            'bytes': nbytes,
+            'recv_calls': calls,
+            'bytes_per_frame': nbytes / frames if frames else 0.0,
+            'syscalls_per_frame': calls / frames if frames else 0.0
+        }
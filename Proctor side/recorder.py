@@ -0,0 +1,307 @@
+# recorder.py
+import bisect
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# A segment is SEGMENT_SUFFIX (the JPEGs back to back, as received) plus
+# INDEX_SUFFIX (one INDEX_ENTRY per JPEG). Both are named after the receive
+# time of the segment's first frame in ms. Data is written before its index
+# entries, so the index never points past the data.
+INDEX_ENTRY = struct.Struct("!dQI")   # received at (epoch seconds), offset, length
+SEGMENT_SUFFIX = ".mjpg"
+INDEX_SUFFIX = ".idx"
+
+def _safe_name(student_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", student_id) or "_"
+
+def _map(path: str, multiple: int = 1):
+    """Read-only mmap of a file, cut to a whole number of `multiple`-byte records"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size // multiple * multiple
+        if not size:
+            return None
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+class _SegmentWriter:
+    __slots__ = ("started_at", "size", "data", "index", "chunks", "entries")
+    
+    def __init__(self, base_path: str, started_at: float):
+        self.started_at = started_at
+        self.data = open(base_path + SEGMENT_SUFFIX, "ab")
+        self.index = open(base_path + INDEX_SUFFIX, "ab")
+        self.size = self.data.tell()
+        self.chunks = []
+        self.entries = []
+    
+    def stage(self, received_at: float, jpeg):
+        self.entries.append(INDEX_ENTRY.pack(received_at, self.size, len(jpeg)))
+        self.chunks.append(jpeg)
+        self.size += len(jpeg)
+    
+    def flush(self):
+        if not self.chunks:
+            return
+        self.data.writelines(self.chunks)
+        self.data.flush()
+        self.index.write(b"".join(self.entries))
+        self.index.flush()
+        self.chunks = []
+        self.entries = []
+    
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+class VideoRecorder:
+    """Evidence recording: received JPEGs appended, unchanged, to per-student segments
+    
+    record() never blocks the receive loop. Frames wait in memory for the
+    I/O thread, which writes them in batches every flush_interval; once
+    memory_budget bytes are waiting, new frames are dropped and counted.
+    Reads map the segment files, so seeking never goes through the writer.
+    """
+    def __init__(self, directory: str, segment_seconds: float = 60.0,
+                 segment_bytes: int = 64 * 1024 * 1024, memory_budget: int = 64 * 1024 * 1024,
+                 flush_interval: float = 0.5, max_open: int = 256):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.memory_budget = memory_budget
+        self.flush_interval = flush_interval
+        self.max_open = max_open  # students with open segment files (two descriptors each)
+        
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = []          # (student_id, received_at, jpeg) waiting for the I/O thread
+        self._pending_bytes = 0   # queued plus being written; bounded by memory_budget
+        self._running = False
+        self._thread = None
+        self._writers = OrderedDict()  # {student_id: _SegmentWriter}, least recently written first
+        
+        # Counters
+        self.frames_recorded = 0
+        self.bytes_recorded = 0
+        self.frames_dropped = 0
+        self.batches = 0
+        self.segments_opened = 0
+    
+    # ========== WRITING ==========
+    
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"[RECORDER] Recording to {self.directory}")
+    
+    def record(self, student_id: str, jpeg, received_at: float = None) -> bool:
+        """Queue one JPEG (not copied, so it must not change afterwards); False if dropped"""
+        size = len(jpeg)
+        with self._lock:
+            if not self._running:
+                return False
+            if self._pending_bytes + size > self.memory_budget:
+                self.frames_dropped += 1
+                return False
+            self._queue.append((student_id, received_at or time.time(), jpeg))
+            self._pending_bytes += size
+            if self._pending_bytes * 2 > self.memory_budget:
+                self._wakeup.notify()
+            return True
+    
+    def close(self):
+        """Write what is queued and close every segment"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._running and not self._queue:
+                    self._wakeup.wait(self.flush_interval)
+                batch, self._queue = self._queue, []
+                running = self._running
+            
+            if batch:
+                self._write(batch)
+                with self._lock:
+                    self._pending_bytes -= sum(len(jpeg) for _, _, jpeg in batch)
+            
+            if not running:
+                with self._lock:
+                    if self._queue:
+                        continue
+                for writer in self._writers.values():
+                    writer.close()
+                self._writers.clear()
+                return
+    
+    def _write(self, batch):
+        """Stage a batch per segment, then write each touched segment once"""
+        frames = written = 0
+        touched = set()
+        try:
+            for student_id, received_at, jpeg in batch:
+                writer = self._writer_for(student_id, received_at)
+                writer.stage(received_at, jpeg)
+                touched.add(writer)
+                frames += 1
+                written += len(jpeg)
+            
+            for writer in touched:
+                writer.flush()
+        except OSError as e:
+            print(f"[RECORDER] Write error: {e}")
+        
+        self.frames_recorded += frames
+        self.bytes_recorded += written
+        self.batches += 1
+    
+    def _writer_for(self, student_id: str, received_at: float) -> _SegmentWriter:
+        writer = self._writers.get(student_id)
+        if writer is not None:
+            if (received_at - writer.started_at < self.segment_seconds
+                    and writer.size < self.segment_bytes):
+                self._writers.move_to_end(student_id)
+                return writer
+            writer.close()
+            del self._writers[student_id]
+        
+        while len(self._writers) >= self.max_open:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        
+        student_dir = os.path.join(self.directory, _safe_name(student_id))
+        os.makedirs(student_dir, exist_ok=True)
+        writer = _SegmentWriter(os.path.join(student_dir, f"{int(received_at * 1000):013d}"), received_at)
+        self._writers[student_id] = writer
+        self.segments_opened += 1
+        return writer
+    
+    def stats(self) -> dict:
+        with self._lock:
+            depth, pending = len(self._queue), self._pending_bytes
+        return {
+            'depth': depth,
+            'pending_bytes': pending,
+            'memory_budget': self.memory_budget,
+            'frames_recorded': self.frames_recorded,
+            'bytes_recorded': self.bytes_recorded,
+            'frames_dropped': self.frames_dropped,
+            'frames_per_batch': self.frames_recorded / self.batches if self.batches else 0.0,
+            'segments_opened': self.segments_opened
+        }
+    
+    # ========== READING ==========
+    
+    def segments(self, student_id: str):
+        """(started_at, base path) of every segment of a student, oldest first"""
+        student_dir = os.path.join(self.directory, _safe_name(student_id))
+        try:
+            names = os.listdir(student_dir)
+        except FileNotFoundError:
+            return []
+        stems = sorted(name[:-len(INDEX_SUFFIX)] for name in names if name.endswith(INDEX_SUFFIX))
+        return [(int(stem) / 1000, os.path.join(student_dir, stem)) for stem in stems if stem.isdigit()]
+    
+    def span(self, student_id: str):
+        """(first, last) receive time recorded for a student, or None"""
+        first = last = None
+        for _, base in self.segments(student_id):
+            index = _map(base + INDEX_SUFFIX, INDEX_ENTRY.size)
+            if index is None:
+                continue
+            with index:
+                if first is None:
+                    first = INDEX_ENTRY.unpack_from(index, 0)[0]
+                last = INDEX_ENTRY.unpack_from(index, len(index) - INDEX_ENTRY.size)[0]
+        return (first, last) if first is not None else None
+    
+    def frame_at(self, student_id: str, when: float):
+        """(received_at, JPEG bytes) of the last frame at or before `when`
+        
+        Before the first recorded frame, the first frame is returned. None
+        if nothing was recorded for the student.
+        """
+        segments = self.segments(student_id)
+        if not segments:
+            return None
+        
+        # Newest segment that starts at or before `when`, falling back to older ones if empty
+        start = max(0, bisect.bisect_right([started for started, _ in segments], when) - 1)
+        for position in range(start, -1, -1):
+            found = self._seek(segments[position][1], when)
+            if found:
+                return found
+        for _, base in segments[start + 1:]:
+            found = self._seek(base, when)
+            if found:
+                return found
+        return None
+    
+    def frames_between(self, student_id: str, start: float, end: float):
+        """Yield (received_at, JPEG bytes) for every frame received in [start, end]"""
+        segments = self.segments(student_id)
+        for position, (started, base) in enumerate(segments):
+            if started > end:
+                break
+            if position + 1 < len(segments) and segments[position + 1][0] < start:
+                continue
+            
+            index = _map(base + INDEX_SUFFIX, INDEX_ENTRY.size)
+            if index is None:
+                continue
+            data = _map(base + SEGMENT_SUFFIX)
+            with index:
+                count = len(index) // INDEX_ENTRY.size
+                for entry in range(self._search(index, start - 1e-9) + 1, count):
+                    received_at, offset, length = INDEX_ENTRY.unpack_from(index, entry * INDEX_ENTRY.size)
+                    if received_at > end:
+                        break
+                    if data is not None and offset + length <= len(data):
+                        yield received_at, data[offset:offset + length]
+            if data is not None:
+                data.close()
+    
+    @staticmethod
+    def _search(index, when: float) -> int:
+        """Position of the last index entry received at or before `when` (-1 if none)"""
+        low, high = 0, len(index) // INDEX_ENTRY.size
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(index, middle * INDEX_ENTRY.size)[0] <= when:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+    
+    def _seek(self, base: str, when: float):
+        index = _map(base + INDEX_SUFFIX, INDEX_ENTRY.size)
+        if index is None:
+            return None
+        with index:
+            entry = max(0, self._search(index, when))
+            received_at, offset, length = INDEX_ENTRY.unpack_from(index, entry * INDEX_ENTRY.size)
+        
+        data = _map(base + SEGMENT_SUFFIX)
+        if data is None:
+            return None
+        with data:
+            if offset + length > len(data):
+                return None
+            return received_at, data[offset:offset + length]
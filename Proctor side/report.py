@@ -195,7 +195,7 @@ class ReportWindow(QtWidgets.QDialog):
         
         text = f"👤 {name} (ID: {student_id})\n"
         text += f"Cheating Score: {cheating_score}/100\n"
-        text += f"Violations: {len(alerts)}\n\n"
+        text += f"Violations: {sum(alert.get('count', 1) for alert in alerts)}\n\n"
         
         # Show all alerts/activities
         if alerts:
@@ -203,8 +203,12 @@ class ReportWindow(QtWidgets.QDialog):
                 timestamp = alert.get('timestamp', 'N/A')
                 violation = alert.get('violation', 'Unknown')
                 
-                # Simple formatting
-                text += f"  • [{timestamp}] {violation}\n"
+                # Simple formatting; repeats folded on the server show as a count
+                count = alert.get('count', 1)
+                if count > 1:
+                    text += f"  • [{timestamp}–{alert.get('last_timestamp')}] {violation} (×{count})\n"
+                else:
+                    text += f"  • [{timestamp}] {violation}\n"
         else:
             text += "  ✅ No violations detected\n"
         
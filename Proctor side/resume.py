@@ -0,0 +1,91 @@
+# resume.py
+import secrets
+import threading
+from liveness import TimerWheel
+
+class ResumeTable:
+    """Resume tokens for video sessions, and the sessions parked under them
+    
+    A verified student gets a token at identification. When the connection
+    drops, the server parks the session instead of ending it; a handshake
+    presenting the token within `grace` seconds takes it back, alerts,
+    score and video slot included. Each token works once: a resumed session
+    gets a new one. Parked sessions expire on a timer wheel, so holding a
+    whole room's worth after an access point restart costs nothing per tick.
+    """
+    def __init__(self, now: float, grace: float = 30.0, tick: float = 0.25):
+        self.grace = grace
+        
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(now, tick)
+        self._sessions = {}  # {token: session}, connected or parked
+        self._parked = {}    # {token: session}
+        
+        # Counters
+        self.issued = 0
+        self.parked = 0
+        self.resumed = 0
+        self.expired = 0
+    
+    def issue(self, session) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[token] = session
+            self.issued += 1
+        return token
+    
+    def revoke(self, token: str):
+        with self._lock:
+            self._sessions.pop(token, None)
+            if self._parked.pop(token, None) is not None:
+                self._wheel.cancel(token)
+    
+    def park(self, token: str, now: float) -> bool:
+        """Hold a disconnected session for the grace window; False if the token is not live"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return False
+            self._parked[token] = session
+            self._wheel.schedule(token, now + self.grace)
+            self.parked += 1
+            return True
+    
+    def claim(self, token: str, student_id: str):
+        """Spend a token: the session it was issued for, connected or parked, or None
+        
+        The student id from the handshake must match the session's, so a
+        leaked token alone does not hand over someone else's session.
+        """
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None or session.id != student_id:
+                return None
+            del self._sessions[token]
+            if self._parked.pop(token, None) is not None:
+                self._wheel.cancel(token)
+            self.resumed += 1
+            return session
+    
+    def expire(self, now: float) -> list:
+        """Sessions whose grace window ran out; their tokens are gone"""
+        with self._lock:
+            expired = []
+            for token in self._wheel.advance(now):
+                session = self._parked.pop(token, None)
+                if session is not None:
+                    del self._sessions[token]
+                    expired.append(session)
+            self.expired += len(expired)
+        return expired
+    
+    def stats(self) -> dict:
+        with self._lock:
+            parked = len(self._parked)
+        return {
+            'parked_now': parked,
+            'issued': self.issued,
+            'parked': self.parked,
+            'resumed': self.resumed,
+            'expired': self.expired
+        }
@@ -0,0 +1,175 @@
+# roster.py
+import csv
+import os
+import sqlite3
+import sys
+import threading
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def normalize_name(name: str) -> str:
+    """Case- and whitespace-insensitive key for student names"""
+    return " ".join(name.split()).casefold()
+
+
+def open_roster(path: str):
+    """Roster store for a path: SQLite for .db/.sqlite files, CSV otherwise"""
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        return SqliteRoster(path)
+    return CsvRoster(path)
+
+
+class Roster:
+    """Read-only id -> name lookup that can be reloaded while handshakes run"""
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._reload_lock = threading.Lock()  # one reload at a time; lookups never take it
+    
+    def lookup(self, student_id: str):
+        """(display name, normalized name) for an id, or None"""
+        raise NotImplementedError
+    
+    def __len__(self):
+        raise NotImplementedError
+    
+    def _load(self):
+        """Build the new state and swap it in with a single assignment"""
+        raise NotImplementedError
+    
+    def verify(self, student_id: str, name: str) -> bool:
+        entry = self.lookup(student_id)
+        return entry is not None and entry[1] == normalize_name(name)
+    
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def changed(self) -> bool:
+        return self._stat() != self._mtime
+    
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+    
+    def reload(self) -> bool:
+        """Load the roster again; lookups keep using the old copy until the swap"""
+        with self._reload_lock:
+            mtime = self._stat()
+            try:
+                self._load()
+            except Exception as e:
+                print(f"[ROSTER] Error loading {self.path}: {e}")
+                return False
+            self._mtime = mtime
+            print(f"[ROSTER] Loaded {len(self)} students from {self.path}")
+            return True
+
+
+class CsvRoster(Roster):
+    """Whole roster in a dict; fine for a class list, not for a university"""
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._students = {}  # {id: (name, normalized name)}
+    
+    def _load(self):
+        students = {}
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                student_id = (row.get('id') or '').strip()
+                student_name = (row.get('name') or '').strip()
+                if student_id and student_name:
+                    students[student_id] = (student_name, normalize_name(student_name))
+        self._students = students
+    
+    def lookup(self, student_id: str):
+        return self._students.get(student_id)
+    
+    def __len__(self):
+        return len(self._students)
+
+
+class SqliteRoster(Roster):
+    """Indexed SQLite roster; only the rows that are looked up are read
+    
+    Each thread keeps its own read-only connection and reopens it after a
+    reload, so a reload never waits for in-flight lookups.
+    """
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._generation = 0
+        self._count = 0
+        self._local = threading.local()
+    
+    def _connect(self):
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+    
+    def _load(self):
+        connection = self._connect()
+        try:
+            count = connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        finally:
+            connection.close()
+        self._count = count
+        self._generation += 1
+    
+    def lookup(self, student_id: str):
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            if getattr(local, 'connection', None):
+                local.connection.close()
+            local.connection = self._connect()
+            local.generation = self._generation
+        return local.connection.execute(
+            "SELECT name, name_key FROM students WHERE id = ?", (student_id,)).fetchone()
+    
+    def __len__(self):
+        return self._count
+    
+    @staticmethod
+    def build(csv_path: str, db_path: str, batch: int = 50000) -> int:
+        """Import a roster CSV into a new database and atomically replace db_path"""
+        tmp_path = db_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        
+        connection = sqlite3.connect(tmp_path)
+        count = 0
+        try:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("CREATE TABLE students (id TEXT PRIMARY KEY, name TEXT NOT NULL, "
+                               "name_key TEXT NOT NULL) WITHOUT ROWID")
+            with open(csv_path, 'r', encoding='utf-8') as file:
+                rows = []
+                for row in csv.DictReader(file):
+                    student_id = (row.get('id') or '').strip()
+                    student_name = (row.get('name') or '').strip()
+                    if not (student_id and student_name):
+                        continue
+                    rows.append((student_id, student_name, normalize_name(student_name)))
+                    if len(rows) >= batch:
+                        connection.executemany("INSERT OR REPLACE INTO students VALUES (?, ?, ?)", rows)
+                        count += len(rows)
+                        rows = []
+                connection.executemany("INSERT OR REPLACE INTO students VALUES (?, ?, ?)", rows)
+                count += len(rows)
+            connection.commit()
+        finally:
+            connection.close()
+        
+        os.replace(tmp_path, db_path)
+        return count
+
+
+if __name__ == "__main__":
+    # python roster.py students.csv students.db
+    if len(sys.argv) != 3:
+        print("usage: python roster.py <roster.csv> <roster.db>")
+        sys.exit(1)
+    imported = SqliteRoster.build(sys.argv[1], sys.argv[2])
+    print(f"[ROSTER] Imported {imported} rows into {sys.argv[2]}")
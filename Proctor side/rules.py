@@ -0,0 +1,79 @@
+# rules.py
+import json
+import os
+import re
+from typing import NamedTuple
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+class Verdict(NamedTuple):
+    severity: str
+    category: str
+    icon: str
+
+def trie_pattern(words) -> str:
+    """Regex matching any of words, factored by common prefix so a miss fails on its first character"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True  # end of a word
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+    
+    return build(trie)
+
+class RuleEngine:
+    """Alert classifier: every keyword of every rule in one compiled regex
+    
+    Rules are listed most important first. Keywords match whole words only,
+    case-insensitively, so "ai" no longer fires on "email" or "maintain".
+    When several rules match, the earliest rule in the file wins.
+    """
+    def __init__(self, rules: list, default: dict):
+        self.default = Verdict(default.get('severity', 'low'), default.get('category', 'other'),
+                               default.get('icon', '⚠️'))
+        self.verdicts = [Verdict(rule['severity'], rule['category'], rule.get('icon', self.default.icon))
+                         for rule in rules]
+        
+        self._keywords = {}  # {lowercase keyword: rule index}, first rule wins
+        for index, rule in enumerate(rules):
+            for keyword in rule['keywords']:
+                self._keywords.setdefault(keyword.lower(), index)
+        
+        # Lookarounds instead of \b so keywords ending in "+" still need a boundary;
+        # classify() lowercases the text, so no IGNORECASE
+        self._pattern = re.compile(r"(?<!\w)(?:" + trie_pattern(self._keywords) + r")(?!\w)") \
+            if self._keywords else None
+    
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULES_PATH):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                config = json.load(file)
+            engine = cls(config.get('rules', []), config.get('default', {}))
+            print(f"[RULES] Loaded {len(engine.verdicts)} rules from {path}")
+            return engine
+        except Exception as e:
+            print(f"[RULES] Error loading {path}: {e}; every alert will be 'low'")
+            return cls([], {})
+    
+    def classify(self, text: str) -> Verdict:
+        """Severity, category and icon for an alert message, in one scan"""
+        if self._pattern is None:
+            return self.default
+        
+        best = None
+        for keyword in self._pattern.findall(text.lower()):
+            index = self._keywords[keyword]
+            if index == 0:
+                return self.verdicts[0]
+            if best is None or index < best:
+                best = index
+        return self.verdicts[best] if best is not None else self.default
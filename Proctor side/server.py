@@ -1,23 +1,144 @@
 import socket
 import pickle
-import struct
 import threading
-import cv2
+import heapq
 import time
-import numpy as np
 import traceback
-import csv
+import json
 import re
 from collections import deque
 from datetime import datetime
-from PyQt6 import QtCore
+from protocol import (HEADER_SIZE, FRAME_ACK, pack_message, unpack_header, check_size,
+                      MAX_HANDSHAKE_BYTES, MAX_ALERT_BYTES,
+                      ALERT_CHANNEL_MAGIC, CHANNEL_HEADER, ALERT_ID,
+                      MSG_HELLO, MSG_ALERT, MSG_ACK, MSG_EVENT, pack_channel_message,
+                      ALERT_EVENT, VIOLATION_NAMES,
+                      FRAME_HEADER, FRAME_PROTOCOL_VERSION, FRAME_KIND_JPEG, FRAME_KIND_ACK,
+                      FRAME_KIND_CREDIT, MAX_FRAME_BYTES, MAX_SLOTS, pack_frame_header,
+                      negotiate_frame_protocol, negotiate_credit_window)
+from async_engine import AsyncIngestEngine
+from receiver import SocketReceiver, ReceiveStats
+from alert_dispatcher import AlertDispatcher
+from frame_store import FrameStore
+from change_log import ChangeLog
+from journal import AlertJournal
+from roster import open_roster, normalize_name
+from rules import RuleEngine, DEFAULT_RULES_PATH
+from metrics import Histogram, TimedLock, RateTracker, MetricsServer, family
+from recorder import VideoRecorder
+from quality import QualityController
+from alert_coalescer import AlertCoalescer
+from liveness import LivenessTracker
+from resume import ResumeTable
+from admission import AdmissionController
+from events import (EventBus, STUDENT_CONNECTED, STUDENT_DISCONNECTED, CHEATING_ALERTS,
+                    STUDENT_STALLED, STUDENT_RECOVERED)
 
-HEADER_FMT = "Q"
+IO_MODES = ("threaded", "asyncio")
 
-class ServerSignals(QtCore.QObject):
-    new_student_connected = QtCore.pyqtSignal(dict)
-    student_disconnected = QtCore.pyqtSignal(str)
-    cheating_alert = QtCore.pyqtSignal(dict)
+class StudentSession:
+    """Per-connection student record; __slots__ keeps it small for large rooms"""
+    __slots__ = ("name", "id", "sock", "addr", "client_key", "is_identified",
+                 "last_frame_time", "cheating_alerts", "activity_log", "cheating_score",
+                 "alerts_high", "alerts_medium", "alerts_low",
+                 "slot", "frame_protocol", "credit_window", "version",
+                 "frames_received", "bytes_received", "quality_level", "control", "stall_level",
+                 "resume_token", "epoch", "parked_at")
+    
+    def __init__(self, name: str, id: str, sock: socket.socket, addr: tuple,
+                 client_key: str = "", is_identified: bool = False, last_frame_time: float = 0.0):
+        self.name = name
+        self.id = id
+        self.sock = sock
+        self.addr = addr
+        self.client_key = client_key
+        self.is_identified = is_identified
+        self.last_frame_time = last_frame_time
+        self.cheating_alerts = []  # alert dicts, in arrival order
+        self.activity_log = []     # "[HH:MM:SS] ⚠️ message" lines
+        self.cheating_score = 0
+        
+        # Alert counts by severity
+        self.alerts_high = 0
+        self.alerts_medium = 0
+        self.alerts_low = 0
+        
+        self.slot = 0             # video slot, 0 until verified
+        self.frame_protocol = 0   # negotiated frame protocol version
+        self.credit_window = 0    # negotiated frames in flight (0 = lock-step)
+        self.version = 0          # state version of the last dashboard-visible change
+        self.frames_received = 0  # counters for the metrics endpoint
+        self.bytes_received = 0
+        self.quality_level = None # adaptive quality level (None: client can't be controlled)
+        self.control = None       # latest control message; the receive loop sends each one once
+        self.stall_level = 0      # frame-age thresholds passed since the last frame
+        self.resume_token = None  # lets a reconnect within the grace window take the session back
+        self.epoch = 0            # bumped when a resumed connection takes the session over
+        self.parked_at = None     # when the connection dropped, while the session is parked
+    
+    def record_alert(self, alert_data: dict, entry: str, count: int = 1):
+        """Append an alert and its activity log entry, counting `count` occurrences of it"""
+        self.cheating_alerts.append(alert_data)
+        self.activity_log.append(entry)
+        self.count_alert(alert_data, count)
+    
+    def count_alert(self, alert_data: dict, count: int = 1):
+        """Update counters and score; a repeat folded into an earlier alert's count is counted too"""
+        severity = alert_data.get('severity')
+        if severity == "high":
+            self.alerts_high += count
+        elif severity == "medium":
+            self.alerts_medium += count
+        else:
+            self.alerts_low += count
+        self.cheating_score = min(100, (self.alerts_high + self.alerts_medium + self.alerts_low) * 10)
+    
+    def alert_counts(self) -> dict:
+        return {"high": self.alerts_high, "medium": self.alerts_medium, "low": self.alerts_low}
+    
+    def snapshot(self) -> dict:
+        """What a session takes along when it moves to another server process"""
+        return {
+            'name': self.name,
+            'id': self.id,
+            'alerts': self.cheating_alerts,
+            'activity_log': self.activity_log,
+            'alerts_by_severity': self.alert_counts(),
+            'epoch': self.epoch
+        }
+    
+    def restore(self, state: dict):
+        """Take over the alerts, log and score of a snapshot"""
+        self.cheating_alerts = state['alerts']
+        self.activity_log = state['activity_log']
+        counts = state['alerts_by_severity']
+        self.alerts_high, self.alerts_medium, self.alerts_low = counts['high'], counts['medium'], counts['low']
+        self.cheating_score = min(100, (self.alerts_high + self.alerts_medium + self.alerts_low) * 10)
+        self.epoch = state['epoch'] + 1
+
+class AlertStream:
+    """Channel seqs a client run has had ingested, so alerts it re-sends after a reconnect are not ingested twice"""
+    __slots__ = ("lock", "last_seq", "alert_ids")
+    
+    RECENT = 1024  # alert ids kept for re-sent ACKs
+    
+    def __init__(self):
+        self.lock = threading.Lock()  # held across ingest, so two channels of one client can't both take a seq
+        self.last_seq = 0
+        self.alert_ids = {}  # {seq: alert id}, the most recent RECENT
+    
+    def seen(self, seq: int):
+        """Alert id a seq was ingested as (0 for one too old to remember), or None if it is new"""
+        alert_id = self.alert_ids.get(seq)
+        if alert_id is None and seq <= self.last_seq:
+            return 0
+        return alert_id
+    
+    def record(self, seq: int, alert_id: int):
+        self.alert_ids[seq] = alert_id
+        self.last_seq = max(self.last_seq, seq)
+        if len(self.alert_ids) > self.RECENT:
+            del self.alert_ids[next(iter(self.alert_ids))]
 
 # Node for doubly linked list
 class StudentNode:
@@ -27,13 +148,18 @@ class StudentNode:
         self.next = None
         self.prev = None
 
-# Doubly Linked List for connection management
+# Doubly Linked List for connection management, with hash indexes on the side
 class StudentLinkedList:
     def __init__(self):
         self.head = None
         self.tail = None
         self.size = 0
         self.lookup = {}
+        
+        # Secondary indexes: {key: {client_key: node}} so duplicates are kept
+        self.by_name = {}
+        self.by_id = {}
+        self.identified = {}  # {client_key: node}, identified students only
     
     def append(self, client_key, student):
         new_node = StudentNode(client_key, student)
@@ -47,6 +173,7 @@ class StudentLinkedList:
         
         self.lookup[client_key] = new_node
         self.size += 1
+        self._index(new_node)
         return new_node
     
     def remove(self, client_key):
@@ -67,146 +194,307 @@ class StudentLinkedList:
         
         del self.lookup[client_key]
         self.size -= 1
+        self._unindex(node)
         return True
     
+    def _index(self, node):
+        student = node.student
+        self.by_name.setdefault(normalize_name(student.name), {})[node.client_key] = node
+        self.by_id.setdefault(student.id, {})[node.client_key] = node
+        if student.is_identified:
+            self.identified[node.client_key] = node
+    
+    def _unindex(self, node):
+        student = node.student
+        for index, key in ((self.by_name, normalize_name(student.name)), (self.by_id, student.id)):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(node.client_key, None)
+                if not bucket:
+                    del index[key]
+        self.identified.pop(node.client_key, None)
+    
     def get(self, client_key):
         node = self.lookup.get(client_key)
         return node.student if node else None
     
-    def items(self):
-        pairs = []
+    def find_by_name(self, name):
+        """First connected student with this name (case-insensitive), or None"""
+        bucket = self.by_name.get(normalize_name(name))
+        return next(iter(bucket.values())).student if bucket else None
+    
+    def find_by_id(self, student_id):
+        """First connected student with this id, or None"""
+        bucket = self.by_id.get(student_id)
+        return next(iter(bucket.values())).student if bucket else None
+    
+    def iter_items(self):
+        """Walk (client_key, student) pairs without copying; hold the students lock"""
         current = self.head
         while current:
-            pairs.append((current.client_key, current.student))
+            yield current.client_key, current.student
             current = current.next
-        return pairs
+    
+    def iter_identified(self):
+        """(client_key, student) pairs for identified students only; hold the students lock"""
+        for client_key, node in self.identified.items():
+            yield client_key, node.student
+    
+    def items(self):
+        return list(self.iter_items())
     
     def values(self):
-        students = []
-        current = self.head
-        while current:
-            students.append(current.student)
-            current = current.next
-        return students
+        return [student for _, student in self.iter_items()]
     
     def keys(self):
-        keys = []
-        current = self.head
-        while current:
-            keys.append(current.client_key)
-            current = current.next
-        return keys
+        return [client_key for client_key, _ in self.iter_items()]
     
     def __len__(self):
         return self.size
 
 class ProctorServer:
     def __init__(self, host: str = "0.0.0.0", port: int = 9999, 
-                 cheat_port: int = 8888, csv_path: str = "students.csv"):
+                 cheat_port: int = 8888, csv_path: str = "students.csv",
+                 io_mode: str = "threaded", credit_window: int = 4,
+                 journal_dir: str = None, alert_cache: int = 1000, roster_path: str = None,
+                 rules_path: str = DEFAULT_RULES_PATH, reuse_port: bool = False,
+                 metrics_port: int = None, record_dir: str = None, ingress_cap: float = None,
+                 alert_rate: float = 1.0, alert_burst: int = 5, coalesce_window: float = 5.0,
+                 stall_after=(5.0, 20.0), reap_after: float = 60.0, resume_grace: float = 30.0,
+                 accept_backlog: int = 512, handshake_workers: int = 8, handshake_queue: int = 1024):
+        if io_mode not in IO_MODES:
+            raise ValueError(f"Unknown io_mode '{io_mode}', expected one of {IO_MODES}")
+        
         self.host = host
         self.port = port
         self.cheat_port = cheat_port
         self.csv_path = csv_path
+        self.io_mode = io_mode
+        # Several processes may listen on the same ports (see sharding.py)
+        self.reuse_port = reuse_port
+        
+        # Frames a credit-based client may have in flight before it must drop
+        self.credit_window = max(1, credit_window)
+        
+        # A whole class connects within the same minute: a deep accept queue, then a
+        # bounded handshake pool; past its queue clients are told when to retry
+        self.accept_backlog = accept_backlog
+        self._admission = AdmissionController(workers=handshake_workers, queue_size=handshake_queue)
         
-        self.student_database = self._load_student_database()
-        print(f"[SERVER] Loaded {len(self.student_database)} students")
+        # CSV or SQLite roster (roster_path wins over csv_path), reloadable while running
+        self.roster = open_roster(roster_path or csv_path)
+        self.roster.reload()
+        print(f"[SERVER] Loaded {len(self.roster)} students")
+        
+        # Severity, category and icon for alert messages
+        self.rules = RuleEngine.from_file(rules_path)
         
         self._sock = None
         self._cheat_sock = None
         self._running = False
         self._cheat_detection_active = False
+        # asyncio mode runs every socket as a coroutine on one event loop thread
+        self._async_engine = AsyncIngestEngine(self) if io_mode == "asyncio" else None
+        
+        # Telemetry is always collected; metrics_port serves it on localhost
+        self._handshake_time = Histogram("proctor_handshake_seconds",
+                                         "Time from connect to the identification reply")
+        self._student_rates = RateTracker()
+        self._metrics_server = MetricsServer(self.render_metrics, port=metrics_port) if metrics_port else None
         
         self._connected_students = StudentLinkedList()
-        self._students_lock = threading.RLock()
+        self._students_lock = TimedLock(threading.RLock(), Histogram(
+            "proctor_students_lock_wait_seconds", "Wait for _students_lock, contended acquires only"))
+        
+        # Change feed for dashboard polling (guarded by _students_lock):
+        # every field change bumps the version and stamps the student with it
+        self._change_log = ChangeLog()
+        
+        self._frames = FrameStore(decode_time=Histogram(
+            "proctor_frame_decode_seconds", "JPEG decode time for dashboard tiles"))
+        # Optional evidence recording of every received JPEG
+        self._recorder = VideoRecorder(record_dir) if record_dir else None
+        
+        # Optional cap on video ingress (bytes/s), enforced by steering client quality
+        self._quality = QualityController(ingress_cap) if ingress_cap else None
+        self._watched = frozenset()  # client_keys on the dashboard's screen
+        self._recv_stats = ReceiveStats()
         
-        self._student_frames = {}
+        # Students whose video goes quiet are flagged at each stall_after age and
+        # disconnected after reap_after seconds (None: never); checked on a timer wheel
+        self.stall_after = stall_after
+        self.reap_after = reap_after
+        self._liveness = self._new_liveness()
         
-        self._alert_queue = deque(maxlen=1000)
-        self._alert_queue_lock = threading.Lock()
+        # A dropped session is parked for resume_grace seconds (0: never) for its client to resume
+        self.resume_grace = resume_grace
+        self._resume = ResumeTable(time.time(), resume_grace)
         
-        self._alert_processing = False
-        self._alert_thread = None
+        # Video slots identify a session in binary frame headers (guarded by _students_lock)
+        self._free_slots = []
+        self._next_slot = 1
         
-        self._all_alerts = []
+        self._alert_dispatcher = AlertDispatcher(self._emit_alert_batch)
+        # Floods from one student (a held Ctrl+C, a flapping window title) fold into one alert with a count
+        self._coalescer = AlertCoalescer(rate=alert_rate, burst=alert_burst, window=coalesce_window)
+        
+        # Most recent alerts only; the journal (when enabled) holds all of them
+        self._all_alerts = deque(maxlen=alert_cache)
+        self._alert_total = 0
         self._all_alerts_lock = threading.Lock()
         
+        # Alert channels re-send what was not ACKed; {(student id, client stream): AlertStream}
+        self._alert_streams = {}
+        self._alert_streams_lock = threading.Lock()
+        
         self._student_history = {}
         self._exam_start_time = None
         
-        self.signals = ServerSignals()
+        self._journal = AlertJournal(journal_dir) if journal_dir else None
+        if self._journal:
+            self._replay_journal()
+        
+        # The dashboard's Qt bridge, tools and tests subscribe to student and alert events here
+        self.events = EventBus()
     
-    def _load_student_database(self):
-        student_db = {}
-        try:
-            with open(self.csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    student_id = row.get('id', '').strip()
-                    student_name = row.get('name', '').strip()
-                    if student_id and student_name:
-                        student_db[student_id] = student_name
-            print(f"[SERVER] Database loaded: {len(student_db)} students")
-        except Exception as e:
-            print(f"[SERVER] Error loading CSV: {e}")
-        return student_db
+    def _new_liveness(self):
+        return LivenessTracker(self._last_frame_time, self._on_stall, self._on_reap, time.time(),
+                               thresholds=self.stall_after, reap_after=self.reap_after)
+    
+    def reload_roster(self, force: bool = False) -> bool:
+        """Reload the roster in the background if its file changed; handshakes keep running"""
+        if self.roster.reloading or not (force or self.roster.changed()):
+            return False
+        threading.Thread(target=self.roster.reload, daemon=True).start()
+        return True
+    
+    def _replay_journal(self):
+        """Rebuild alerts and per-student history left by a previous run of this exam"""
+        records = self._journal.replay()
+        for alert_data in records:
+            # The journal holds every occurrence; fold them the way they were folded live
+            key = alert_data.get('student_id') or alert_data.get('student_name')
+            signature = (alert_data.get('type'), alert_data.get('violation'))
+            shown = self._coalescer.offer(key, signature, alert_data, alert_data.get('event_time', 0.0))
+            if shown:
+                self._all_alerts.append(alert_data)
+            
+            student_id = alert_data.get('student_id')
+            if not student_id:
+                continue
+            history = self._student_history.get(student_id)
+            if history is None:
+                history = self._student_history[student_id] = {
+                    'name': alert_data.get('student_name', ''),
+                    'id': student_id,
+                    'alerts': [],
+                    'activity_log': [],
+                    'cheating_score': 0,
+                    'alerts_by_severity': {"high": 0, "medium": 0, "low": 0},
+                    'disconnection_time': "recovered from journal",
+                    'recovered': True
+                }
+            if shown:
+                history['alerts'].append(alert_data)
+                history['activity_log'].append(f"[{alert_data.get('timestamp')}] ⚠️ {alert_data.get('violation')}")
+            # Folded repeats count towards the score like shown alerts
+            severity = alert_data.get('severity')
+            history['alerts_by_severity'][severity if severity in ("high", "medium") else "low"] += 1
+            history['cheating_score'] = min(100, sum(history['alerts_by_severity'].values()) * 10)
+        
+        self._coalescer.reset()
+        self._alert_total = len(records)
+        if records:
+            print(f"[SERVER] Recovered {len(records)} alerts for "
+                  f"{len(self._student_history)} students from {self._journal.directory}")
+    
+    def _wait_durable(self, alert_id: int):
+        """Hold an alert ACK until the journal has the alert on disk
+        
+        Raises ConnectionError if it does not get there in time: the alert
+        is not ACKed, and the client re-sends it when it reconnects.
+        """
+        if self._journal and not self._journal.wait(alert_id):
+            raise ConnectionError(f"Alert {alert_id} not written to the journal")
     
     def _start_alert_processor(self):
-        self._alert_processing = True
-        self._alert_thread = threading.Thread(target=self._process_alerts, daemon=True)
-        self._alert_thread.start()
+        self._alert_dispatcher.start()
         print("[SERVER] Alert processor started")
     
-    def _process_alerts(self):
-        while self._alert_processing:
-            try:
-                alert = None
-                with self._alert_queue_lock:
-                    if self._alert_queue:
-                        alert = self._alert_queue.popleft()
-                
-                if alert:
-                    self.signals.cheating_alert.emit(alert)
-                    print(f"[SERVER] Signal emitted: {alert.get('student_name')} - {alert.get('violation')}")
-                
-                time.sleep(0.01)
-                
-            except Exception as e:
-                print(f"[ALERT PROCESSOR] Error: {e}")
+    def _emit_alert_batch(self, alerts):
+        self.events.publish(CHEATING_ALERTS, alerts)
+        print(f"[SERVER] Published {len(alerts)} alert(s)")
+    
+    def _coalesce_loop(self):
+        """Re-send folded alert groups with their final count once they go quiet"""
+        coalescer = self._coalescer
+        while self._cheat_detection_active:
+            time.sleep(max(0.1, coalescer.window / 2))
+            for alert_data in coalescer.expire(time.time()):
+                update = dict(alert_data, coalesced=True)
+                self._alert_dispatcher.put(update, block=False)
     
     def _stop_alert_processor(self):
-        self._alert_processing = False
-        if self._alert_thread:
-            self._alert_thread.join(timeout=1.0)
+        self._alert_dispatcher.stop()
         print("[SERVER] Alert processor stopped")
     
     def start(self):
         try:
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self._sock.bind((self.host, self.port))
-            self._sock.listen(10)
-            self._running = True
+            if self._journal:
+                self._journal.open()
+            if self._metrics_server:
+                self._metrics_server.start()
+            if self._recorder:
+                self._recorder.start()
+            # Fresh wheels, so a restart does not tick through the time it was stopped
+            self._liveness = self._new_liveness()
+            self._resume = ResumeTable(time.time(), self.resume_grace)
+            
+            if self.io_mode == "asyncio":
+                self._running = True
+                self._async_engine.start_identification()
+            else:
+                self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.reuse_port:
+                    self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self._sock.bind((self.host, self.port))
+                self._sock.listen(self.accept_backlog)
+                self._running = True
+                
+                self._admission.start(self._admit_client)
+                threading.Thread(target=self._accept_loop, daemon=True).start()
             
-            threading.Thread(target=self._accept_loop, daemon=True).start()
+            if self._quality:
+                threading.Thread(target=self._quality_loop, daemon=True).start()
+            threading.Thread(target=self._liveness_loop, daemon=True).start()
             
-            print(f"[SERVER] Identification server on {self.host}:{self.port}")
+            print(f"[SERVER] Identification server on {self.host}:{self.port} ({self.io_mode})")
             return True
         except Exception as e:
+            self._running = False
             print(f"[SERVER] Error starting: {e}")
             return False
     
     def start_cheating_detection(self):
         try:
-            self._cheat_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._cheat_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self._cheat_sock.bind((self.host, self.cheat_port))
-            self._cheat_sock.listen(20)
+            if self.io_mode == "asyncio":
+                self._async_engine.start_alerts()
+            else:
+                self._cheat_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._cheat_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.reuse_port:
+                    self._cheat_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self._cheat_sock.bind((self.host, self.cheat_port))
+                self._cheat_sock.listen(self.accept_backlog)
             self._cheat_detection_active = True
             self._exam_start_time = time.time()
             
             self._start_alert_processor()
+            threading.Thread(target=self._coalesce_loop, daemon=True).start()
             
-            threading.Thread(target=self._accept_cheating_alerts, daemon=True).start()
+            if self.io_mode == "threaded":
+                threading.Thread(target=self._accept_cheating_alerts, daemon=True).start()
             
             print(f"[SERVER] Cheating detection on {self.host}:{self.cheat_port}")
             return True
@@ -234,11 +522,15 @@ class ProctorServer:
             sock.settimeout(10.0)
             print(f"[CHEAT] Handling alert from {addr}")
             
-            # FIXED: Use proper protocol with length header
+            prefix = self._recv_exact(sock, len(ALERT_CHANNEL_MAGIC))
+            if prefix == ALERT_CHANNEL_MAGIC:
+                self._serve_alert_channel(sock, addr)
+                return
+            
+            # Legacy client: one alert per connection
             try:
                 # Read message length (8 bytes)
-                len_bytes = self._recv_exact(sock, 8)
-                msg_len = struct.unpack("Q", len_bytes)[0]
+                msg_len = unpack_header(prefix + self._recv_exact(sock, HEADER_SIZE - len(prefix)), MAX_ALERT_BYTES)
                 print(f"[CHEAT] Message length: {msg_len} bytes")
                 
                 # Read exact message
@@ -256,79 +548,13 @@ class ProctorServer:
                 print("[CHEAT] Empty alert received")
                 return
             
-            # Parse student name and message
-            student_name = "Unknown"
-            alert_message = alert_text
-            
-            # Extract student name (format: "Name [timestamp]: Alert message")
-            match = re.match(r'^(.+?)\s*\[[\d:]+\]:\s*(.+)$', alert_text)
-            if match:
-                student_name = match.group(1).strip()
-                alert_message = match.group(2).strip()
-            else:
-                # Try simpler format: "Name: Alert message"
-                match = re.match(r'^(.+?):\s*(.+)$', alert_text)
-                if match:
-                    student_name = match.group(1).strip()
-                    alert_message = match.group(2).strip()
-            
-            print(f"[CHEAT] Parsed: Student='{student_name}', Alert='{alert_message}'")
-            
-            # Determine severity
-            severity = "low"
-            alert_lower = alert_message.lower()
-            
-            if any(kw in alert_lower for kw in ["chatgpt", "openai", "chegg", "ai tool", "ai"]):
-                severity = "high"
-            elif any(kw in alert_lower for kw in ["copy", "paste", "ctrl+c", "ctrl+v"]):
-                severity = "medium"
-            elif any(kw in alert_lower for kw in ["window", "switch", "tab", "alt+tab"]):
-                severity = "medium"
-            
-            # Create alert data
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            alert_data = {
-                'timestamp': timestamp,
-                'student_name': student_name,
-                'violation': alert_message,
-                'severity': severity
-            }
-            
-            # Store in global list
-            with self._all_alerts_lock:
-                self._all_alerts.append(alert_data)
-            
-            # Update student's data
-            with self._students_lock:
-                student_found = False
-                for client_key, student in self._connected_students.items():
-                    if student.name.lower() == student_name.lower():
-                        student.cheating_alerts.append(alert_data)
-                        
-                        if not hasattr(student, 'activity_log'):
-                            student.activity_log = []
-                        student.activity_log.append(f"[{timestamp}] ⚠️ {alert_message}")
-                        
-                        student.cheating_score = min(100, len(student.cheating_alerts) * 10)
-                        
-                        student_found = True
-                        print(f"[CHEAT] ✓ Updated student: {student_name}")
-                        break
-                
-                if not student_found:
-                    print(f"[CHEAT] ⚠ Student '{student_name}' not in connected list")
-            
-            # Add to queue for signal emission
-            with self._alert_queue_lock:
-                self._alert_queue.append(alert_data)
-            
-            print(f"[CHEAT] ✓ Alert queued for processing")
+            alert_id = self._ingest_alert_text(alert_text)
+            self._wait_durable(alert_id)
             
             # FIXED: Send acknowledgement with proper protocol
             try:
-                ack_msg = pickle.dumps({"status": "received", "alert_id": len(self._all_alerts)})
-                sock.sendall(struct.pack("Q", len(ack_msg)) + ack_msg)
-                print(f"[CHEAT] ✓ ACK sent")
+                sock.sendall(self._alert_ack(alert_id))
+                print("[CHEAT] ✓ ACK sent")
             except Exception as e:
                 print(f"[CHEAT] ACK send error: {e}")
                 
@@ -342,118 +568,268 @@ class ProctorServer:
                 pass
             print(f"[CHEAT] Connection closed for {addr}")
     
+    def _serve_alert_channel(self, sock: socket.socket, addr: tuple):
+        """Persistent alert stream: pipelined alerts and ACKs over one connection"""
+        kind, _, size = CHANNEL_HEADER.unpack(self._recv_exact(sock, CHANNEL_HEADER.size))
+        payload = self._recv_exact(sock, check_size(size, MAX_ALERT_BYTES))
+        if kind != MSG_HELLO:
+            print(f"[CHEAT] Alert channel from {addr} did not start with HELLO")
+            return
+        
+        hello = json.loads(payload.decode('utf-8'))
+        print(f"[CHEAT] ✓ Alert channel open for {hello.get('name')} ({hello.get('id')})")
+        
+        receiver = SocketReceiver(sock, lambda: self._cheat_detection_active)
+        try:
+            while self._cheat_detection_active:
+                kind, seq, size = CHANNEL_HEADER.unpack(receiver.read(CHANNEL_HEADER.size))
+                payload = receiver.read(check_size(size, MAX_ALERT_BYTES))
+                alert_id = self._accept_channel_message(hello, kind, seq, payload)
+                if alert_id is None:
+                    continue
+                
+                sock.sendall(pack_channel_message(MSG_ACK, seq, ALERT_ID.pack(alert_id)))
+        except ConnectionError:
+            pass
+        print(f"[CHEAT] Alert channel closed for {hello.get('name')}")
+    
+    def _alert_ack(self, alert_id: int) -> bytes:
+        return pack_message(pickle.dumps({"status": "received", "alert_id": alert_id}))
+    
+    def _accept_channel_message(self, hello: dict, kind: int, seq: int, payload, block: bool = True):
+        """Ingest one alert-channel message and wait until it is durable; returns the alert id to ACK, or None
+        
+        Every alert is ACKed, with id 0 if there was nothing to ingest, so
+        the client stops re-sending it. A client that names its run in HELLO
+        ("stream") has re-sent alerts the server already ingested (only the
+        ACK was lost) ACKed again instead of ingested twice. Without a stream
+        there is no telling a re-send from a restarted client's new seq 1.
+        """
+        if kind not in (MSG_ALERT, MSG_EVENT):
+            return None
+        
+        student_id, stream_id = hello.get('id'), hello.get('stream')
+        if not (student_id and stream_id):
+            alert_id = self._ingest_channel_message(hello, kind, seq, payload, block=block)
+        else:
+            with self._alert_streams_lock:
+                stream = self._alert_streams.get((student_id, stream_id))
+                if stream is None:
+                    stream = self._alert_streams[(student_id, stream_id)] = AlertStream()
+            with stream.lock:
+                alert_id = stream.seen(seq)
+                if alert_id is None:
+                    alert_id = self._ingest_channel_message(hello, kind, seq, payload, block=block)
+                    stream.record(seq, alert_id)
+                else:
+                    print(f"[CHEAT] Alert #{seq} from {hello.get('name')} already ingested, ACKing again")
+        
+        if alert_id:
+            self._wait_durable(alert_id)
+        return alert_id
+    
+    def _ingest_channel_message(self, hello: dict, kind: int, seq: int, payload, block: bool = True) -> int:
+        """Ingest one alert-channel message; returns its alert id, or 0 if it held no alert"""
+        if kind == MSG_EVENT:
+            if len(payload) < ALERT_EVENT.size:
+                return 0
+            violation_type, event_time = ALERT_EVENT.unpack_from(payload)
+            detail = str(payload[ALERT_EVENT.size:], 'utf-8', errors='ignore').strip()
+            return self._ingest_alert(hello.get('name', 'Unknown'), detail, student_id=hello.get('id'),
+                                      alert_type=VIOLATION_NAMES.get(violation_type, "other"),
+                                      event_time=event_time, client_seq=seq, block=block)
+        
+        if kind == MSG_ALERT:
+            alert_text = str(payload, 'utf-8', errors='ignore').strip()
+            if alert_text:
+                return self._ingest_alert_text(alert_text, block=block)
+        return 0
+    
+    def _ingest_alert_text(self, alert_text: str, block: bool = True) -> int:
+        """Parse a free-text "Name [HH:MM:SS]: message" alert and ingest it"""
+        # Parse student name and message
+        student_name = "Unknown"
+        alert_message = alert_text
+        
+        # Extract student name (format: "Name [timestamp]: Alert message")
+        match = re.match(r'^(.+?)\s*\[[\d:]+\]:\s*(.+)$', alert_text)
+        if match:
+            student_name = match.group(1).strip()
+            alert_message = match.group(2).strip()
+        else:
+            # Try simpler format: "Name: Alert message"
+            match = re.match(r'^(.+?):\s*(.+)$', alert_text)
+            if match:
+                student_name = match.group(1).strip()
+                alert_message = match.group(2).strip()
+        
+        print(f"[CHEAT] Parsed: Student='{student_name}', Alert='{alert_message}'")
+        return self._ingest_alert(student_name, alert_message, block=block)
+    
+    def _ingest_alert(self, student_name: str, alert_message: str, student_id: str = None,
+                      alert_type: str = None, event_time: float = None, client_seq: int = None,
+                      block: bool = True) -> int:
+        """Classify, store and queue one alert; returns its alert id
+        
+        Structured alerts pass student_id, alert_type, event_time and
+        client_seq; free-text alerts are routed by name and typed by the rules.
+        """
+        verdict = self.rules.classify(alert_message)
+        # event_time is the student's clock; received_at is ours, the one recordings are indexed by
+        received_at = time.time()
+        event_time = event_time or received_at
+        
+        # Create alert data
+        timestamp = datetime.fromtimestamp(event_time).strftime("%H:%M:%S")
+        alert_data = {
+            'timestamp': timestamp,
+            'student_name': student_name,
+            'violation': alert_message,
+            'severity': verdict.severity,
+            'category': verdict.category,
+            'icon': verdict.icon,
+            'type': alert_type or verdict.category,
+            'event_time': event_time,
+            'received_at': received_at
+        }
+        if client_seq is not None:
+            alert_data['client_seq'] = client_seq
+        
+        with self._students_lock:
+            if student_id:
+                student = self._connected_students.find_by_id(student_id)
+            else:
+                student = self._connected_students.find_by_name(student_name)
+            if student:
+                alert_data['student_id'] = student.id
+                alert_data['student_name'] = student.name
+        
+        # Every occurrence is journaled (group commit), before coalescing can touch the dict;
+        # with a journal the alert id is its journal sequence number, the one _wait_durable waits on
+        if self._journal:
+            try:
+                alert_id = self._journal.append(alert_data)
+            except RuntimeError as e:
+                # Closed while the server stops: nothing to ACK, the client re-sends the alert
+                raise ConnectionError(f"Alert not journaled: {e}")
+        with self._all_alerts_lock:
+            self._alert_total += 1
+            if not self._journal:
+                alert_id = self._alert_total
+        
+        shown = self._coalescer.offer(alert_data.get('student_id') or student_name,
+                                      (alert_data['type'], alert_message), alert_data, time.time())
+        
+        # Update student's data; a folded repeat only changed the count of an alert it already has
+        with self._students_lock:
+            if student and shown:
+                student.record_alert(alert_data, f"[{timestamp}] ⚠️ {alert_message}")
+            elif student:
+                student.count_alert(alert_data)
+            if student:
+                self._touch(student)
+        if not shown:
+            return alert_id
+        
+        if student:
+            print(f"[CHEAT] ✓ Updated student: {student_name}")
+        else:
+            print(f"[CHEAT] ⚠ Student '{student_name}' not in connected list")
+        with self._all_alerts_lock:
+            self._all_alerts.append(alert_data)
+        
+        # Add to queue for signal emission; a full queue pushes back on the sender
+        if self._alert_dispatcher.put(alert_data, block=block):
+            print("[CHEAT] ✓ Alert queued for processing")
+        else:
+            print("[CHEAT] ⚠ Alert queue full, alert not shown on dashboard")
+        return alert_id
+    
     def _accept_loop(self):
         while self._running:
             try:
                 client, addr = self._sock.accept()
-                threading.Thread(target=self._handle_client, 
-                               args=(client, addr), daemon=True).start()
+                # Handshakes wait for a worker; a full queue gets a retry-after hint instead
+                if not self._admission.submit(client, addr):
+                    self._turn_away(client)
             except Exception as e:
                 if self._running:
                     print(f"[SERVER] Accept error: {e}")
     
-    def _handle_client(self, sock: socket.socket, addr: tuple):
-        client_key = f"{addr[0]}:{addr[1]}"
+    def _busy_reply(self) -> bytes:
+        retry_after = self._admission.retry_after()
+        return pack_message(pickle.dumps({
+            "status": "busy",
+            "retry_after": retry_after,
+            "message": f"Server busy, retry in {retry_after:g}s"
+        }))
+    
+    def _turn_away(self, sock: socket.socket):
+        try:
+            sock.settimeout(1.0)
+            sock.sendall(self._busy_reply())
+        except OSError:
+            pass
+        finally:
+            sock.close()
+    
+    def _admit_client(self, sock: socket.socket, addr: tuple, waited: float):
+        """Handshake worker: identify the student, then hand the connection to its own thread"""
+        if not self._admission.started(waited):
+            self._turn_away(sock)
+            return
         
+        client_key = f"{addr[0]}:{addr[1]}"
+        started = time.perf_counter()
+        student = None
         try:
-            sock.settimeout(10.0)
-            
-            len_data = struct.unpack("Q", self._recv_exact(sock, 8))[0]
-            data = self._recv_exact(sock, len_data)
-            meta = pickle.loads(data)
+            # A client that connects and sends nothing (a laptop that lost Wi-Fi, a port
+            # scan) must not hold a worker: the whole handshake gets 10 seconds
+            sock.settimeout(1.0)
+            deadline = time.monotonic() + 10.0
             
-            candidate_name = meta.get("name", "").strip()
-            candidate_id = meta.get("id", "").strip()
+            len_data = unpack_header(self._recv_exact(sock, HEADER_SIZE, deadline), MAX_HANDSHAKE_BYTES)
+            meta = pickle.loads(self._recv_exact(sock, len_data, deadline))
             
-            print(f"[SERVER] New student: {candidate_name} ({candidate_id})")
-            
-            is_verified = False
-            if candidate_id in self.student_database:
-                expected_name = self.student_database[candidate_id]
-                if candidate_name.lower() == expected_name.lower():
-                    is_verified = True
-            
-            from dataclasses import dataclass, field
-            from typing import List
-            
-            @dataclass
-            class ConnectedStudent:
-                name: str
-                id: str
-                sock: socket.socket
-                addr: tuple
-                is_identified: bool = False
-                frame_buffer: bytes = None
-                last_frame_time: float = 0
-                cheating_alerts: List[dict] = field(default_factory=list)
-                activity_log: List[str] = field(default_factory=list)
-                cheating_score: int = 0
-                client_key: str = ""
-            
-            student = ConnectedStudent(
-                name=candidate_name,
-                id=candidate_id,
-                sock=sock,
-                addr=addr,
-                is_identified=is_verified,
-                last_frame_time=time.time(),
-                client_key=client_key
-            )
-            
-            with self._students_lock:
-                self._connected_students.append(client_key, student)
-            
-            self._student_frames[client_key] = None
-            
-            if is_verified:
-                result = {
-                    "status": "identified",
-                    "id": candidate_id,
-                    "name": candidate_name,
-                    "cheat_port": self.cheat_port
-                }
-            else:
-                result = {
-                    "status": "not_identified",
-                    "id": candidate_id,
-                    "name": candidate_name
-                }
-            
-            result_bytes = pickle.dumps(result)
-            sock.sendall(struct.pack("Q", len(result_bytes)) + result_bytes)
-            
-            self.signals.new_student_connected.emit({
-                'id': candidate_id,
-                'name': candidate_name,
-                'is_identified': is_verified,
-                'client_key': client_key,
-                'cheating_score': 0
-            })
+            student, result = self._identify_student(meta, sock, addr, client_key)
+            sock.sendall(pack_message(pickle.dumps(result)))
+            sock.settimeout(10.0)
+            self._handshake_time.observe(waited + time.perf_counter() - started)
+        except Exception as e:
+            print(f"[SERVER] Client error {client_key}: {e}")
+            traceback.print_exc()
+            if student:
+                # A resumed session is registered under its original key
+                self._unregister_student(student.client_key, student.epoch)
+            try:
+                sock.close()
+            except:
+                pass
+            return
+        finally:
+            self._admission.finished(time.perf_counter() - started)
+        
+        threading.Thread(target=self._handle_client, args=(sock, student), daemon=True).start()
+    
+    def _handle_client(self, sock: socket.socket, student):
+        # A resumed session keeps the key it was registered under
+        client_key, epoch = student.client_key, student.epoch
+        
+        try:
+            self._announce_student(student)
             
-            if is_verified:
-                print(f"[SERVER] Starting video for {candidate_name}")
-                while self._running:
-                    try:
-                        frame_len = struct.unpack("Q", self._recv_exact(sock, 8))[0]
-                        frame_data = self._recv_exact(sock, frame_len)
-                        jpg_buf = pickle.loads(frame_data)
-                        
-                        self._student_frames[client_key] = jpg_buf
-                        
-                        with self._students_lock:
-                            node = self._connected_students.lookup.get(client_key)
-                            if node:
-                                node.student.last_frame_time = time.time()
-                        
-                        ack = pickle.dumps({"status": "ack"})
-                        sock.sendall(struct.pack("Q", len(ack)) + ack)
-                        
-                    except ConnectionError:
-                        break
-                    except Exception as e:
-                        if self._running:
-                            print(f"[SERVER] Frame error: {e}")
-                        break
+            if student.is_identified:
+                print(f"[SERVER] Starting video for {student.name}")
+                try:
+                    if student.frame_protocol:
+                        self._receive_frames(sock, student)
+                    else:
+                        self._receive_legacy_frames(sock, client_key)
+                except ConnectionError:
+                    pass
+                except Exception as e:
+                    if self._running:
+                        print(f"[SERVER] Frame error: {e}")
             else:
                 time.sleep(2)
                 
@@ -461,42 +837,415 @@ class ProctorServer:
             print(f"[SERVER] Client error {client_key}: {e}")
             traceback.print_exc()
         finally:
-            student_name = "Unknown"
-            with self._students_lock:
-                node = self._connected_students.lookup.get(client_key)
-                if node:
-                    student_name = node.student.name
-                    
-                    if node.student.is_identified:
-                        self._save_student_history(node.student)
-                    
-                    self._connected_students.remove(client_key)
-            
-            if client_key in self._student_frames:
-                del self._student_frames[client_key]
-            
-            print(f"[SERVER] Student disconnected: {student_name}")
-            self.signals.student_disconnected.emit(student_name)
+            self._unregister_student(client_key, epoch)
             
             try:
                 sock.close()
             except:
                 pass
     
-    def _recv_exact(self, sock: socket.socket, size: int) -> bytes:
-        """Receive exactly size bytes"""
-        data = b""
-        while len(data) < size and self._running:
+    def _receive_frames(self, sock: socket.socket, student):
+        """Binary frame stream: FRAME_HEADER followed by raw JPEG bytes"""
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        receiver = SocketReceiver(sock, lambda: self._running)
+        self._recv_stats.track(receiver)
+        consumed = 0
+        grant_batch = max(1, student.credit_window // 2)
+        sent_control = None
+        try:
+            while self._running:
+                version, kind, slot, seq, captured_at, size = FRAME_HEADER.unpack(
+                    receiver.read(FRAME_HEADER.size))
+                if version != FRAME_PROTOCOL_VERSION or size > MAX_FRAME_BYTES:
+                    raise ConnectionError(f"Bad frame header (version={version}, size={size})")
+                
+                if kind != FRAME_KIND_JPEG or slot != student.slot:
+                    receiver.read(size)
+                    continue
+                
+                # The JPEG is received straight into the buffer the frame store keeps
+                self._store_frame(student.client_key, receiver.read_owned(size))
+                receiver.frames += 1
+                
+                # A new quality level goes out ahead of the ACK or credit it rides with
+                if student.control is not sent_control:
+                    sent_control = student.control
+                    sock.sendall(sent_control)
+                
+                if not student.credit_window:
+                    sock.sendall(pack_frame_header(FRAME_KIND_ACK, slot, seq, captured_at))
+                    continue
+                
+                # Hand credit back in batches instead of acknowledging every frame
+                consumed += 1
+                if consumed >= grant_batch:
+                    sock.sendall(pack_frame_header(FRAME_KIND_CREDIT, slot, consumed, time.time()))
+                    consumed = 0
+        finally:
+            self._recv_stats.untrack(receiver)
+    
+    def _receive_legacy_frames(self, sock: socket.socket, client_key: str):
+        """Pickled frame stream from clients that did not negotiate a frame protocol"""
+        receiver = SocketReceiver(sock, lambda: self._running)
+        self._recv_stats.track(receiver)
+        try:
+            while self._running:
+                frame_len = unpack_header(receiver.read(HEADER_SIZE), MAX_FRAME_BYTES)
+                self._store_frame(client_key, pickle.loads(receiver.read(frame_len)))
+                receiver.frames += 1
+                sock.sendall(FRAME_ACK)
+        finally:
+            self._recv_stats.untrack(receiver)
+    
+    # ========== SESSION LIFECYCLE (shared by all io modes) ==========
+    
+    def _identify_student(self, meta: dict, sock, addr: tuple, client_key: str):
+        """Verify a handshake, register the student and build the reply"""
+        student = self._resume_session(meta, meta.get("resume_token"), sock, addr)
+        if student:
+            return student, self._identified_reply(student, resumed=True)
+        
+        candidate_name = meta.get("name", "").strip()
+        candidate_id = meta.get("id", "").strip()
+        
+        print(f"[SERVER] New student: {candidate_name} ({candidate_id})")
+        
+        is_verified = self.roster.verify(candidate_id, candidate_name)
+        moved = None
+        if is_verified:
+            # A verified student whose session is still parked takes it back as if it held the token
+            student = self._resume_session(meta, self._parked_token(candidate_id), sock, addr)
+            if student:
+                return student, self._identified_reply(student, resumed=True)
+            moved = self._take_over_session(meta)
+        
+        student = StudentSession(
+            name=candidate_name,
+            id=candidate_id,
+            sock=sock,
+            addr=addr,
+            client_key=client_key,
+            is_identified=is_verified,
+            last_frame_time=time.time()
+        )
+        if is_verified:
+            student.frame_protocol = negotiate_frame_protocol(meta)
+        student.credit_window = negotiate_credit_window(meta, student.frame_protocol, self.credit_window)
+        if self._quality and student.frame_protocol and meta.get("quality_control"):
+            # New clients start from an even share instead of full quality
+            student.quality_level = self._quality.initial_level(len(self._connected_students) + 1)
+        
+        with self._students_lock:
+            if is_verified:
+                student.slot = self._allocate_slot()
+                if self.resume_grace and meta.get("session_resume"):
+                    student.resume_token = self._resume.issue(student)
+                
+                # Alerts recovered from the journal follow the student into the new session
+                recovered = self._student_history.get(candidate_id)
+                if moved:
+                    student.restore(moved)
+                elif recovered and recovered.get('recovered'):
+                    del self._student_history[candidate_id]
+                    for alert_data in recovered['alerts']:
+                        student.record_alert(alert_data, f"[{alert_data.get('timestamp')}] ⚠️ {alert_data.get('violation')}",
+                                             alert_data.get('count', 1))
+            self._connected_students.append(client_key, student)
+            self._touch(student)
+        
+        self._frames.add(client_key)
+        
+        if is_verified:
+            self._liveness.track(client_key, student.last_frame_time)
+            result = self._identified_reply(student, resumed=bool(moved))
+        else:
+            result = {
+                "status": "not_identified",
+                "id": candidate_id,
+                "name": candidate_name
+            }
+        return student, result
+    
+    def _identified_reply(self, student, resumed: bool = False) -> dict:
+        return {
+            "status": "identified",
+            "id": student.id,
+            "name": student.name,
+            "cheat_port": self.cheat_port,
+            "frame_protocol": student.frame_protocol,
+            "slot": student.slot,
+            "credit_window": student.credit_window,
+            "quality_control": student.quality_level is not None,
+            "quality": self._quality.levels[student.quality_level] if student.quality_level is not None else None,
+            "structured_alerts": True,
+            "resume_token": student.resume_token,
+            "resume_grace": self.resume_grace,
+            "resumed": resumed
+        }
+    
+    def _parked_token(self, student_id: str):
+        """Resume token of a parked session for this student id, or None"""
+        with self._students_lock:
+            student = self._connected_students.find_by_id(student_id)
+            return student.resume_token if student and student.parked_at is not None else None
+    
+    def _take_over_session(self, meta: dict):
+        """Snapshot of this student's session held by another server process, which gives it up; None if there is none
+        
+        A single server holds every session; sharded workers override this.
+        """
+        return None
+    
+    def _resume_session(self, meta: dict, token, sock, addr: tuple):
+        """Reattach a handshake to the session its resume token was issued for; None if it can't be
+        
+        The session may be parked or still look connected (a dropped Wi-Fi
+        link is often noticed by the client first); in the second case the
+        old connection is closed and its handler finds the session taken
+        over. Negotiated options come from the new handshake, everything
+        else (slot, alerts, score, quality level) stays.
+        """
+        if not token:
+            return None
+        
+        with self._students_lock:
+            student = self._resume.claim(token, meta.get("id", "").strip())
+            if student is None or self._connected_students.get(student.client_key) is not student:
+                return None
+            
+            previous = None if student.parked_at is not None else (student.sock, student.addr)
+            student.sock, student.addr = sock, addr
+            student.epoch += 1
+            student.parked_at = None
+            student.frame_protocol = negotiate_frame_protocol(meta)
+            student.credit_window = negotiate_credit_window(meta, student.frame_protocol, self.credit_window)
+            if not (student.frame_protocol and meta.get("quality_control")):
+                student.quality_level = None
+            else:
+                # The reply carries the current level
+                student.control = None
+            student.last_frame_time = time.time()
+            student.stall_level = 0
+            student.resume_token = self._resume.issue(student)
+            self._touch(student)
+        
+        if previous:
+            self._close_connection(*previous)
+        self._liveness.track(student.client_key, student.last_frame_time)
+        print(f"[SERVER] Resumed session: {student.name} ({student.id}) on slot {student.slot}")
+        return student
+    
+    def _touch(self, student):
+        """Record a change to a student's dashboard fields (caller holds _students_lock)"""
+        student.version = self._change_log.touch(student.client_key)
+    
+    def _forget(self, client_key: str):
+        """Leave a tombstone for a removed student (caller holds _students_lock)"""
+        self._change_log.forget(client_key)
+    
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return heapq.heappop(self._free_slots)
+        if self._next_slot > MAX_SLOTS:
+            raise RuntimeError("No free video slots")
+        self._next_slot += 1
+        return self._next_slot - 1
+    
+    def _announce_student(self, student):
+        self.events.publish(STUDENT_CONNECTED, {
+            'id': student.id,
+            'name': student.name,
+            'is_identified': student.is_identified,
+            'client_key': student.client_key,
+            'cheating_score': student.cheating_score,
+            'resumed': student.epoch > 0
+        })
+    
+    def _announce_departure(self, client_key: str, student_name: str):
+        self.events.publish(STUDENT_DISCONNECTED, student_name)
+    
+    def _store_frame(self, client_key: str, jpg_buf: bytes):
+        self._frames.put(client_key, jpg_buf)
+        
+        student_id = None
+        recovered = 0
+        with self._students_lock:
+            node = self._connected_students.lookup.get(client_key)
+            if node:
+                student = node.student
+                now = time.time()
+                gap = now - student.last_frame_time
+                student.last_frame_time = now
+                student.frames_received += 1
+                student.bytes_received += len(jpg_buf)
+                student_id = student.id
+                if student.stall_level:
+                    recovered = self._liveness.recovered(client_key, now) or student.stall_level
+                    student.stall_level = 0
+                    self._touch(student)
+        
+        if recovered:
+            print(f"[LIVENESS] {student.name} recovered after {gap:.1f}s without video")
+            self._announce_recovery(student, recovered, gap)
+        if self._recorder and student_id:
+            self._recorder.record(student_id, jpg_buf, student.last_frame_time)
+    
+    # ========== LIVENESS ==========
+    
+    def _liveness_loop(self):
+        """Tick the liveness and resume wheels; each tick only looks at the sessions whose timers fire"""
+        liveness = self._liveness
+        while self._running and liveness is self._liveness:
+            time.sleep(liveness.tick)
+            now = time.time()
+            liveness.advance(now)
+            for student in self._resume.expire(now):
+                print(f"[SERVER] Resume window closed for {student.name}")
+                self._unregister_student(student.client_key)
+    
+    def _last_frame_time(self, client_key: str):
+        """Last frame time for the liveness tracker, None once the student is gone (no lock: one dict read)"""
+        node = self._connected_students.lookup.get(client_key)
+        return node.student.last_frame_time if node else None
+    
+    def _on_stall(self, client_key: str, level: int, age: float):
+        with self._students_lock:
+            student = self._connected_students.get(client_key)
+            if not student:
+                return
+            student.stall_level = level
+            self._touch(student)
+        print(f"[LIVENESS] {student.name} has sent no video for {age:.1f}s (level {level})")
+        self._announce_stall(student, level, age)
+    
+    def _on_reap(self, client_key: str, age: float):
+        with self._students_lock:
+            student = self._connected_students.get(client_key)
+        if not student:
+            return
+        print(f"[LIVENESS] Closing {student.name}'s session after {age:.1f}s without video")
+        self._close_connection(student.sock, student.addr)
+    
+    def _close_connection(self, sock, addr: tuple):
+        """Drop a student's connection; its handler then unregisters it as for any disconnect"""
+        if self._async_engine:
+            self._async_engine.close_client(f"{addr[0]}:{addr[1]}")
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def _announce_stall(self, student, level: int, age: float):
+        self.events.publish(STUDENT_STALLED, {
+            'client_key': student.client_key,
+            'name': student.name,
+            'id': student.id,
+            'level': level,
+            'age': age
+        })
+    
+    def _announce_recovery(self, student, level: int, gap: float):
+        self.events.publish(STUDENT_RECOVERED, {
+            'client_key': student.client_key,
+            'name': student.name,
+            'id': student.id,
+            'level': level,
+            'gap': gap
+        })
+    
+    def _quality_loop(self):
+        """Re-plan every student's quality level against the ingress cap"""
+        quality = self._quality
+        while self._running:
+            time.sleep(quality.interval)
+            now = time.time()
+            with self._students_lock:
+                students = []
+                for client_key, student in self._connected_students.iter_identified():
+                    if student.quality_level is None:
+                        continue
+                    alerts = student.cheating_alerts
+                    recent_alert = bool(alerts) and now - alerts[-1].get('received_at', 0) < quality.alert_window
+                    students.append((client_key, student.quality_level, student.frames_received,
+                                     student.bytes_received, quality.weight(client_key in self._watched, recent_alert)))
+            if not students:
+                continue
+            
+            levels = quality.plan(students)
+            with self._students_lock:
+                for client_key, level in levels.items():
+                    student = self._connected_students.get(client_key)
+                    if student and student.quality_level != level:
+                        student.quality_level = level
+                        student.control = quality.control_message(student.slot, level)
+    
+    def _unregister_student(self, client_key: str, epoch: int = None, moved: bool = False):
+        """End a session when its connection closes, or park it if it can be resumed
+        
+        epoch is the session epoch the closing connection was attached at; a
+        session a resumed connection has taken over since, or one already
+        ended, is left alone. A moved session continues in another server
+        process, so it is neither parked nor kept in the history.
+        """
+        with self._students_lock:
+            node = self._connected_students.lookup.get(client_key)
+            if node is None:
+                return
+            student = node.student
+            if epoch is not None and student.epoch != epoch:
+                return
+            student_name = student.name
+            
+            parked = not moved and student.parked_at is None and self._running and \
+                self._resume.park(student.resume_token, time.time())
+            if parked:
+                student.parked_at = time.time()
+                student.sock = None
+                self._touch(student)
+            else:
+                if student.resume_token:
+                    self._resume.revoke(student.resume_token)
+                
+                if student.is_identified and not moved:
+                    self._save_student_history(student)
+                
+                if student.slot:
+                    heapq.heappush(self._free_slots, student.slot)
+                
+                self._connected_students.remove(client_key)
+                self._forget(client_key)
+        
+        self._liveness.forget(client_key)
+        if parked:
+            # Tile, slot and alerts stay put until the client resumes or the grace window closes
+            print(f"[SERVER] Connection lost: {student_name}, holding the session for {self.resume_grace:g}s")
+            return
+        self._frames.remove(client_key)
+        
+        print(f"[SERVER] Student {'moved' if moved else 'disconnected'}: {student_name}")
+        self._announce_departure(client_key, student_name)
+    
+    def _recv_exact(self, sock: socket.socket, size: int, deadline: float = None) -> bytearray:
+        """Receive exactly size bytes; raises ConnectionError past deadline (time.monotonic), if given"""
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size and self._running:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise ConnectionError("Timed out")
             try:
-                chunk = sock.recv(min(4096, size - len(data)))
-                if not chunk:
+                count = sock.recv_into(view[received:])
+                if not count:
                     raise ConnectionError("Client disconnected")
-                data += chunk
+                received += count
             except socket.timeout:
                 continue
+            except ConnectionError:
+                raise
             except Exception as e:
                 raise ConnectionError(f"Socket error: {e}")
-        return data
+        return data if received == size else data[:received]
     
     def _save_student_history(self, student):
         if not student.id:
@@ -505,9 +1254,10 @@ class ProctorServer:
         self._student_history[student.id] = {
             'name': student.name,
             'id': student.id,
-            'alerts': student.cheating_alerts.copy() if hasattr(student, 'cheating_alerts') else [],
-            'activity_log': student.activity_log.copy() if hasattr(student, 'activity_log') else [],
-            'cheating_score': student.cheating_score if hasattr(student, 'cheating_score') else 0,
+            'alerts': student.cheating_alerts.copy(),
+            'activity_log': student.activity_log.copy(),
+            'cheating_score': student.cheating_score,
+            'alerts_by_severity': student.alert_counts(),
             'disconnection_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
     
@@ -517,6 +1267,16 @@ class ProctorServer:
         
         self._stop_alert_processor()
         
+        # Connections still waiting for a handshake worker are dropped
+        for sock, _ in self._admission.stop():
+            try:
+                sock.close()
+            except OSError:
+                pass
+        
+        if self._async_engine:
+            self._async_engine.stop()
+        
         with self._students_lock:
             for client_key, student in self._connected_students.items():
                 if student.is_identified:
@@ -526,8 +1286,25 @@ class ProctorServer:
                 except:
                     pass
             self._connected_students = StudentLinkedList()
+            self._free_slots = []
+            self._next_slot = 1
+            
+            # Everyone is gone; pollers resynchronise from a full snapshot
+            self._change_log.reset()
         
-        self._student_frames.clear()
+        self._frames.clear()
+        with self._alert_streams_lock:
+            self._alert_streams.clear()
+        
+        # A clean stop closes the exam: its journal is archived, not replayed next time
+        if self._journal:
+            self._journal.close(archive=True)
+        
+        if self._recorder:
+            self._recorder.close()
+        
+        if self._metrics_server:
+            self._metrics_server.stop()
         
         for sock in [self._sock, self._cheat_sock]:
             if sock:
@@ -542,84 +1319,190 @@ class ProctorServer:
     
     # ========== DASHBOARD METHODS ==========
     
+    def _student_info(self, client_key, student):
+        return {
+            'name': student.name,
+            'id': student.id,
+            'is_identified': student.is_identified,
+            'cheating_score': student.cheating_score,
+            'alert_count': len(student.cheating_alerts),
+            'client_key': client_key,
+            'activity_log': student.activity_log.copy()
+        }
+    
     def get_all_students_info(self):
-        students_info = {}
         with self._students_lock:
-            for client_key, student in self._connected_students.items():
-                students_info[client_key] = {
-                    'name': student.name,
-                    'id': student.id,
-                    'is_identified': student.is_identified,
-                    'cheating_score': student.cheating_score if hasattr(student, 'cheating_score') else 0,
-                    'alert_count': len(student.cheating_alerts) if hasattr(student, 'cheating_alerts') else 0,
-                    'client_key': client_key,
-                    'activity_log': student.activity_log.copy() if hasattr(student, 'activity_log') else []
-                }
-        return students_info
+            return {client_key: self._student_info(client_key, student)
+                    for client_key, student in self._connected_students.iter_items()}
+    
+    def get_student_info(self, client_key):
+        """Info for one connected student, or None"""
+        with self._students_lock:
+            student = self._connected_students.get(client_key)
+            return self._student_info(client_key, student) if student else None
     
     def get_connected_students(self):
-        students = []
         with self._students_lock:
-            for client_key, student in self._connected_students.items():
-                students.append({
-                    'name': student.name,
-                    'id': student.id,
-                    'is_identified': student.is_identified,
-                    'cheating_score': student.cheating_score if hasattr(student, 'cheating_score') else 0,
-                    'alert_count': len(student.cheating_alerts) if hasattr(student, 'cheating_alerts') else 0,
-                    'client_key': client_key,
-                    'activity_log': student.activity_log.copy() if hasattr(student, 'activity_log') else []
-                })
-        return students
+            return [self._student_info(client_key, student)
+                    for client_key, student in self._connected_students.iter_items()]
+    
+    def _student_summary(self, client_key, student):
+        return {
+            'name': student.name,
+            'id': student.id,
+            'is_identified': student.is_identified,
+            'cheating_score': student.cheating_score,
+            'alert_count': len(student.cheating_alerts),
+            'activity_count': len(student.activity_log),
+            'alerts_by_severity': student.alert_counts(),
+            'stall_level': student.stall_level,
+            'parked': student.parked_at is not None,
+            'client_key': client_key,
+            'version': student.version
+        }
+    
+    def get_student_changes(self, since: int = 0):
+        """Students changed after version `since`, without copying activity logs
+        
+        Returns {'version', 'reset', 'changed': {client_key: summary},
+        'removed': [client_key], 'connected', 'identified'}. Pass the returned
+        version back on the next call. Apply 'removed' before 'changed', since a
+        client_key can reconnect. With reset=True, 'changed' is every connected
+        student and the caller should drop whatever it had.
+        """
+        with self._students_lock:
+            reset, changed_keys, removed = self._change_log.since(since)
+            if reset:
+                changed = {client_key: self._student_summary(client_key, student)
+                           for client_key, student in self._connected_students.iter_items()}
+            else:
+                changed = {client_key: self._student_summary(client_key, self._connected_students.get(client_key))
+                           for client_key in changed_keys}
+            
+            return {
+                'version': self._change_log.version,
+                'reset': reset,
+                'changed': changed,
+                'removed': removed,
+                'connected': len(self._connected_students),
+                'identified': len(self._connected_students.identified)
+            }
+    
+    def get_student_activity(self, client_key, start: int = 0):
+        """Activity log entries from index `start` on, for callers that keep their own copy"""
+        with self._students_lock:
+            student = self._connected_students.get(client_key)
+            return student.activity_log[start:] if student else []
+    
+    def get_student_counts(self):
+        """(connected, verified) without walking the registry"""
+        with self._students_lock:
+            return len(self._connected_students), len(self._connected_students.identified)
     
     def get_identified_students(self):
-        identified = {}
         with self._students_lock:
-            for student in self._connected_students.values():
-                if student.is_identified:
-                    identified[student.id] = student.name
-        return identified
+            return {student.id: student.name
+                    for _, student in self._connected_students.iter_identified()}
     
     def get_student_frames(self):
-        frames = []
+        """(name, id, frame) for every identified student with a frame"""
+        return [(name, student_id, frame)
+                for _, name, student_id, frame in self.get_frames_since().values()]
+    
+    def get_frames_since(self, versions=None):
+        """Frames newer than the caller's versions: {client_key: (version, name, id, frame)}
+        
+        With versions=None every identified student is checked. JPEGs are
+        decoded at most once per new frame and outside _students_lock.
+        """
         with self._students_lock:
-            for client_key, student in self._connected_students.items():
-                if student.is_identified:
-                    frame_data = self._student_frames.get(client_key)
-                    if frame_data:
-                        try:
-                            npbuf = np.frombuffer(frame_data, dtype=np.uint8)
-                            frame = cv2.imdecode(npbuf, cv2.IMREAD_COLOR)
-                            if frame is not None:
-                                frames.append((student.name, student.id, frame.copy()))
-                        except Exception as e:
-                            print(f"[SERVER] Frame decode error: {e}")
+            if versions is None:
+                wanted = [(client_key, student.name, student.id, 0)
+                          for client_key, student in self._connected_students.iter_identified()]
+            else:
+                self._watched = frozenset(versions)
+                wanted = []
+                for client_key, since in versions.items():
+                    student = self._connected_students.get(client_key)
+                    if student and student.is_identified:
+                        wanted.append((client_key, student.name, student.id, since))
+        
+        frames = {}
+        for client_key, name, student_id, since in wanted:
+            latest = self._frames.get(client_key, since)
+            if latest:
+                frames[client_key] = (latest[0], name, student_id, latest[1])
         return frames
     
+    def get_alert_queue_stats(self):
+        """Alert queue depth, drops and dispatch latency, plus alerts folded by the coalescer"""
+        return dict(self._alert_dispatcher.stats(), coalescer=self._coalescer.stats())
+    
+    def get_receive_stats(self):
+        """Bytes and recv syscalls per received video frame"""
+        return self._recv_stats.snapshot()
+    
+    def get_liveness_stats(self):
+        """Tracked and stalled sessions, timers fired, stalls, recoveries and reaped sessions"""
+        return self._liveness.stats()
+    
+    def get_admission_stats(self):
+        """Handshake queue depth, workers busy, handshakes run, connections turned away and the current retry hint"""
+        return self._admission.stats()
+    
+    def get_resume_stats(self):
+        """Sessions parked now, and tokens issued, sessions parked, resumed and expired"""
+        return self._resume.stats()
+    
     def get_all_alerts(self):
+        """Every alert of the exam from the journal, or the in-memory cache without one"""
+        if self._journal:
+            return self._journal.read_all()
+        with self._all_alerts_lock:
+            return list(self._all_alerts)
+    
+    def get_recent_alerts(self):
+        """The bounded in-memory cache of the latest alerts"""
         with self._all_alerts_lock:
-            return self._all_alerts.copy()
+            return list(self._all_alerts)
+    
+    def get_journal_stats(self):
+        """Group commit counters, or None without a journal"""
+        return self._journal.stats() if self._journal else None
+    
+    def get_recorder_stats(self):
+        """Evidence recorder counters, or None when not recording"""
+        return self._recorder.stats() if self._recorder else None
+    
+    def get_recording_span(self, student_id: str):
+        """(first, last) recorded receive time for a student, or None"""
+        return self._recorder.span(student_id) if self._recorder else None
+    
+    def get_recorded_frame(self, student_id: str, when: float):
+        """(received_at, JPEG bytes) of the recorded frame at `when`, or None"""
+        return self._recorder.frame_at(student_id, when) if self._recorder else None
     
     def get_cheating_report(self):
+        all_alerts = self.get_all_alerts()
         report = {
             "exam_duration": self._get_exam_duration(),
-            "total_alerts": len(self._all_alerts),
+            "total_alerts": len(all_alerts),
             "connected_students": {},
             "historical_students": self._student_history.copy(),
-            "all_alerts": self.get_all_alerts()
+            "all_alerts": all_alerts
         }
         
         with self._students_lock:
-            for client_key, student in self._connected_students.items():
-                if student.is_identified:
-                    report["connected_students"][student.id] = {
-                        "name": student.name,
-                        "alerts": student.cheating_alerts.copy() if hasattr(student, 'cheating_alerts') else [],
-                        "activity_log": student.activity_log.copy() if hasattr(student, 'activity_log') else [],
-                        "cheating_score": student.cheating_score if hasattr(student, 'cheating_score') else 0,
-                        "alert_count": len(student.cheating_alerts) if hasattr(student, 'cheating_alerts') else 0,
-                        "status": "connected"
-                    }
+            for client_key, student in self._connected_students.iter_identified():
+                report["connected_students"][student.id] = {
+                    "name": student.name,
+                    "alerts": student.cheating_alerts.copy(),
+                    "activity_log": student.activity_log.copy(),
+                    "cheating_score": student.cheating_score,
+                    "alert_count": len(student.cheating_alerts),
+                    "alerts_by_severity": student.alert_counts(),
+                    "status": "connected"
+                }
         
         return report
     
@@ -631,4 +1514,110 @@ class ProctorServer:
         hours = duration // 3600
         minutes = (duration % 3600) // 60
         seconds = duration % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
\ No newline at end of file
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    
+    # ========== METRICS ==========
+    
+    def render_metrics(self) -> str:
+        """Prometheus text exposition; rates are measured between two scrapes"""
+        now = time.time()
+        with self._students_lock:
+            connected = len(self._connected_students)
+            rows = [(client_key, {"id": student.id, "name": student.name}, student.frames_received,
+                     student.bytes_received, student.last_frame_time, student.alert_counts(), student.quality_level)
+                    for client_key, student in self._connected_students.iter_identified()]
+        rates = self._student_rates.rates({row[0]: (row[2], row[3]) for row in rows})
+        
+        frames, nbytes, fps, bps, age, alerts, levels = [], [], [], [], [], [], []
+        for client_key, labels, frames_received, bytes_received, last_frame_time, counts, level in rows:
+            frames.append((labels, frames_received))
+            nbytes.append((labels, bytes_received))
+            fps.append((labels, round(rates[client_key][0], 3)))
+            bps.append((labels, round(rates[client_key][1], 1)))
+            age.append((labels, round(max(0.0, now - last_frame_time), 3)))
+            for severity, count in counts.items():
+                alerts.append((dict(labels, severity=severity), count))
+            if level is not None:
+                levels.append((labels, level))
+        
+        queue = self._alert_dispatcher.stats()
+        coalesced = self._coalescer.stats()
+        receive = self._recv_stats.snapshot()
+        liveness = self._liveness.stats()
+        resume = self._resume.stats()
+        admission = self._admission.stats()
+        lines = (
+            family("proctor_students_connected", "gauge", "Connected students", [(None, connected)])
+            + family("proctor_students_identified", "gauge", "Verified students", [(None, len(rows))])
+            + family("proctor_student_frames_total", "counter", "Frames received per student", frames)
+            + family("proctor_student_bytes_total", "counter", "Frame bytes received per student", nbytes)
+            + family("proctor_student_fps", "gauge", "Frames per second since the last scrape", fps)
+            + family("proctor_student_bytes_per_second", "gauge", "Frame bytes per second since the last scrape", bps)
+            + family("proctor_student_frame_age_seconds", "gauge", "Seconds since the student's last frame", age)
+            + family("proctor_student_alerts_total", "counter", "Alerts per student and severity", alerts)
+            + family("proctor_alert_queue_depth", "gauge", "Alerts waiting for the dashboard", [(None, queue['depth'])])
+            + family("proctor_alert_queue_capacity", "gauge", "Alert queue capacity", [(None, queue['capacity'])])
+            + family("proctor_alerts_dispatched_total", "counter", "Alerts handed to the dashboard",
+                     [(None, queue['dispatched'])])
+            + family("proctor_alerts_dropped_total", "counter", "Alerts dropped on a full queue",
+                     [(None, queue['dropped'])])
+            + family("proctor_alerts_total", "counter", "Alerts ingested", [(None, self._alert_total)])
+            + family("proctor_alerts_folded_total", "counter", "Alerts folded into an earlier alert's count",
+                     [(None, coalesced['folded'])])
+            + family("proctor_alerts_rate_limited_total", "counter", "Alerts over a student's rate limit",
+                     [(None, coalesced['rate_limited'])])
+            + family("proctor_recv_calls_total", "counter", "recv syscalls on video streams",
+                     [(None, receive['recv_calls'])])
+            + family("proctor_frames_decoded_total", "counter", "JPEGs decoded for the dashboard",
+                     [(None, self._frames.frames_decoded)])
+            + family("proctor_students_stalled", "gauge", "Verified students past a frame-age threshold",
+                     [(None, liveness['stalled'])])
+            + family("proctor_student_stalls_total", "counter", "Frame-age thresholds crossed",
+                     [(None, liveness['stalls'])])
+            + family("proctor_student_recoveries_total", "counter", "Stalled students whose video resumed",
+                     [(None, liveness['recoveries'])])
+            + family("proctor_sessions_reaped_total", "counter", "Sessions closed for sending no video",
+                     [(None, liveness['reaped'])])
+            + family("proctor_liveness_timers_fired_total", "counter", "Liveness timer wheel expiries",
+                     [(None, liveness['timers_fired'])])
+            + family("proctor_sessions_parked", "gauge", "Dropped sessions waiting to be resumed",
+                     [(None, resume['parked_now'])])
+            + family("proctor_sessions_resumed_total", "counter", "Sessions taken back with a resume token",
+                     [(None, resume['resumed'])])
+            + family("proctor_sessions_expired_total", "counter", "Parked sessions whose grace window closed",
+                     [(None, resume['expired'])])
+            + family("proctor_handshake_queue_depth", "gauge", "Connections waiting for a handshake worker",
+                     [(None, admission['queued'])])
+            + family("proctor_handshakes_active", "gauge", "Handshakes in progress", [(None, admission['active'])])
+            + family("proctor_handshakes_rejected_total", "counter", "Connections turned away on a full handshake queue",
+                     [(None, admission['rejected'])])
+            + family("proctor_handshakes_expired_total", "counter", "Connections turned away after waiting too long",
+                     [(None, admission['expired'])])
+            + family("proctor_handshake_retry_after_seconds", "gauge", "Retry hint given to turned-away clients",
+                     [(None, admission['retry_after'])])
+        )
+        if self._quality:
+            lines += (
+                family("proctor_student_quality_level", "gauge", "Adaptive quality level (0 is best)", levels)
+                + family("proctor_ingress_cap_bytes", "gauge", "Configured video ingress cap",
+                         [(None, self._quality.ingress_cap)])
+                + family("proctor_ingress_planned_bytes_per_second", "gauge",
+                         "Ingress the chosen quality levels should produce", [(None, round(self._quality.planned))])
+            )
+        if self._recorder:
+            recording = self._recorder.stats()
+            lines += (
+                family("proctor_recorder_pending_bytes", "gauge", "Frame bytes waiting for the recorder",
+                       [(None, recording['pending_bytes'])])
+                + family("proctor_recorder_frames_total", "counter", "Frames written to evidence segments",
+                         [(None, recording['frames_recorded'])])
+                + family("proctor_recorder_dropped_total", "counter", "Frames not recorded, memory budget full",
+                         [(None, recording['frames_dropped'])])
+            )
+        lines += (
+            self._handshake_time.render()
+            + self._admission.wait_time.render()
+            + self._frames.decode_time.render()
+            + self._students_lock.render("proctor_students_lock", "_students_lock")
+        )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,597 @@
+# sharding.py
+import itertools
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from server import ProctorServer, StudentSession, AlertStream
+from protocol import MSG_ALERT, MSG_EVENT
+from events import (EventBus, STUDENT_CONNECTED, STUDENT_DISCONNECTED, CHEATING_ALERTS,
+                    STUDENT_STALLED, STUDENT_RECOVERED)
+from frame_store import FrameStore
+from change_log import ChangeLog
+from rules import RuleEngine, DEFAULT_RULES_PATH
+from recorder import VideoRecorder
+
+# Methods the front end may call on a worker; anything else is refused
+WORKER_CALLS = frozenset({"start_cheating_detection", "reload_roster", "watch",
+                          "get_cheating_report", "get_all_alerts",
+                          "get_receive_stats", "get_alert_queue_stats", "get_liveness_stats",
+                          "get_resume_stats", "get_admission_stats",
+                          "ingest_routed_alert", "hand_over_session", "answered"})
+
+# Seconds a worker waits for another worker to take an alert or hand over a session
+ROUTE_TIMEOUT = 10.0
+
+class ShardWorkerServer(ProctorServer):
+    """ProctorServer in a worker process; publishes its events to the front end
+    
+    The kernel picks a worker for each connection on its own, so a
+    student's alert channel often lands on another worker than their
+    video session, and a reconnect on another worker than the one holding
+    the parked session. Such alerts go through the front end to the
+    worker that holds the session, and the ACK waits for that worker's
+    journal. A parked (or still connected) session belongs to the worker
+    that holds it until a reconnect elsewhere asks for it: that worker
+    then gives it up, and its alerts, score and dedup state move with it.
+    """
+    def __init__(self, shard: int, events, **kwargs):
+        super().__init__(reuse_port=True, **kwargs)
+        self.shard = shard
+        self._events = events
+        self._requests = {}  # {request_id: [done event, answer]}, waiting on another worker
+        self._request_ids = itertools.count(1)
+        self._requests_lock = threading.Lock()
+    
+    def watch(self, client_keys):
+        """Forward frames only for these students (the ones on screen); they also get more bandwidth"""
+        self._watched = frozenset(client_keys)
+    
+    def _touch(self, student):
+        super()._touch(student)
+        self._events.put(("changed", self._student_summary(student.client_key, student), self.shard))
+    
+    def _announce_student(self, student):
+        self._events.put(("connected", student.client_key))
+    
+    def _announce_departure(self, client_key: str, student_name: str):
+        self._events.put(("departed", client_key, student_name))
+    
+    def _emit_alert_batch(self, alerts):
+        self._events.put(("alerts", alerts))
+    
+    def _announce_stall(self, student, level: int, age: float):
+        self._events.put(("stalled", {'client_key': student.client_key, 'name': student.name,
+                                      'id': student.id, 'level': level, 'age': age}))
+    
+    def _announce_recovery(self, student, level: int, gap: float):
+        self._events.put(("recovered", {'client_key': student.client_key, 'name': student.name,
+                                        'id': student.id, 'level': level, 'gap': gap}))
+    
+    def _store_frame(self, client_key: str, jpg_buf: bytes):
+        super()._store_frame(client_key, jpg_buf)
+        if client_key in self._watched:
+            self._events.put(("frame", client_key, bytes(jpg_buf)))
+    
+    # ========== REQUESTS TO OTHER WORKERS ==========
+    
+    def _ask(self, kind: str, *args):
+        """Send a request through the front end and wait for the answering worker (None on timeout)"""
+        request_id = next(self._request_ids)
+        done = threading.Event()
+        with self._requests_lock:
+            self._requests[request_id] = [done, None]
+        self._events.put((kind, self.shard, request_id) + args)
+        
+        done.wait(ROUTE_TIMEOUT)
+        with self._requests_lock:
+            return self._requests.pop(request_id)[1]
+    
+    def answered(self, request_id: int, answer):
+        with self._requests_lock:
+            request = self._requests.get(request_id)
+            if request:
+                request[1] = answer
+                request[0].set()
+                return
+        if isinstance(answer, dict):
+            # A session handed over after the handshake stopped waiting: keep it for the report
+            print(f"[SHARD {self.shard}] Session of {answer['name']} arrived too late, kept in the history")
+            student = StudentSession(answer['name'], answer['id'], None, None, is_identified=True)
+            student.restore(answer)
+            with self._students_lock:
+                self._save_student_history(student)
+    
+    # ========== ALERT ROUTING ==========
+    
+    def _accept_channel_message(self, hello: dict, kind: int, seq: int, payload, block: bool = True):
+        student_id = hello.get('id')
+        with self._students_lock:
+            local = not student_id or self._connected_students.find_by_id(student_id) is not None
+        if local or kind not in (MSG_ALERT, MSG_EVENT):
+            return super()._accept_channel_message(hello, kind, seq, payload, block)
+        
+        alert_id = self._ask("route_alert", hello, kind, seq, bytes(payload))
+        if alert_id is None:
+            # No ACK: the client re-sends the alert when it reconnects
+            raise ConnectionError("Alert not taken by the student's worker")
+        return alert_id
+    
+    def ingest_routed_alert(self, origin: int, request_id: int, hello: dict, kind: int, seq: int, payload: bytes):
+        """Ingest an alert another worker received; the alert id goes back through the front end"""
+        threading.Thread(target=self._ingest_routed_alert, args=(origin, request_id, hello, kind, seq, payload),
+                         daemon=True).start()
+    
+    def _ingest_routed_alert(self, origin: int, request_id: int, hello: dict, kind: int, seq: int, payload: bytes):
+        try:
+            alert_id = super()._accept_channel_message(hello, kind, seq, payload)
+        except Exception as e:
+            print(f"[SHARD {self.shard}] Routed alert failed: {e}")
+            alert_id = None
+        self._events.put(("answer", origin, request_id, alert_id))
+    
+    # ========== SESSION HANDOVER ==========
+    
+    def _take_over_session(self, meta: dict):
+        if not self.resume_grace:
+            return None
+        state = self._ask("hand_over_session", meta.get("id", "").strip(), meta.get("resume_token"))
+        if state is None:
+            return None
+        
+        # Re-sent alerts stay deduplicated on this worker
+        with self._alert_streams_lock:
+            for stream_id, (last_seq, alert_ids) in state.pop('streams').items():
+                stream = self._alert_streams.setdefault((state['id'], stream_id), AlertStream())
+                stream.last_seq = max(stream.last_seq, last_seq)
+                stream.alert_ids.update(alert_ids)
+        print(f"[SHARD {self.shard}] Took over the session of {state['name']} from another worker")
+        return state
+    
+    def hand_over_session(self, origin: int, request_id: int, student_id: str, token):
+        """Give up a session to the worker a reconnect landed on; the snapshot goes back through the front end"""
+        state = None
+        try:
+            state = self._release_session(student_id, token)
+        except Exception as e:
+            print(f"[SHARD {self.shard}] Session handover failed: {e}")
+        self._events.put(("answer", origin, request_id, state))
+    
+    def _release_session(self, student_id: str, token):
+        """Snapshot and end the session the token (or, without one, the parked session of the id) is for"""
+        with self._students_lock:
+            token = token or self._parked_token(student_id)
+            student = self._resume.claim(token, student_id) if token else None
+            if student is None or self._connected_students.get(student.client_key) is not student:
+                return None
+            
+            previous = None if student.parked_at is not None else (student.sock, student.addr)
+            state = student.snapshot()
+            # The old connection's handler finds the session gone and leaves quietly
+            self._unregister_student(student.client_key, moved=True)
+        
+        with self._alert_streams_lock:
+            keys = [key for key in self._alert_streams if key[0] == student_id]
+            state['streams'] = {key[1]: (stream.last_seq, stream.alert_ids)
+                                for key, stream in ((key, self._alert_streams.pop(key)) for key in keys)}
+        
+        if previous:
+            self._close_connection(*previous)
+        return state
+
+def _run_worker(shard: int, config: dict, commands, events):
+    """Worker process: serve a shard of students until the front end sends None"""
+    server = ShardWorkerServer(shard, events, **config)
+    if not server.start():
+        events.put(("failed", shard))
+        return
+    events.put(("ready", shard))
+    
+    while True:
+        message = commands.get()
+        if message is None:
+            break
+        
+        request_id, method, args = message
+        result = None
+        try:
+            if method not in WORKER_CALLS:
+                raise ValueError(f"'{method}' is not callable on a worker")
+            result = getattr(server, method)(*args)
+        except Exception as e:
+            print(f"[SHARD {shard}] {method} failed: {e}")
+        if request_id is not None:
+            events.put(("result", request_id, shard, result))
+    
+    server.stop()
+
+class ShardedProctorServer:
+    """Front end for ProctorServer worker processes that share the listening ports
+    
+    Each worker binds the identification and alert ports with SO_REUSEPORT,
+    so the kernel spreads connections, and with them students, across
+    processes. Workers publish student changes, alerts and the frames of
+    watched students on one queue; this process mirrors them for the
+    dashboard and answers the same polling API as ProctorServer.
+    """
+    def __init__(self, host: str = "0.0.0.0", port: int = 9999,
+                 cheat_port: int = 8888, csv_path: str = "students.csv",
+                 shards: int = None, rules_path: str = DEFAULT_RULES_PATH, **worker_options):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("Sharded mode needs SO_REUSEPORT (Linux, BSD or macOS)")
+        
+        self.host = host
+        self.port = port
+        self.cheat_port = cheat_port
+        self.shards = shards or os.cpu_count() or 1
+        self._config = dict(worker_options, host=host, port=port, cheat_port=cheat_port,
+                            csv_path=csv_path, rules_path=rules_path)
+        
+        # Workers own the roster; the front end only watches the file for changes
+        self._roster_path = worker_options.get('roster_path') or csv_path
+        self._roster_mtime = self._roster_stat()
+        
+        # The dashboard falls back on the rules for icons
+        self.rules = RuleEngine.from_file(rules_path)
+        
+        # Workers record into one shared directory; the front end only reads it
+        record_dir = worker_options.get('record_dir')
+        self._recordings = VideoRecorder(record_dir) if record_dir else None
+        
+        self._lock = threading.Lock()
+        self._students = {}  # {client_key: summary}, mirrored from the workers
+        self._owners = {}    # {student id: (shard, client_key)} of each verified session, for alert routing
+        self._identified = 0
+        self._change_log = ChangeLog()
+        self._frames = FrameStore()
+        self._watched = frozenset()
+        
+        self._processes = []
+        self._commands = []
+        self._events = None
+        self._reader = None
+        self._ready = threading.Condition(self._lock)
+        self._started = set()
+        self._failed = set()
+        self._pending = {}  # {request_id: {shard: result}}
+        self._request_ids = itertools.count(1)
+        self._exam_start_time = None
+        
+        self.events = EventBus()
+    
+    # ========== LIFECYCLE ==========
+    
+    def start(self, timeout: float = 30.0):
+        # Spawn, not fork: the dashboard process already runs Qt threads
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        self._started.clear()
+        self._failed.clear()
+        self._reader = threading.Thread(target=self._read_events, daemon=True)
+        self._reader.start()
+        
+        journal_dir = self._config.get('journal_dir')
+        for shard in range(self.shards):
+            config = dict(self._config)
+            if journal_dir:
+                config['journal_dir'] = os.path.join(journal_dir, f"shard-{shard}")
+            if config.get('ingress_cap'):
+                # The kernel spreads students evenly, so each worker gets an even share of the cap
+                config['ingress_cap'] /= self.shards
+            if config.get('metrics_port'):
+                # One scrape target per worker: metrics_port, metrics_port + 1, ...
+                config['metrics_port'] += shard
+            commands = context.Queue()
+            process = context.Process(target=_run_worker, args=(shard, config, commands, self._events),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+            self._commands.append(commands)
+        
+        with self._lock:
+            self._ready.wait_for(lambda: len(self._started) + len(self._failed) == self.shards, timeout)
+            ok = len(self._started) == self.shards
+        
+        if not ok:
+            print(f"[SHARDS] Only {len(self._started)} of {self.shards} workers started")
+            self.stop()
+            return False
+        print(f"[SHARDS] {self.shards} workers serving {self.host}:{self.port}")
+        return True
+    
+    def start_cheating_detection(self):
+        results = self._call_workers("start_cheating_detection")
+        self._exam_start_time = time.time()
+        return all(results)
+    
+    def stop(self):
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._commands = []
+        
+        if self._events:
+            self._events.put(None)
+            self._reader.join(timeout=5)
+            self._events = None
+        
+        with self._lock:
+            self._students.clear()
+            self._owners.clear()
+            self._identified = 0
+            self._change_log.reset()
+            self._watched = frozenset()
+        self._frames.clear()
+        print("[SHARDS] Stopped")
+    
+    def worker_pids(self):
+        return [process.pid for process in self._processes]
+    
+    # ========== WORKER CHANNEL ==========
+    
+    def _call_workers(self, method: str, *args, timeout: float = 10.0):
+        """Call method on every worker; returns results in shard order (None if a shard did not answer)"""
+        request_id = next(self._request_ids)
+        with self._lock:
+            self._pending[request_id] = {}
+        for commands in self._commands:
+            commands.put((request_id, method, args))
+        
+        with self._lock:
+            self._ready.wait_for(lambda: len(self._pending[request_id]) == len(self._commands), timeout)
+            results = self._pending.pop(request_id)
+        return [results.get(shard) for shard in range(len(self._commands))]
+    
+    def _tell_workers(self, method: str, *args):
+        for commands in self._commands:
+            commands.put((None, method, args))
+    
+    def _read_events(self):
+        events = self._events
+        while True:
+            try:
+                event = events.get()
+            except (EOFError, OSError):
+                return
+            if event is None:
+                return
+            
+            kind = event[0]
+            try:
+                if kind == "changed":
+                    self._on_student_changed(event[1], event[2])
+                elif kind == "connected":
+                    with self._lock:
+                        summary = self._students.get(event[1])
+                    if summary:
+                        self.events.publish(STUDENT_CONNECTED, dict(summary))
+                elif kind == "departed":
+                    self._on_student_departed(event[1], event[2])
+                elif kind == "frame":
+                    self._frames.put(event[1], event[2])
+                elif kind == "alerts":
+                    self.events.publish(CHEATING_ALERTS, event[1])
+                elif kind == "stalled":
+                    self.events.publish(STUDENT_STALLED, event[1])
+                elif kind == "recovered":
+                    self.events.publish(STUDENT_RECOVERED, event[1])
+                elif kind == "route_alert":
+                    self._route_alert(*event[1:])
+                elif kind == "hand_over_session":
+                    self._hand_over_session(*event[1:])
+                elif kind == "answer":
+                    self._commands[event[1]].put((None, "answered", event[2:]))
+                elif kind == "result":
+                    with self._lock:
+                        if event[1] in self._pending:
+                            self._pending[event[1]][event[2]] = event[3]
+                            self._ready.notify_all()
+                elif kind in ("ready", "failed"):
+                    with self._lock:
+                        (self._started if kind == "ready" else self._failed).add(event[1])
+                        self._ready.notify_all()
+            except Exception as e:
+                print(f"[SHARDS] Error handling {kind} event: {e}")
+    
+    def _on_student_changed(self, summary: dict, shard: int):
+        client_key = summary['client_key']
+        with self._lock:
+            previous = self._students.get(client_key)
+            if previous is None:
+                self._frames.add(client_key)
+                if summary['is_identified']:
+                    self._owners[summary['id']] = (shard, client_key)
+            self._identified += summary['is_identified'] - (previous['is_identified'] if previous else 0)
+            summary['version'] = self._change_log.touch(client_key)
+            self._students[client_key] = summary
+    
+    def _on_student_departed(self, client_key: str, student_name: str):
+        with self._lock:
+            summary = self._students.pop(client_key, None)
+            if summary:
+                self._identified -= summary['is_identified']
+                self._change_log.forget(client_key)
+                if self._owners.get(summary['id'], (None, None))[1] == client_key:
+                    del self._owners[summary['id']]
+        self._frames.remove(client_key)
+        self.events.publish(STUDENT_DISCONNECTED, student_name)
+    
+    def _route_alert(self, origin: int, request_id: int, hello: dict, kind: int, seq: int, payload: bytes):
+        """Pass an alert on to the worker holding the student's session, or back to the one
+        that received it if no worker does (it is then kept there, as without sharding)"""
+        with self._lock:
+            owner = self._owners.get(hello.get('id'), (origin,))[0]
+        self._commands[owner].put((None, "ingest_routed_alert", (origin, request_id, hello, kind, seq, payload)))
+    
+    def _hand_over_session(self, origin: int, request_id: int, student_id: str, token):
+        """Ask the worker holding a student's session to give it to the worker their reconnect
+        landed on; answered right away when no other worker has one to give"""
+        with self._lock:
+            shard, client_key = self._owners.get(student_id, (origin, None))
+            summary = self._students.get(client_key)
+        if shard == origin or not summary or not (token or summary['parked']):
+            self._commands[origin].put((None, "answered", (request_id, None)))
+            return
+        self._commands[shard].put((None, "hand_over_session", (origin, request_id, student_id, token)))
+    
+    def _roster_stat(self):
+        try:
+            return os.stat(self._roster_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    # ========== DASHBOARD METHODS ==========
+    
+    def reload_roster(self, force: bool = False) -> bool:
+        """Ask every worker to reload the roster if its file changed"""
+        mtime = self._roster_stat()
+        if not force and mtime == self._roster_mtime:
+            return False
+        self._roster_mtime = mtime
+        self._tell_workers("reload_roster", True)
+        return True
+    
+    def get_student_info(self, client_key):
+        """Summary for one connected student (no activity log), or None"""
+        with self._lock:
+            summary = self._students.get(client_key)
+            return dict(summary) if summary else None
+    
+    def get_connected_students(self):
+        with self._lock:
+            return [dict(summary) for summary in self._students.values()]
+    
+    def get_student_counts(self):
+        """(connected, verified) without walking the mirror"""
+        with self._lock:
+            return len(self._students), self._identified
+    
+    def get_identified_students(self):
+        with self._lock:
+            return {summary['id']: summary['name']
+                    for summary in self._students.values() if summary['is_identified']}
+    
+    def get_student_changes(self, since: int = 0):
+        """Same change feed as ProctorServer.get_student_changes, over all shards"""
+        with self._lock:
+            reset, changed_keys, removed = self._change_log.since(since)
+            keys = self._students.keys() if reset else changed_keys
+            return {
+                'version': self._change_log.version,
+                'reset': reset,
+                'changed': {client_key: dict(self._students[client_key]) for client_key in keys},
+                'removed': removed,
+                'connected': len(self._students),
+                'identified': self._identified
+            }
+    
+    def get_student_frames(self):
+        """(name, id, frame) for every identified student with a frame"""
+        return [(name, student_id, frame)
+                for _, name, student_id, frame in self.get_frames_since().values()]
+    
+    def get_frames_since(self, versions=None):
+        """Frames newer than the caller's versions: {client_key: (version, name, id, frame)}
+        
+        Workers forward frames only for the students asked for here, so
+        passing the on-screen students keeps the rest of the video in the
+        worker processes.
+        """
+        with self._lock:
+            if versions is None:
+                versions = {client_key: 0 for client_key, summary in self._students.items()
+                            if summary['is_identified']}
+            wanted = [(client_key, self._students[client_key], since)
+                      for client_key, since in versions.items()
+                      if client_key in self._students and self._students[client_key]['is_identified']]
+            watch = frozenset(versions)
+            changed_watch = watch != self._watched
+            self._watched = watch
+        
+        if changed_watch:
+            self._tell_workers("watch", watch)
+        
+        frames = {}
+        for client_key, summary, since in wanted:
+            latest = self._frames.get(client_key, since)
+            if latest:
+                frames[client_key] = (latest[0], summary['name'], summary['id'], latest[1])
+        return frames
+    
+    def get_all_alerts(self):
+        alerts = [alert for shard_alerts in self._call_workers("get_all_alerts") if shard_alerts
+                  for alert in shard_alerts]
+        alerts.sort(key=lambda alert: alert.get('event_time', 0))
+        return alerts
+    
+    def get_recording_span(self, student_id: str):
+        return self._recordings.span(student_id) if self._recordings else None
+    
+    def get_recorded_frame(self, student_id: str, when: float):
+        return self._recordings.frame_at(student_id, when) if self._recordings else None
+    
+    def get_alert_queue_stats(self):
+        """Alert queue stats of every worker, in shard order"""
+        return self._call_workers("get_alert_queue_stats")
+    
+    def get_admission_stats(self):
+        """Handshake admission stats of every worker, in shard order"""
+        return self._call_workers("get_admission_stats")
+    
+    def _sum_worker_stats(self, method: str) -> dict:
+        totals = {}
+        for stats in self._call_workers(method):
+            for name, value in (stats or {}).items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+    
+    def get_liveness_stats(self):
+        """Liveness counters summed over all workers"""
+        return self._sum_worker_stats("get_liveness_stats")
+    
+    def get_resume_stats(self):
+        """Session resume counters summed over all workers"""
+        return self._sum_worker_stats("get_resume_stats")
+    
+    def get_receive_stats(self):
+        """Bytes and recv syscalls per received video frame, over all workers"""
+        frames = nbytes = calls = 0
+        for stats in self._call_workers("get_receive_stats"):
+            if stats:
+                frames += stats['frames']
+                nbytes += stats['bytes']
+                calls += stats['recv_calls']
+        return {
+            'frames': frames,
+            'bytes': nbytes,
+            'recv_calls': calls,
+            'bytes_per_frame': nbytes / frames if frames else 0.0,
+            'syscalls_per_frame': calls / frames if frames else 0.0
+        }
+    
+    def get_cheating_report(self):
+        report = {
+            "exam_duration": self._get_exam_duration(),
+            "total_alerts": 0,
+            "connected_students": {},
+            "historical_students": {},
+            "all_alerts": []
+        }
+        for shard_report in self._call_workers("get_cheating_report"):
+            if not shard_report:
+                continue
+            report["connected_students"].update(shard_report["connected_students"])
+            report["historical_students"].update(shard_report["historical_students"])
+            report["all_alerts"].extend(shard_report["all_alerts"])
+        
+        report["all_alerts"].sort(key=lambda alert: alert.get('event_time', 0))
+        report["total_alerts"] = len(report["all_alerts"])
+        return report
+    
+    _get_exam_duration = ProctorServer._get_exam_duration
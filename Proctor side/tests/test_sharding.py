@@ -0,0 +1,117 @@
+# test_sharding.py
+"""Session resume across SO_REUSEPORT workers
+
+Run from the "Proctor side" directory:
+    python -m unittest discover tests
+
+The kernel picks the worker for each connection, so the test reconnects
+until one lands on another worker than the one holding the session.
+"""
+import json
+import os
+import pickle
+import socket
+import struct
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from protocol import (pack_message, ALERT_CHANNEL_MAGIC, CHANNEL_HEADER, ALERT_EVENT,
+                      MSG_HELLO, MSG_EVENT, MSG_ACK, VIOLATION_TEST, pack_channel_message)
+from sharding import ShardedProctorServer
+from bench_connections import free_port, write_roster
+
+STUDENT = {"name": "Bench Student 0", "id": "B000000", "frame_protocol": 1, "session_resume": True}
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class ShardedResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        roster = os.path.join(self.tmp.name, "students.csv")
+        write_roster(roster, 4)
+        self.options = dict(host="127.0.0.1", csv_path=roster, shards=2, resume_grace=30.0)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def handshake(self, server, **meta):
+        sock = socket.create_connection(("127.0.0.1", server.port), timeout=15)
+        sock.sendall(pack_message(pickle.dumps(dict(STUDENT, **meta))))
+        size = struct.unpack("Q", sock.recv(8, socket.MSG_WAITALL))[0]
+        return sock, pickle.loads(sock.recv(size, socket.MSG_WAITALL))
+    
+    def send_alert(self, server, seq=1):
+        sock = socket.create_connection(("127.0.0.1", server.cheat_port), timeout=15)
+        with sock:
+            hello = json.dumps({"id": STUDENT["id"], "name": STUDENT["name"], "stream": "test"}).encode()
+            sock.sendall(ALERT_CHANNEL_MAGIC + pack_channel_message(MSG_HELLO, 0, hello))
+            sock.sendall(pack_channel_message(MSG_EVENT, seq, ALERT_EVENT.pack(VIOLATION_TEST, time.time()) + b"test"))
+            kind, _, size = CHANNEL_HEADER.unpack(sock.recv(CHANNEL_HEADER.size, socket.MSG_WAITALL))
+            sock.recv(size, socket.MSG_WAITALL)
+        self.assertEqual(kind, MSG_ACK)
+    
+    def owner(self, server):
+        with server._lock:
+            return server._owners.get(STUDENT["id"], (None, None))
+    
+    def check_resume_on_other_worker(self, io_mode):
+        server = ShardedProctorServer(port=free_port(), cheat_port=free_port(), io_mode=io_mode, **self.options)
+        self.assertTrue(server.start())
+        try:
+            server.start_cheating_detection()
+            sock, reply = self.handshake(server)
+            self.assertEqual(reply["status"], "identified")
+            self.send_alert(server)
+            self.assertTrue(wait_for(lambda: any(s['cheating_score'] == 10 for s in server.get_connected_students())))
+            
+            moved = False
+            for _ in range(20):
+                shard = self.owner(server)[0]
+                sock.close()
+                sock, reply = self.handshake(server, resume_token=reply["resume_token"])
+                self.assertTrue(reply["resumed"])
+                
+                # One live session, alerts and score included, wherever the reconnect landed
+                self.assertTrue(wait_for(lambda: self.owner(server)[1] is not None and
+                                         [(s['parked'], s['cheating_score'], s['alert_count'])
+                                          for s in server.get_connected_students()] == [(False, 10, 1)]))
+                if self.owner(server)[0] != shard:
+                    moved = True
+                    break
+            self.assertTrue(moved, "no reconnect landed on the other worker")
+            
+            # Alerts follow the session, and a re-sent one is still recognised
+            self.send_alert(server, seq=1)
+            self.send_alert(server, seq=2)
+            self.assertTrue(wait_for(lambda: [s['alert_count'] for s in server.get_connected_students()] == [2]))
+            sock.close()
+            
+            # Still one session for the report
+            report = server.get_cheating_report()
+            self.assertEqual(list(report["connected_students"]), [STUDENT["id"]])
+            self.assertEqual(report["historical_students"], {})
+        finally:
+            server.stop()
+    
+    def test_resume_on_other_worker_threaded(self):
+        self.check_resume_on_other_worker("threaded")
+    
+    def test_resume_on_other_worker_asyncio(self):
+        self.check_resume_on_other_worker("asyncio")
+
+
+if __name__ == "__main__":
+    unittest.main()
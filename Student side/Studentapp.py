@@ -7,12 +7,45 @@ import time
 import socket
 import pickle
 import struct
+import json
+import random
+import secrets
 import numpy as np
 import traceback
 import pygetwindow as gw
 import keyboard
 from datetime import datetime
 
+# Persistent alert channel framing (mirrors "Proctor side/protocol.py")
+ALERT_CHANNEL_MAGIC = b"PXA1"
+CHANNEL_HEADER = struct.Struct("!BII")   # kind, sequence number, payload length
+ALERT_ID = struct.Struct("!I")
+MSG_HELLO = 1
+MSG_ALERT = 2
+MSG_ACK = 3
+MSG_EVENT = 4
+
+# Structured alerts: type code + event time, then the detail text
+ALERT_EVENT = struct.Struct("!Hd")   # violation type code, event time (Unix seconds)
+VIOLATION_OTHER = 0
+VIOLATION_WINDOW_SWITCH = 1
+VIOLATION_COPY_PASTE = 2
+VIOLATION_AI_TOOL = 3
+VIOLATION_SESSION = 4
+VIOLATION_TEST = 5
+
+def pack_channel_message(kind, seq, payload=b""):
+    return CHANNEL_HEADER.pack(kind, seq, len(payload)) + payload
+
+# Binary video framing (mirrors "Proctor side/protocol.py")
+FRAME_PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBHIdI")   # version, kind, slot, seq, capture time, payload length
+FRAME_KIND_JPEG = 1
+FRAME_KIND_ACK = 2
+FRAME_KIND_CREDIT = 3
+FRAME_KIND_CONTROL = 4
+QUALITY_CONTROL = struct.Struct("!HHBf")   # width, height, JPEG quality, target fps
+
 class StudentApp(tk.Tk):
     def __init__(self):  # FIXED: Was _init before
         super().__init__()
@@ -25,6 +58,21 @@ class StudentApp(tk.Tk):
         self.cap = None
         self.sock = None
         self.cheat_sock = None
+        self.frame_protocol = 0  # 0 = legacy pickled frames
+        self.video_slot = 0
+        
+        # Credit-based flow control: frames we may send before the server grants more
+        self.credit_window = 0  # 0 = wait for an ACK after every frame
+        self.credits = 0
+        self.credit_lock = threading.Lock()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        
+        # Video quality; the server may change it with control messages
+        self.frame_size = (640, 480)
+        self.jpeg_quality = 70
+        self.frame_interval = 0.0  # minimum seconds between frames (0 = as fast as the loop runs)
+        self.next_frame_at = 0.0
         self.monitoring_active = False
         
         # Server configuration
@@ -44,11 +92,20 @@ class StudentApp(tk.Tk):
         self.alerts_sent = 0
         self.last_alert_time = None
         self.alert_lock = threading.Lock()
+        self.alert_seq = 0
+        self.alert_stream = secrets.token_hex(8)  # names this run's alert seqs, so re-sends are not counted twice
+        self.pending_alerts = {}  # {seq: framed message} awaiting server ACK
+        self.structured_alerts = False  # server accepts MSG_EVENT alerts
+        self.pending_lock = threading.Lock()
         
         # Connection state
         self.cheat_connected = False
         self.reconnect_attempts = 0
         
+        # Session resumption: a dropped video connection reattaches within the server's grace window
+        self.resume_token = None
+        self.resume_grace = 0.0
+        
         self.setup_ui()
         self.setup_periodic_tasks()
     
@@ -203,9 +260,11 @@ class StudentApp(tk.Tk):
     def test_alert_send(self):
         """Test function to check if alerts work"""
         print("[TEST] Sending test alert...")
-        success = self.send_cheating_alert("TEST: This is a test alert from student")
+        success = self.send_cheating_alert("TEST: This is a test alert from student", VIOLATION_TEST)
         if success:
-            messagebox.showinfo("Test Alert", f"✓ Test alert sent successfully!\nTotal alerts: {self.alerts_sent}")
+            # The ACK arrives later on alert_ack_loop; the count below does not include this alert yet
+            messagebox.showinfo("Test Alert", f"✓ Test alert sent, waiting for the server's ACK.\n"
+                                              f"Alerts acknowledged so far: {self.alerts_sent}")
         else:
             messagebox.showerror("Test Alert", "✗ Failed to send test alert. Check console.")
     
@@ -229,40 +288,30 @@ class StudentApp(tk.Tk):
     
     def connect_to_server(self):
         try:
-            # Connect to identification server
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.settimeout(10)
-            self.sock.connect((self.server_host, self.server_port))
-            
-            print(f"[CLIENT] ✓ Connected to server at {self.server_host}:{self.server_port}")
-            
-            # Send student info
-            student_info = {
-                "name": self.student_name,
-                "id": self.student_id
-            }
-            
-            meta_bytes = pickle.dumps(student_info)
-            self.sock.sendall(struct.pack("Q", len(meta_bytes)) + meta_bytes)
-            
-            print(f"[CLIENT] Sent student info: {self.student_name} (ID: {self.student_id})")
-            
-            # Wait for verification response
-            response_size_data = self._recv_exact(self.sock, 8)
-            response_size = struct.unpack("Q", response_size_data)[0]
-            response_bytes = self._recv_exact(self.sock, response_size)
-            response = pickle.loads(response_bytes)
-            
-            print(f"[CLIENT] Server response: {response}")
+            while True:
+                # Connect to identification server
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.sock.settimeout(10)
+                self.sock.connect((self.server_host, self.server_port))
+                
+                print(f"[CLIENT] ✓ Connected to server at {self.server_host}:{self.server_port}")
+                
+                response = self._handshake(self.sock)
+                
+                print(f"[CLIENT] Server response: {response}")
+                if response.get("status") != "busy" or not self.running:
+                    break
+                
+                # Everyone connects at once at exam start; come back when the server says
+                self.sock.close()
+                wait = self._busy_wait(response)
+                self.status_var.set(f"Server busy, retrying in {wait:.0f}s...")
+                time.sleep(wait)
             
             if response.get("status") == "identified":
                 self.identified = True
                 self.status_var.set(f"✓ IDENTIFIED — Starting camera...")
-                
-                # Get cheating detection port
-                if "cheat_port" in response:
-                    self.cheat_port = response["cheat_port"]
-                    print(f"[CLIENT] Using cheat port: {self.cheat_port}")
+                self._apply_identification(response)
                 
                 # Start camera
                 self.after(0, self.start_camera_stream)
@@ -290,14 +339,122 @@ class StudentApp(tk.Tk):
             self.running = False
             self.after(0, self.reset_connection)
     
-    def _recv_exact(self, sock, size):
-        """Receive exactly size bytes"""
-        data = b""
-        while len(data) < size:
-            chunk = sock.recv(size - len(data))
-            if not chunk:
+    def _handshake(self, sock):
+        """Send our identity (and resume token, if we hold one) and return the server's reply"""
+        student_info = {
+            "name": self.student_name,
+            "id": self.student_id,
+            "frame_protocol": FRAME_PROTOCOL_VERSION,
+            "credit_window": True,
+            "quality_control": True,
+            "session_resume": True
+        }
+        if self.resume_token:
+            student_info["resume_token"] = self.resume_token
+        
+        meta_bytes = pickle.dumps(student_info)
+        sock.sendall(struct.pack("Q", len(meta_bytes)) + meta_bytes)
+        
+        print(f"[CLIENT] Sent student info: {self.student_name} (ID: {self.student_id})")
+        
+        # Wait for verification response
+        response_size = struct.unpack("Q", self._recv_exact(sock, 8))[0]
+        return pickle.loads(self._recv_exact(sock, response_size))
+    
+    def _apply_identification(self, response):
+        """Take the stream settings from an identified reply"""
+        # Older servers do not answer with a frame protocol
+        self.frame_protocol = response.get("frame_protocol", 0)
+        self.video_slot = response.get("slot", 0)
+        self.credit_window = response.get("credit_window", 0)
+        self.credits = self.credit_window
+        self.structured_alerts = response.get("structured_alerts", False)
+        self.resume_token = response.get("resume_token")
+        self.resume_grace = response.get("resume_grace") or 0.0
+        if response.get("quality"):
+            # Starting quality; control messages adjust it while streaming
+            self.set_quality("initial", *response["quality"])
+        if self.frame_protocol:
+            # Header and JPEG go out as two writes; don't let Nagle hold the second
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        # Get cheating detection port
+        if "cheat_port" in response:
+            self.cheat_port = response["cheat_port"]
+            print(f"[CLIENT] Using cheat port: {self.cheat_port}")
+    
+    def _busy_wait(self, response):
+        """Seconds to wait after a busy reply: the server's hint plus jitter, so retries don't arrive together"""
+        return response.get("retry_after", 2.0) * random.uniform(1.0, 1.5)
+    
+    def resume_video_session(self):
+        """Reconnect after the video connection drops, taking the same session back with the resume token"""
+        if not self.resume_token or not self.resume_grace:
+            return False
+        
+        deadline = time.time() + self.resume_grace
+        delay = 0.5
+        while self.running and time.time() < deadline:
+            # Jitter spreads a whole room's reconnects out after an access point restart
+            time.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, 4.0)
+            try:
+                sock = socket.create_connection((self.server_host, self.server_port), timeout=5)
+                sock.settimeout(10)
+            except OSError as e:
+                print(f"[CLIENT] Resume attempt failed: {e}")
+                continue
+            
+            try:
+                response = self._handshake(sock)
+            except (ConnectionError, OSError) as e:
+                print(f"[CLIENT] Resume handshake failed: {e}")
+                sock.close()
+                continue
+            
+            if response.get("status") == "busy":
+                sock.close()
+                time.sleep(self._busy_wait(response))
+                continue
+            if response.get("status") != "identified":
+                sock.close()
+                return False
+            
+            old_sock, self.sock = self.sock, sock
+            try:
+                old_sock.close()
+            except:
+                pass
+            self._apply_identification(response)
+            state = "resumed" if response.get("resumed") else "new session"
+            print(f"[CLIENT] ✓ Video reconnected ({state})")
+            self.status_var.set(f"✓ Reconnected ({state}) — streaming")
+            
+            if self.credit_window:
+                threading.Thread(target=self.video_control_loop, args=(sock,), daemon=True).start()
+            return True
+        return False
+    
+    def _recv_exact(self, sock, size, keep_going=None):
+        """Receive exactly size bytes
+        
+        A socket timeout keeps the bytes received so far and waits on while
+        keep_going() is true. Without keep_going it ends the connection: part
+        of a message may already be read, so the stream can't be trusted.
+        """
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size:
+            try:
+                count = sock.recv_into(view[received:])
+            except socket.timeout:
+                if keep_going and keep_going():
+                    continue
+                raise ConnectionError("Timed out")
+            if not count:
                 raise ConnectionError("Connection closed")
-            data += chunk
+            received += count
         return data
     
     def start_camera_stream(self):
@@ -310,6 +467,8 @@ class StudentApp(tk.Tk):
             
             self.status_var.set("✓ Camera active. Stream starting...")
             
+            if self.credit_window:
+                threading.Thread(target=self.video_control_loop, args=(self.sock,), daemon=True).start()
             threading.Thread(target=self.video_stream_loop, daemon=True).start()
             
         except Exception as e:
@@ -335,35 +494,62 @@ class StudentApp(tk.Tk):
                 self.camera_label.config(image=preview_img, text="")
                 self.camera_label.image = preview_img
                 
+                # The server's target fps paces sending; the preview keeps updating
+                now = time.time()
+                if now < self.next_frame_at:
+                    time.sleep(0.05)
+                    continue
+                
+                # Out of credit: the server has not caught up, so this frame would
+                # only arrive stale. Drop it and send a fresh one once credit returns.
+                if self.credit_window and not self._take_credit():
+                    self.frames_dropped += 1
+                    time.sleep(0.05)
+                    continue
+                
                 # Resize for transmission
-                frame = cv2.resize(frame, (640, 480))
+                frame = cv2.resize(frame, self.frame_size)
                 
                 # Encode as JPEG
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
                 _, jpg_buffer = cv2.imencode('.jpg', frame, encode_param)
-                jpg_bytes = jpg_buffer.tobytes()
-                
-                # Send frame
-                frame_data = pickle.dumps(jpg_bytes)
-                self.sock.sendall(struct.pack("Q", len(frame_data)) + frame_data)
+                self.frames_sent += 1
+                self.next_frame_at = now + self.frame_interval
                 
-                # Wait for ACK
-                try:
-                    ack_size_data = self._recv_exact(self.sock, 8)
-                    ack_size = struct.unpack("Q", ack_size_data)[0]
-                    ack_bytes = self._recv_exact(self.sock, ack_size)
-                    ack = pickle.loads(ack_bytes)
-                except:
-                    pass
+                if self.frame_protocol:
+                    # Header + raw JPEG straight from the encoder buffer, no pickling
+                    self.sock.sendall(FRAME_HEADER.pack(FRAME_PROTOCOL_VERSION, FRAME_KIND_JPEG,
+                                                        self.video_slot, self.frames_sent, time.time(),
+                                                        jpg_buffer.nbytes))
+                    self.sock.sendall(jpg_buffer)
+                    
+                    # Lock-step servers ACK every frame; credit grants are read by video_control_loop
+                    if not self.credit_window:
+                        self._read_frame_ack(self.sock)
+                else:
+                    # Send frame
+                    frame_data = pickle.dumps(jpg_buffer.tobytes())
+                    self.sock.sendall(struct.pack("Q", len(frame_data)) + frame_data)
+                    
+                    # Wait for ACK
+                    try:
+                        ack_size_data = self._recv_exact(self.sock, 8)
+                        ack_size = struct.unpack("Q", ack_size_data)[0]
+                        ack_bytes = self._recv_exact(self.sock, ack_size)
+                        ack = pickle.loads(ack_bytes)
+                    except:
+                        pass
                 
                 # Update status
                 if frame_count % 30 == 0:
-                    self.status_var.set(f"✓ Streaming... Frames: {frame_count}")
+                    self.status_var.set(f"✓ Streaming... Frames: {self.frames_sent} (dropped {self.frames_dropped})")
                 
                 time.sleep(0.05)
                 
             except ConnectionError:
                 print("[CLIENT] Connection lost")
+                if self.running and self.resume_video_session():
+                    continue
                 break
             except Exception as e:
                 print(f"[CLIENT] Stream error: {e}")
@@ -374,6 +560,52 @@ class StudentApp(tk.Tk):
         print("[CLIENT] Video stream ended")
         self.cleanup()
     
+    def _take_credit(self):
+        with self.credit_lock:
+            if self.credits <= 0:
+                return False
+            self.credits -= 1
+            return True
+    
+    def _read_frame_ack(self, sock):
+        """Wait for a lock-step ACK, applying any quality control sent ahead of it"""
+        while True:
+            version, kind, slot, value, sent_at, size = FRAME_HEADER.unpack(
+                self._recv_exact(sock, FRAME_HEADER.size))
+            payload = self._recv_exact(sock, size) if size else b""
+            if kind == FRAME_KIND_CONTROL:
+                self.apply_quality_control(value, payload)
+            else:
+                return
+    
+    def apply_quality_control(self, level, payload):
+        self.set_quality(level, *QUALITY_CONTROL.unpack_from(payload))
+    
+    def set_quality(self, level, width, height, quality, fps):
+        self.frame_size = (width, height)
+        self.jpeg_quality = quality
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        print(f"[CLIENT] Quality level {level}: {width}x{height} q{quality} at {fps:g} fps")
+    
+    def video_control_loop(self, sock):
+        """Receive credit grants and quality control from the server while frames are streaming"""
+        # The socket's timeout is for sends; quiet spells between grants are normal
+        keep_going = lambda: self.running and self.sock is sock
+        try:
+            while keep_going():
+                version, kind, slot, value, sent_at, size = FRAME_HEADER.unpack(
+                    self._recv_exact(sock, FRAME_HEADER.size, keep_going))
+                payload = self._recv_exact(sock, size, keep_going) if size else b""
+                
+                if kind == FRAME_KIND_CREDIT:
+                    with self.credit_lock:
+                        self.credits = min(self.credit_window, self.credits + value)
+                elif kind == FRAME_KIND_CONTROL:
+                    self.apply_quality_control(value, payload)
+        except (ConnectionError, OSError) as e:
+            if self.sock is sock:
+                print(f"[CLIENT] Video control channel closed: {e}")
+    
     def connect_to_cheating_monitor(self):
         """Connect to cheating detection server - FIXED"""
         max_retries = 3
@@ -394,7 +626,19 @@ class StudentApp(tk.Tk):
                 self.cheat_sock.settimeout(10)
                 self.cheat_sock.connect((self.server_host, self.cheat_port))
                 
+                # Open the persistent alert channel
+                hello = json.dumps({"id": self.student_id, "name": self.student_name,
+                                    "stream": self.alert_stream}).encode('utf-8')
+                self.cheat_sock.sendall(ALERT_CHANNEL_MAGIC + pack_channel_message(MSG_HELLO, 0, hello))
+                self.cheat_sock.settimeout(None)
+                
+                # Re-send alerts the previous connection never acknowledged
+                with self.pending_lock:
+                    for seq in sorted(self.pending_alerts):
+                        self.cheat_sock.sendall(self.pending_alerts[seq])
+                
                 self.cheat_connected = True
+                threading.Thread(target=self.alert_ack_loop, args=(self.cheat_sock,), daemon=True).start()
                 self.reconnect_attempts = 0
                 
                 print(f"[CLIENT] ✓✓✓ SUCCESS: Connected to cheating monitor on port {self.cheat_port}")
@@ -460,7 +704,7 @@ class StudentApp(tk.Tk):
                               "Are you sure you want to stop the exam?\n\n"
                               "This will end monitoring and notify the proctor."):
             
-            self.send_cheating_alert("Student manually stopped the exam")
+            self.send_cheating_alert("Student manually stopped the exam", VIOLATION_SESSION)
             
             self.monitoring_active = False
             self.start_exam_btn.config(state='normal')
@@ -491,7 +735,7 @@ class StudentApp(tk.Tk):
                             "Student Identification" not in current_title):
                             violation = f"Window switch: {current_title}"
                             print(f"[MONITOR] Detected: {violation}")
-                            self.send_cheating_alert(violation)
+                            self.send_cheating_alert(violation, VIOLATION_WINDOW_SWITCH)
                 
             except Exception as e:
                 print(f"[MONITOR] Window detection error: {e}")
@@ -511,7 +755,7 @@ class StudentApp(tk.Tk):
                         ctrl_c_pressed = True
                         violation = "Copy attempt (Ctrl+C) detected"
                         print(f"[MONITOR] Detected: {violation}")
-                        self.send_cheating_alert(violation)
+                        self.send_cheating_alert(violation, VIOLATION_COPY_PASTE)
                 else:
                     ctrl_c_pressed = False
                 
@@ -520,7 +764,7 @@ class StudentApp(tk.Tk):
                         ctrl_v_pressed = True
                         violation = "Paste attempt (Ctrl+V) detected"
                         print(f"[MONITOR] Detected: {violation}")
-                        self.send_cheating_alert(violation)
+                        self.send_cheating_alert(violation, VIOLATION_COPY_PASTE)
                 else:
                     ctrl_v_pressed = False
                 
@@ -543,7 +787,7 @@ class StudentApp(tk.Tk):
                         alt_tab_pressed = True
                         violation = "Alt+Tab window switching detected"
                         print(f"[MONITOR] Detected: {violation}")
-                        self.send_cheating_alert(violation)
+                        self.send_cheating_alert(violation, VIOLATION_WINDOW_SWITCH)
                 else:
                     alt_tab_pressed = False
                 
@@ -553,8 +797,8 @@ class StudentApp(tk.Tk):
                 print(f"[MONITOR] Tab detection error: {e}")
                 continue
     
-    def send_cheating_alert(self, violation):
-        """Send cheating alert to server - FIXED WITH PROPER PROTOCOL"""
+    def send_cheating_alert(self, violation, violation_type=VIOLATION_OTHER):
+        """Send cheating alert on the persistent alert channel (ACKs arrive in alert_ack_loop)"""
         with self.alert_lock:
             try:
                 # Check connection
@@ -565,68 +809,64 @@ class StudentApp(tk.Tk):
                         print(f"[ALERT] ✗ Reconnection failed. Alert lost: {violation}")
                         return False
                 
-                # Format message
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                alert_msg = f"{self.student_name} [{timestamp}]: {violation}"
-                alert_bytes = alert_msg.encode('utf-8')
+                self.alert_seq += 1
+                if self.structured_alerts:
+                    # The server knows who we are from HELLO; send type and event time, no name
+                    alert_msg = violation
+                    payload = ALERT_EVENT.pack(violation_type, time.time()) + violation.encode('utf-8')
+                    message = pack_channel_message(MSG_EVENT, self.alert_seq, payload)
+                else:
+                    # Older servers parse "Name [HH:MM:SS]: violation"
+                    timestamp = datetime.now().strftime("%H:%M:%S")
+                    alert_msg = f"{self.student_name} [{timestamp}]: {violation}"
+                    message = pack_channel_message(MSG_ALERT, self.alert_seq, alert_msg.encode('utf-8'))
+                with self.pending_lock:
+                    self.pending_alerts[self.alert_seq] = message
                 
-                print(f"[ALERT] Sending (len={len(alert_bytes)}): {alert_msg}")
+                print(f"[ALERT] Sending #{self.alert_seq}: {alert_msg}")
                 
-                # FIXED: Use proper protocol with length header
                 try:
-                    # Create new socket for each alert (more reliable)
-                    temp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    temp_sock.settimeout(5.0)
-                    temp_sock.connect((self.server_host, self.cheat_port))
-                    
-                    # Send length header + data
-                    temp_sock.sendall(struct.pack("Q", len(alert_bytes)))
-                    temp_sock.sendall(alert_bytes)
-                    
-                    print(f"[ALERT] Data sent, waiting for ACK...")
-                    
-                    # Wait for ACK
-                    try:
-                        ack_len_bytes = self._recv_exact(temp_sock, 8)
-                        ack_len = struct.unpack("Q", ack_len_bytes)[0]
-                        ack_bytes = self._recv_exact(temp_sock, ack_len)
-                        ack = pickle.loads(ack_bytes)
-                        
-                        print(f"[ALERT] ✓✓✓ ACK received: {ack}")
-                        
-                        # Update counters
-                        self.alerts_sent += 1
-                        self.last_alert_time = datetime.now()
-                        
-                        # Update UI
-                        self.after(0, lambda: self.monitor_status_var.set(
-                            f"Monitoring: ACTIVE | Alerts: {self.alerts_sent}"))
-                        
-                        print(f"[ALERT] ✓ Successfully sent alert #{self.alerts_sent}")
-                        
-                        temp_sock.close()
-                        return True
-                        
-                    except Exception as e:
-                        print(f"[ALERT] ACK error: {e}")
-                        temp_sock.close()
-                        return False
-                    
-                except ConnectionRefusedError:
-                    print(f"[ALERT] ✗ Connection refused")
+                    self.cheat_sock.sendall(message)
+                    return True
+                except OSError as e:
+                    print(f"[ALERT] Send error: {e}. Reconnecting...")
                     self.cheat_connected = False
-                    return False
-                    
-                except Exception as e:
-                    print(f"[ALERT] Send error: {e}")
-                    traceback.print_exc()
-                    return False
+                    # Reconnecting re-sends every pending alert, including this one
+                    return self.connect_to_cheating_monitor()
                 
             except Exception as e:
                 print(f"[ALERT] ✗ Failed: {e}")
                 traceback.print_exc()
                 return False
     
+    def alert_ack_loop(self, sock):
+        """Receive ACKs for pipelined alerts on the persistent channel"""
+        try:
+            while self.cheat_sock is sock:
+                kind, seq, size = CHANNEL_HEADER.unpack(self._recv_exact(sock, CHANNEL_HEADER.size))
+                payload = self._recv_exact(sock, size)
+                if kind != MSG_ACK:
+                    continue
+                
+                with self.pending_lock:
+                    acked = self.pending_alerts.pop(seq, None)
+                if acked is None:
+                    continue
+                
+                # Update counters
+                self.alerts_sent += 1
+                self.last_alert_time = datetime.now()
+                print(f"[ALERT] ✓ ACK #{seq} (server alert id {ALERT_ID.unpack(payload)[0]})")
+                
+                # Update UI
+                self.after(0, lambda: self.monitor_status_var.set(
+                    f"Monitoring: ACTIVE | Alerts: {self.alerts_sent}"))
+                
+        except (ConnectionError, OSError) as e:
+            if self.cheat_sock is sock:
+                print(f"[ALERT] Alert channel lost: {e}")
+                self.cheat_connected = False
+    
     def disconnect(self):
         self.running = False
         self.monitoring_active = False